@@ -0,0 +1,319 @@
+import gzip
+import io
+import json
+import re
+import tempfile
+
+import pandas as pd
+
+from banco_dados import COLUNAS_VENDA, META_PADRAO
+
+# Arquivos até este tamanho ficam em memória; acima disso vão para disco
+LIMITE_MEMORIA = 8 * 1024 * 1024
+VERSAO_FORMATO = 1
+
+FORMATOS = {
+    "ndjson.gz": {"rotulo": "NDJSON compactado (.ndjson.gz)", "mime": "application/gzip"},
+    "json": {"rotulo": "JSON (compatível)", "mime": "application/json"},
+}
+
+
+# Um único encoder reaproveitado: json.dumps com parâmetros cria um novo a cada chamada
+_dumps = json.JSONEncoder(default=str, ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _produtos_sem_id(banco):
+    return ({k: v for k, v in p.items() if k != "id"} for p in banco.listar_produtos())
+
+
+# --- Escrita incremental ---
+def escrever_ndjson(banco, meta, destino):
+    # Cabeçalho, um registro por linha para cadastros e vendas em lotes colunares:
+    # {"tipo": "vendas", "linhas": [[...], ...]} na ordem de COLUNAS_VENDA
+    destino.write(_dumps({"tipo": "cabecalho", "versao": VERSAO_FORMATO, "meta": meta, "colunas_venda": COLUNAS_VENDA}) + "\n")
+    for custo in banco.historico_custos_fixos():
+        destino.write(_dumps({"tipo": "custo_fixo", "dados": custo}) + "\n")
+    for produto in _produtos_sem_id(banco):
+        destino.write(_dumps({"tipo": "produto", "dados": produto}) + "\n")
+    for lote in banco.iterar_lotes_vendas():
+        destino.write(_dumps({"tipo": "vendas", "linhas": lote}) + "\n")
+
+
+def escrever_json(banco, meta, destino):
+    # Mesmo layout do backup original, mas gerado aos pedaços
+    def lista(nome, registros):
+        destino.write(f'"{nome}":[')
+        lote = []
+        for i, registro in enumerate(registros):
+            lote.append(("," if i else "") + _dumps(registro))
+            if len(lote) >= 5000:
+                destino.write("".join(lote))
+                lote = []
+        destino.write("".join(lote) + "],")
+
+    destino.write("{")
+    lista("custos_fixos", banco.historico_custos_fixos())
+    lista("produtos", _produtos_sem_id(banco))
+    lista("vendas", banco.iterar_vendas())
+    destino.write(f'"meta":{_dumps(meta)}}}')
+
+
+# --- Geração sob demanda ---
+def gerar_backup(banco, meta, formato="ndjson.gz"):
+    arquivo = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA)
+    if formato == "ndjson.gz":
+        with gzip.GzipFile(fileobj=arquivo, mode="wb", compresslevel=5) as compactado:
+            with io.TextIOWrapper(compactado, encoding="utf-8") as texto:
+                escrever_ndjson(banco, meta, texto)
+    else:
+        texto = io.TextIOWrapper(arquivo, encoding="utf-8")
+        escrever_json(banco, meta, texto)
+        texto.flush()
+        texto.detach()
+    arquivo.seek(0)
+    return arquivo
+
+
+# --- Leitura incremental ---
+_decoder = json.JSONDecoder()
+_SECOES_LEGADO = {"custos_fixos": "custo_fixo", "produtos": "produto", "vendas": "venda", "meta": "meta"}
+
+
+class _LeitorJson:
+    # Lê um documento JSON aos pedaços, decodificando um valor por vez
+    def __init__(self, texto, tamanho_bloco=1 << 16):
+        self.texto = texto
+        self.tamanho_bloco = tamanho_bloco
+        self.buf = ""
+        self.pos = 0
+        self.fim = False
+
+    def _encher(self):
+        if self.fim:
+            return False
+        bloco = self.texto.read(self.tamanho_bloco)
+        if not bloco:
+            self.fim = True
+            return False
+        self.buf = self.buf[self.pos:] + bloco
+        self.pos = 0
+        return True
+
+    def proximo_caractere(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._encher():
+                return ""
+
+    def consumir(self, esperados):
+        c = self.proximo_caractere()
+        if c not in esperados:
+            raise ValueError(f"JSON inválido: esperado {' ou '.join(esperados)}, encontrado '{c or 'fim do arquivo'}'")
+        self.pos += 1
+        return c
+
+    def valor(self):
+        self.proximo_caractere()
+        while True:
+            try:
+                obj, fim = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._encher():
+                    raise
+                continue
+            # Um número no fim do buffer pode estar cortado ao meio
+            if fim == len(self.buf) and self._encher():
+                continue
+            self.pos = fim
+            return obj
+
+
+def _iterar_json_legado(texto):
+    leitor = _LeitorJson(texto)
+    leitor.consumir("{")
+    if leitor.proximo_caractere() == "}":
+        return
+    while True:
+        chave = leitor.valor()
+        leitor.consumir(":")
+        tipo = _SECOES_LEGADO.get(chave)
+        if leitor.proximo_caractere() == "[":
+            leitor.pos += 1
+            if leitor.proximo_caractere() == "]":
+                leitor.pos += 1
+            else:
+                while True:
+                    registro = leitor.valor()
+                    if tipo:
+                        yield tipo, registro
+                    if leitor.consumir(",]") == "]":
+                        break
+        else:
+            valor = leitor.valor()
+            if tipo:
+                yield tipo, valor
+        if leitor.consumir(",}") == "}":
+            return
+
+
+def _iterar_ndjson(texto):
+    colunas = COLUNAS_VENDA
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            item = json.loads(linha)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Linha {numero} inválida: {e}") from None
+        tipo = item.get("tipo")
+        if tipo == "cabecalho":
+            colunas = item.get("colunas_venda", COLUNAS_VENDA)
+            yield "meta", item.get("meta", META_PADRAO)
+        elif tipo == "vendas":
+            # Lotes colunares seguem direto para a validação, sem virar dicts
+            yield "lote_vendas", pd.DataFrame(item["linhas"], columns=colunas)
+        elif tipo in ("custo_fixo", "produto", "venda"):
+            yield tipo, item["dados"]
+
+
+def iterar_backup(arquivo):
+    # Aceita backups .json (layout original) e .ndjson, compactados ou não
+    if arquivo.read(2) == b"\x1f\x8b":
+        arquivo.seek(0)
+        arquivo = gzip.GzipFile(fileobj=arquivo, mode="rb")
+    else:
+        arquivo.seek(0)
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8")
+    inicio = texto.read(256)
+    texto.seek(0)
+    if re.match(r'\s*\{\s*"tipo"', inicio):
+        return _iterar_ndjson(texto)
+    return _iterar_json_legado(texto)
+
+
+# --- Validação em lotes ---
+def validar_vendas(registros):
+    if isinstance(registros, pd.DataFrame):
+        df = registros.reindex(columns=COLUNAS_VENDA)
+    else:
+        df = pd.DataFrame.from_records(registros, columns=COLUNAS_VENDA)
+    datas = pd.to_datetime(df["data"].astype("string").str.slice(0, 10), errors="coerce", format="%Y-%m-%d")
+    for coluna in ["qtd", "preco_unitario", "custo_unitario", "faturamento", "custo_total", "margem_total", "id_venda"]:
+        df[coluna] = pd.to_numeric(df[coluna], errors="coerce")
+    produto = df["produto"].astype("string").str.strip()
+
+    validos = (
+        datas.notna() & produto.notna() & (produto != "")
+        & (df["qtd"] > 0) & (df["qtd"] % 1 == 0) & df["preco_unitario"].notna() & df["custo_unitario"].notna()
+    ).fillna(False)
+    df = df[validos].copy()
+    datas = datas[validos]
+
+    df["data"] = datas.dt.strftime("%Y-%m-%d")
+    df["ano"] = datas.dt.year
+    df["mes"] = datas.dt.month
+    df["produto"] = produto[validos]
+    df["qtd"] = df["qtd"].astype("int64")
+    # Campos derivados ausentes são recalculados a partir dos valores unitários
+    df["faturamento"] = df["faturamento"].fillna(df["preco_unitario"] * df["qtd"])
+    df["custo_total"] = df["custo_total"].fillna(df["custo_unitario"] * df["qtd"])
+    df["margem_total"] = df["margem_total"].fillna(df["faturamento"] - df["custo_total"])
+    # Listas de tipos nativos do Python, que é o que o sqlite3 aceita
+    linhas = list(zip(*(df[c].tolist() for c in COLUNAS_VENDA)))
+    return linhas, len(validos) - len(linhas)
+
+
+def validar_produto(registro):
+    nome = str(registro.get("nome") or "").strip()
+    try:
+        preco = float(registro.get("preco_venda") or 0.0)
+        custos = [c for c in registro.get("custos_lista") or [] if isinstance(c, dict) and c.get("item")]
+        custo_total = float(registro.get("custo_total", sum(float(c.get("valor") or 0.0) for c in custos)))
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if not nome:
+        return None
+    return {"nome": nome, "preco_venda": preco, "custos_lista": custos, "custo_total": custo_total, "margem": preco - custo_total}
+
+
+def validar_custo_fixo(registro):
+    try:
+        descricao = str(registro.get("descricao") or "").strip()
+        valor = float(registro.get("valor") or 0.0)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if not descricao or valor < 0:
+        return None
+    # Backups anteriores à vigência não trazem as datas: a conta vale para todo o período
+    vigencia = {}
+    for campo in ("vigencia_inicio", "vigencia_fim"):
+        mes = registro.get(campo)
+        if mes is not None and not (isinstance(mes, str) and re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", mes)):
+            return None
+        vigencia[campo] = mes
+    if vigencia["vigencia_inicio"] and vigencia["vigencia_fim"] and vigencia["vigencia_fim"] < vigencia["vigencia_inicio"]:
+        return None
+    return {"descricao": descricao, "valor": valor, **vigencia}
+
+
+# --- Restauração ---
+def restaurar_backup(banco, arquivo, tamanho_lote=5000, ao_progredir=None):
+    # Lê o arquivo registro a registro e grava em lotes numa única transação:
+    # um arquivo inválido não altera os dados atuais.
+    arquivo.seek(0, io.SEEK_END)
+    tamanho_total = arquivo.tell() or 1
+    arquivo.seek(0)
+
+    resumo = {"custos_fixos": 0, "produtos": 0, "vendas": 0, "rejeitados": 0, "meta": META_PADRAO}
+    nomes_produtos = set()
+    lote = []
+
+    def gravar_lote(carga, registros):
+        linhas, rejeitados = validar_vendas(registros)
+        carga.vendas(linhas)
+        resumo["vendas"] += len(linhas)
+        resumo["rejeitados"] += rejeitados
+        if ao_progredir:
+            ao_progredir(min(arquivo.tell() / tamanho_total, 1.0), resumo)
+
+    with banco.carga_completa() as carga:
+        for tipo, registro in iterar_backup(arquivo):
+            if tipo == "venda":
+                if not isinstance(registro, dict):
+                    resumo["rejeitados"] += 1
+                    continue
+                lote.append(registro)
+                if len(lote) >= tamanho_lote:
+                    gravar_lote(carga, lote)
+                    lote.clear()
+            elif tipo == "lote_vendas":
+                gravar_lote(carga, registro)
+            elif tipo == "meta":
+                try:
+                    resumo["meta"] = float(registro)
+                except (TypeError, ValueError):
+                    resumo["rejeitados"] += 1
+            elif tipo == "produto":
+                produto = validar_produto(registro) if isinstance(registro, dict) else None
+                if produto is None or produto["nome"] in nomes_produtos:
+                    resumo["rejeitados"] += 1
+                else:
+                    nomes_produtos.add(produto["nome"])
+                    carga.produtos([produto])
+                    resumo["produtos"] += 1
+            elif tipo == "custo_fixo":
+                custo = validar_custo_fixo(registro) if isinstance(registro, dict) else None
+                if custo is None:
+                    resumo["rejeitados"] += 1
+                else:
+                    carga.custos_fixos([custo])
+                    resumo["custos_fixos"] += 1
+        if lote:
+            gravar_lote(carga, lote)
+        carga.meta(resumo["meta"])
+    if ao_progredir:
+        ao_progredir(1.0, resumo)
+    return resumo
@@ -0,0 +1,596 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+# --- Configuração do Banco ---
+CAMINHO_PADRAO = os.environ.get("GESTAO_DB", "gestao_salao.db")
+META_PADRAO = 35000.00
+
+COLUNAS_VENDA = [
+    "id_venda", "data", "mes", "ano", "produto", "qtd",
+    "preco_unitario", "custo_unitario", "faturamento", "custo_total", "margem_total"
+]
+
+SQL_INSERIR_VENDA = f"INSERT INTO vendas ({', '.join(COLUNAS_VENDA)}) VALUES ({', '.join('?' * len(COLUNAS_VENDA))})"
+
+# Cada posição da lista é uma versão do esquema (PRAGMA user_version)
+MIGRACOES = [
+    """
+    CREATE TABLE IF NOT EXISTS produtos (
+        id INTEGER PRIMARY KEY,
+        nome TEXT NOT NULL UNIQUE,
+        preco_venda REAL NOT NULL DEFAULT 0,
+        custos_lista TEXT NOT NULL DEFAULT '[]',
+        custo_total REAL NOT NULL DEFAULT 0,
+        margem REAL NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS vendas (
+        id INTEGER PRIMARY KEY,
+        id_venda REAL,
+        data TEXT NOT NULL,
+        mes INTEGER NOT NULL,
+        ano INTEGER NOT NULL,
+        produto TEXT NOT NULL,
+        qtd INTEGER NOT NULL,
+        preco_unitario REAL NOT NULL,
+        custo_unitario REAL NOT NULL,
+        faturamento REAL NOT NULL,
+        custo_total REAL NOT NULL,
+        margem_total REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_vendas_data ON vendas (data, id);
+    CREATE INDEX IF NOT EXISTS idx_vendas_ano_mes ON vendas (ano, mes);
+    CREATE INDEX IF NOT EXISTS idx_vendas_produto ON vendas (produto);
+    CREATE TABLE IF NOT EXISTS custos_fixos (
+        id INTEGER PRIMARY KEY,
+        descricao TEXT NOT NULL,
+        valor REAL NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS config (
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    );
+    """,
+    # v2: vendas passam a referenciar o produto pelo id; `produto` fica como nome de exibição
+    """
+    ALTER TABLE vendas ADD COLUMN produto_id INTEGER REFERENCES produtos (id);
+    UPDATE vendas SET produto_id = (SELECT p.id FROM produtos p WHERE p.nome = vendas.produto);
+    CREATE INDEX IF NOT EXISTS idx_vendas_produto_id ON vendas (produto_id);
+    """,
+    # v3: histórico filtrado por produto navega na ordem de data sem ordenar em memória
+    """
+    CREATE INDEX IF NOT EXISTS idx_vendas_produto_data ON vendas (produto, data, id);
+    DROP INDEX IF EXISTS idx_vendas_produto;
+    """,
+    # v4: custos fixos com vigência (AAAA-MM, inclusive); NULL = sem limite daquele lado
+    """
+    ALTER TABLE custos_fixos ADD COLUMN vigencia_inicio TEXT;
+    ALTER TABLE custos_fixos ADD COLUMN vigencia_fim TEXT;
+    """,
+    # v5: ids de venda nunca reaproveitados (AUTOINCREMENT) e diário de estornos/correções.
+    # O diário guarda a venda antes e depois de cada evento (JSON); `desfeito` diz se o evento
+    # está em vigor, foi desfeito ou foi superado (ver EM_VIGOR, DESFEITO e SUPERADO).
+    """
+    CREATE TABLE vendas_v5 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id_venda REAL,
+        data TEXT NOT NULL,
+        mes INTEGER NOT NULL,
+        ano INTEGER NOT NULL,
+        produto TEXT NOT NULL,
+        qtd INTEGER NOT NULL,
+        preco_unitario REAL NOT NULL,
+        custo_unitario REAL NOT NULL,
+        faturamento REAL NOT NULL,
+        custo_total REAL NOT NULL,
+        margem_total REAL NOT NULL,
+        produto_id INTEGER REFERENCES produtos (id)
+    );
+    INSERT INTO vendas_v5 SELECT id, id_venda, data, mes, ano, produto, qtd, preco_unitario, custo_unitario,
+        faturamento, custo_total, margem_total, produto_id FROM vendas;
+    DROP TABLE vendas;
+    ALTER TABLE vendas_v5 RENAME TO vendas;
+    CREATE INDEX idx_vendas_data ON vendas (data, id);
+    CREATE INDEX idx_vendas_ano_mes ON vendas (ano, mes);
+    CREATE INDEX idx_vendas_produto_id ON vendas (produto_id);
+    CREATE INDEX idx_vendas_produto_data ON vendas (produto, data, id);
+    CREATE TABLE IF NOT EXISTS diario_vendas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        momento TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        id_linha INTEGER NOT NULL,
+        antes TEXT,
+        depois TEXT,
+        desfeito INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+]
+
+# Conta de custo fixo vigente num mês (AAAA-MM); parâmetros: (mes, mes)
+SQL_VIGENTE = "(vigencia_inicio IS NULL OR vigencia_inicio <= ?) AND (vigencia_fim IS NULL OR vigencia_fim >= ?)"
+
+
+def mes_atual():
+    return date.today().strftime("%Y-%m")
+
+
+def mes_anterior(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    return f"{ano - 1}-12" if numero == 1 else f"{ano}-{numero - 1:02d}"
+
+
+# Diário de vendas: eventos mantidos para desfazer (os mais antigos são descartados na
+# compactação; a tabela de vendas já é o retrato consolidado de tudo o que veio antes)
+TIPOS_EVENTO = {"inclusao": "Inclusão", "estorno": "Estorno", "correcao": "Correção"}
+# Valores da coluna `desfeito`. Superado: a venda mudou por fora do diário (reprecificação)
+# ou uma importação encerrou a pilha de refazer; o evento fica só como registro.
+EM_VIGOR, DESFEITO, SUPERADO = 0, 1, 2
+SITUACOES_EVENTO = {EM_VIGOR: "Em vigor", DESFEITO: "Desfeito", SUPERADO: "Superado"}
+LIMITE_DIARIO = 500
+# Próximo evento a desfazer (o mais recente em vigor) e a refazer (o primeiro desfeito depois
+# do último que não foi desfeito: um evento novo ou superado encerra a pilha de refazer)
+SQL_A_DESFAZER = f"SELECT {{}} FROM diario_vendas WHERE desfeito = {EM_VIGOR} ORDER BY id DESC LIMIT 1"
+SQL_A_REFAZER = f"""
+    SELECT {{}} FROM diario_vendas
+    WHERE desfeito = {DESFEITO} AND id > (SELECT COALESCE(MAX(id), 0) FROM diario_vendas WHERE desfeito <> {DESFEITO})
+    ORDER BY id LIMIT 1
+"""
+
+# Campos conferidos antes de desfazer/refazer (o vínculo com o catálogo pode mudar por fora)
+CAMPOS_COMPARADOS = ["data", "qtd", "preco_unitario", "custo_unitario"]
+
+# Vincula ao catálogo, pelo nome, as vendas ainda sem produto_id
+SQL_VINCULAR_PRODUTOS = """
+    UPDATE vendas SET produto_id = (SELECT p.id FROM produtos p WHERE p.nome = vendas.produto)
+    WHERE id >= ? AND produto_id IS NULL
+"""
+
+
+class BancoDados:
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        self._lock = threading.RLock()
+        # A conexão é compartilhada entre as sessões do Streamlit; o lock serializa o acesso
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if caminho != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrar()
+
+    @contextmanager
+    def transacao(self):
+        with self._lock:
+            with self.conn:
+                yield self.conn
+
+    def _migrar(self):
+        # executescript confirma a transação aberta e roda cada comando por conta própria:
+        # cada versão vai num BEGIN/COMMIT explícito, junto com o user_version, para que uma
+        # queda no meio (ex.: entre o DROP e o RENAME da v5) não deixe o banco pela metade
+        with self._lock:
+            versao = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            for numero, script in enumerate(MIGRACOES[versao:], start=versao + 1):
+                try:
+                    self.conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {numero};\nCOMMIT;")
+                except sqlite3.Error:
+                    if self.conn.in_transaction:
+                        self.conn.rollback()
+                    raise
+
+    def fechar(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- Vendas ---
+    def iterar_lotes_compactos(self, desde_id=0, tamanho_lote=50000):
+        # Só as colunas que não podem ser derivadas: (id, produto_id, data, produto, qtd, preco, custo, faturamento, custo_total)
+        ultimo_id = desde_id - 1
+        while True:
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.row_factory = None
+                linhas = cursor.execute(
+                    "SELECT id, produto_id, data, produto, qtd, preco_unitario, custo_unitario, faturamento, custo_total "
+                    "FROM vendas WHERE id > ? ORDER BY id LIMIT ?",
+                    (ultimo_id, tamanho_lote)
+                ).fetchall()
+            if not linhas:
+                return
+            ultimo_id = linhas[-1][0]
+            yield linhas
+
+    def pagina_vendas(self, limite=50, antes=None, data_inicio=None, data_fim=None, produto=None):
+        # Paginação por chave (data, id), da venda mais recente para a mais antiga.
+        # `antes` é o (data, id) da última linha da página anterior; percorre só o
+        # índice até a página pedida, então o custo não cresce com o histórico.
+        condicoes, parametros = [], []
+        if antes is not None:
+            condicoes.append("(data, id) < (?, ?)")
+            parametros.extend(antes)
+        if data_inicio is not None:
+            condicoes.append("data >= ?")
+            parametros.append(data_inicio)
+        if data_fim is not None:
+            condicoes.append("data <= ?")
+            parametros.append(data_fim)
+        if produto is not None:
+            condicoes.append("produto = ?")
+            parametros.append(produto)
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        with self._lock:
+            linhas = self.conn.execute(
+                f"SELECT id, {', '.join(COLUNAS_VENDA)} FROM vendas {where} ORDER BY data DESC, id DESC LIMIT ?",
+                (*parametros, limite + 1)
+            ).fetchall()
+        # Uma linha a mais indica se existe página seguinte
+        return [dict(linha) for linha in linhas[:limite]], len(linhas) > limite
+
+    def iterar_lotes_vendas(self, tamanho_lote=5000):
+        # Percorre a tabela por faixas de id, sem manter o lock entre um lote e outro
+        ultimo_id = 0
+        while True:
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.row_factory = None
+                linhas = cursor.execute(
+                    f"SELECT id, {', '.join(COLUNAS_VENDA)} FROM vendas WHERE id > ? ORDER BY id LIMIT ?",
+                    (ultimo_id, tamanho_lote)
+                ).fetchall()
+            if not linhas:
+                return
+            ultimo_id = linhas[-1][0]
+            yield [linha[1:] for linha in linhas]
+
+    def iterar_vendas(self, tamanho_lote=5000):
+        for lote in self.iterar_lotes_vendas(tamanho_lote):
+            for linha in lote:
+                yield dict(zip(COLUNAS_VENDA, linha))
+
+    def inserir_venda(self, registro):
+        with self.transacao() as conn:
+            cursor = conn.execute(SQL_INSERIR_VENDA, [registro[c] for c in COLUNAS_VENDA])
+            id_linha = cursor.lastrowid
+            if registro.get("produto_id") is not None:
+                conn.execute("UPDATE vendas SET produto_id = ? WHERE id = ?", (registro["produto_id"], id_linha))
+            else:
+                conn.execute(SQL_VINCULAR_PRODUTOS, (id_linha,))
+            self._registrar_evento(conn, "inclusao", id_linha, None, self._linha_venda(conn, id_linha))
+            return id_linha
+
+    def inserir_linhas_vendas(self, linhas):
+        # Tuplas na ordem de COLUNAS_VENDA; devolve os ids gerados.
+        # Com o lock e a transação abertos os rowids saem consecutivos a partir do maior id.
+        with self.transacao() as conn:
+            conn.executemany(SQL_INSERIR_VENDA, linhas)
+            ultimo_id = conn.execute("SELECT MAX(id) FROM vendas").fetchone()[0] or 0
+            primeiro_id = ultimo_id - len(linhas) + 1
+            conn.execute(SQL_VINCULAR_PRODUTOS, (primeiro_id,))
+            # A importação é uma ação nova fora do diário: o que estava desfeito não é mais refeito
+            conn.execute(f"UPDATE diario_vendas SET desfeito = {SUPERADO} WHERE desfeito = {DESFEITO}")
+        return list(range(primeiro_id, ultimo_id + 1))
+
+    def atualizar_valores_vendas(self, linhas):
+        # Tuplas (preco_unitario, custo_unitario, id), regravadas com os totais numa única transação
+        with self.transacao() as conn:
+            conn.executemany(
+                """
+                UPDATE vendas SET preco_unitario = ?1, custo_unitario = ?2,
+                    faturamento = ?1 * qtd, custo_total = ?2 * qtd, margem_total = (?1 - ?2) * qtd
+                WHERE id = ?3
+                """,
+                linhas,
+            )
+            # Eventos das vendas regravadas não podem mais ser desfeitos nem refeitos
+            # (o diário tem poucas vendas: o cruzamento é feito em memória)
+            no_diario = {i for (i,) in conn.execute(f"SELECT DISTINCT id_linha FROM diario_vendas WHERE desfeito <> {SUPERADO}")}
+            superadas = list(no_diario.intersection(linha[2] for linha in linhas))
+            conn.executemany(f"UPDATE diario_vendas SET desfeito = {SUPERADO} WHERE id_linha = ?", ((i,) for i in superadas))
+        return len(linhas)
+
+    def agregar_vendas_mensal(self):
+        # Somas por (ano, mes, produto), nas colunas do cubo mensal, sem carregar as vendas
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.row_factory = None
+            return cursor.execute(
+                """
+                SELECT ano, mes, produto, SUM(faturamento), SUM(custo_total), SUM(margem_total), SUM(qtd)
+                FROM vendas GROUP BY ano, mes, produto
+                """
+            ).fetchall()
+
+    # --- Diário de Vendas ---
+    # Toda alteração avulsa de uma venda grava, na mesma transação, a venda e o evento.
+    # As operações devolvem (antes, depois): a venda como estava e como ficou (None = não existe).
+    def estornar_venda(self, id_linha):
+        with self.transacao() as conn:
+            antes = self._linha_venda(conn, id_linha)
+            if antes is None:
+                raise ValueError(f"Venda {id_linha} não encontrada.")
+            conn.execute("DELETE FROM vendas WHERE id = ?", (id_linha,))
+            self._registrar_evento(conn, "estorno", id_linha, antes, None)
+            return antes, None
+
+    def corrigir_venda(self, id_linha, campos):
+        # `campos`: qualquer um de data, produto, produto_id, qtd, preco_unitario, custo_unitario
+        with self.transacao() as conn:
+            antes = self._linha_venda(conn, id_linha)
+            if antes is None:
+                raise ValueError(f"Venda {id_linha} não encontrada.")
+            depois = self._gravar_venda(conn, {**antes, **campos})
+            self._registrar_evento(conn, "correcao", id_linha, antes, depois)
+            return antes, depois
+
+    def desfazer_evento(self):
+        # Reverte o evento mais recente ainda em vigor; devolve (evento, antes, depois) ou None
+        with self.transacao() as conn:
+            evento = conn.execute(SQL_A_DESFAZER.format("id, tipo, id_linha, antes, depois")).fetchone()
+            if evento is None:
+                return None
+            return self._reaplicar(conn, evento, desfazer=True)
+
+    def refazer_evento(self):
+        with self.transacao() as conn:
+            evento = conn.execute(SQL_A_REFAZER.format("id, tipo, id_linha, antes, depois")).fetchone()
+            if evento is None:
+                return None
+            return self._reaplicar(conn, evento, desfazer=False)
+
+    def pilhas_diario(self):
+        # Próximos eventos a desfazer e a refazer (dicts com id, tipo, id_linha, momento), ou None
+        with self._lock:
+            desfazer = self.conn.execute(SQL_A_DESFAZER.format("id, tipo, id_linha, momento")).fetchone()
+            refazer = self.conn.execute(SQL_A_REFAZER.format("id, tipo, id_linha, momento")).fetchone()
+        return (dict(desfazer) if desfazer else None), (dict(refazer) if refazer else None)
+
+    def listar_diario(self, limite=50):
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT id, momento, tipo, id_linha, antes, depois, desfeito FROM diario_vendas ORDER BY id DESC LIMIT ?",
+                (limite,)
+            )
+            return [{**dict(e), "antes": json.loads(e["antes"] or "null"), "depois": json.loads(e["depois"] or "null")} for e in cursor]
+
+    def _linha_venda(self, conn, id_linha):
+        linha = conn.execute(f"SELECT id, produto_id, {', '.join(COLUNAS_VENDA)} FROM vendas WHERE id = ?", (id_linha,)).fetchone()
+        return dict(linha) if linha else None
+
+    def _gravar_venda(self, conn, venda):
+        # Grava a venda com o id dela (incluindo ou substituindo), recalculando mês, ano e totais.
+        # O nome de exibição acompanha o catálogo; um produto que saiu do catálogo perde o vínculo.
+        venda = dict(venda)
+        if venda.get("produto_id") is not None:
+            produto = conn.execute("SELECT nome FROM produtos WHERE id = ?", (venda["produto_id"],)).fetchone()
+            if produto is None:
+                venda["produto_id"] = None
+            else:
+                venda["produto"] = produto["nome"]
+        venda["ano"], venda["mes"] = int(venda["data"][:4]), int(venda["data"][5:7])
+        venda["faturamento"] = venda["preco_unitario"] * venda["qtd"]
+        venda["custo_total"] = venda["custo_unitario"] * venda["qtd"]
+        venda["margem_total"] = venda["faturamento"] - venda["custo_total"]
+        colunas = ["id", "produto_id", *COLUNAS_VENDA]
+        conn.execute(
+            f"INSERT OR REPLACE INTO vendas ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            [venda.get(c) for c in colunas]
+        )
+        return {c: venda.get(c) for c in colunas}
+
+    def _registrar_evento(self, conn, tipo, id_linha, antes, depois):
+        # Só acrescenta: eventos desfeitos anteriores a este deixam de ser refeitos (ver SQL_A_REFAZER)
+        id_evento = conn.execute(
+            "INSERT INTO diario_vendas (momento, tipo, id_linha, antes, depois) VALUES (datetime('now', 'localtime'), ?, ?, ?, ?)",
+            (tipo, id_linha, None if antes is None else json.dumps(antes), None if depois is None else json.dumps(depois))
+        ).lastrowid
+        # Compactação periódica: a cada LIMITE_DIARIO eventos, guarda só os LIMITE_DIARIO mais recentes
+        if id_evento % LIMITE_DIARIO == 0:
+            self._compactar_diario(conn, LIMITE_DIARIO)
+
+    def _compactar_diario(self, conn, manter):
+        # Descarta os eventos mais antigos; o estado deles já está na tabela de vendas
+        ultimo = conn.execute("SELECT COALESCE(MAX(id), 0) FROM diario_vendas").fetchone()[0]
+        return conn.execute("DELETE FROM diario_vendas WHERE id <= ?", (ultimo - manter,)).rowcount
+
+    def _reaplicar(self, conn, evento, desfazer):
+        antes, depois = json.loads(evento["antes"] or "null"), json.loads(evento["depois"] or "null")
+        esperado, alvo = (depois, antes) if desfazer else (antes, depois)
+        atual = self._linha_venda(conn, evento["id_linha"])
+        # Se a venda mudou por fora do diário (reprecificação, restauração), não sobrescreve
+        if (atual is None) != (esperado is None) or (
+            atual is not None and any(atual[c] != esperado[c] for c in CAMPOS_COMPARADOS)
+        ):
+            raise ValueError(f"A venda {evento['id_linha']} foi alterada depois desse evento e não pode ser revertida.")
+        if alvo is None:
+            conn.execute("DELETE FROM vendas WHERE id = ?", (evento["id_linha"],))
+        else:
+            alvo = self._gravar_venda(conn, alvo)
+        conn.execute("UPDATE diario_vendas SET desfeito = ? WHERE id = ?", (DESFEITO if desfazer else EM_VIGOR, evento["id"]))
+        return dict(evento), atual, alvo
+
+    # --- Produtos ---
+    def listar_produtos(self):
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT id, nome, preco_venda, custos_lista, custo_total, margem FROM produtos ORDER BY id"
+            )
+            produtos = []
+            for linha in cursor:
+                p = dict(linha)
+                p["custos_lista"] = json.loads(p["custos_lista"])
+                produtos.append(p)
+            return produtos
+
+    def salvar_produto(self, prod_obj, id_produto=None):
+        valores = (
+            prod_obj["nome"],
+            float(prod_obj["preco_venda"]),
+            json.dumps(prod_obj.get("custos_lista", []), default=str),
+            float(prod_obj.get("custo_total", 0.0)),
+            float(prod_obj.get("margem", 0.0)),
+        )
+        with self.transacao() as conn:
+            if id_produto is None:
+                cursor = conn.execute(
+                    "INSERT INTO produtos (nome, preco_venda, custos_lista, custo_total, margem) VALUES (?, ?, ?, ?, ?)",
+                    valores
+                )
+                # Vendas antigas com esse nome e sem produto passam a apontar para ele
+                conn.execute(
+                    "UPDATE vendas SET produto_id = ? WHERE produto = ? AND produto_id IS NULL",
+                    (cursor.lastrowid, prod_obj["nome"])
+                )
+                return cursor.lastrowid
+            conn.execute(
+                "UPDATE produtos SET nome = ?, preco_venda = ?, custos_lista = ?, custo_total = ?, margem = ? WHERE id = ?",
+                valores + (id_produto,)
+            )
+            # Renomear mantém o histórico: o nome de exibição acompanha o id
+            conn.execute("UPDATE vendas SET produto = ? WHERE produto_id = ? AND produto <> ?", (prod_obj["nome"], id_produto, prod_obj["nome"]))
+            return id_produto
+
+    def excluir_produto(self, id_produto):
+        # As vendas guardam o nome do produto, então o histórico continua legível
+        with self.transacao() as conn:
+            conn.execute("UPDATE vendas SET produto_id = NULL WHERE produto_id = ?", (id_produto,))
+            conn.execute("DELETE FROM produtos WHERE id = ?", (id_produto,))
+
+    def _inserir_produtos(self, conn, produtos):
+        conn.executemany(
+            "INSERT INTO produtos (nome, preco_venda, custos_lista, custo_total, margem) VALUES (?, ?, ?, ?, ?)",
+            (
+                (p["nome"], float(p.get("preco_venda", 0.0)), json.dumps(p.get("custos_lista", []), default=str),
+                 float(p.get("custo_total", 0.0)), float(p.get("margem", 0.0)))
+                for p in produtos
+            )
+        )
+
+    # --- Custos Fixos ---
+    def listar_custos_fixos(self, mes=None, incluir_ids=False):
+        # Contas vigentes no mês (AAAA-MM); por padrão, no mês atual
+        mes = mes or mes_atual()
+        colunas = (["id"] if incluir_ids else []) + ["descricao", "valor"]
+        with self._lock:
+            cursor = self.conn.execute(
+                f"SELECT {', '.join(colunas)} FROM custos_fixos WHERE {SQL_VIGENTE} ORDER BY id", (mes, mes)
+            )
+            return [dict(linha) for linha in cursor]
+
+    def historico_custos_fixos(self):
+        with self._lock:
+            cursor = self.conn.execute("SELECT descricao, valor, vigencia_inicio, vigencia_fim FROM custos_fixos ORDER BY id")
+            return [dict(linha) for linha in cursor]
+
+    # Alterações conta a conta. Com `a_partir_de` (AAAA-MM) a mudança vale desse mês em
+    # diante e a versão anterior é encerrada no mês anterior; sem ele, é uma correção
+    # feita na própria versão, valendo para todo o período dela.
+    def alterar_custo_fixo(self, id_custo, descricao, valor, a_partir_de=None):
+        # Devolve o id da versão que passa a valer
+        with self.transacao() as conn:
+            atual = conn.execute(
+                "SELECT descricao, valor, vigencia_fim FROM custos_fixos WHERE id = ?", (id_custo,)
+            ).fetchone()
+            if atual is None or (atual["descricao"], atual["valor"]) == (descricao, valor):
+                return id_custo
+            if a_partir_de is None:
+                conn.execute("UPDATE custos_fixos SET descricao = ?, valor = ? WHERE id = ?", (descricao, valor, id_custo))
+                return id_custo
+            fim = atual["vigencia_fim"]
+            if fim is not None and fim < a_partir_de:
+                raise ValueError(f"A conta {atual['descricao']} não está vigente em {a_partir_de}.")
+            self._encerrar_custo_fixo(conn, id_custo, a_partir_de)
+            # A nova versão termina onde a substituída terminava, antes da versão seguinte da conta
+            return self._incluir_custo_fixo(conn, descricao, valor, a_partir_de, fim)
+
+    def encerrar_custo_fixo(self, id_custo, a_partir_de=None):
+        with self.transacao() as conn:
+            if a_partir_de is None:
+                conn.execute("DELETE FROM custos_fixos WHERE id = ?", (id_custo,))
+            else:
+                self._encerrar_custo_fixo(conn, id_custo, a_partir_de)
+
+    def incluir_custo_fixo(self, descricao, valor, a_partir_de=None):
+        with self.transacao() as conn:
+            return self._incluir_custo_fixo(conn, descricao, valor, a_partir_de)
+
+    def _encerrar_custo_fixo(self, conn, id_custo, mes):
+        linha = conn.execute("SELECT vigencia_inicio, vigencia_fim FROM custos_fixos WHERE id = ?", (id_custo,)).fetchone()
+        if linha is None or (linha["vigencia_fim"] is not None and linha["vigencia_fim"] < mes):
+            # Versão que já terminou antes de `mes`: encerrar não pode estendê-la
+            return
+        if linha["vigencia_inicio"] is not None and linha["vigencia_inicio"] >= mes:
+            # Versão que nem chegou a valer antes de `mes`: sai sem deixar histórico
+            conn.execute("DELETE FROM custos_fixos WHERE id = ?", (id_custo,))
+        else:
+            conn.execute("UPDATE custos_fixos SET vigencia_fim = ? WHERE id = ?", (mes_anterior(mes), id_custo))
+
+    def _incluir_custo_fixo(self, conn, descricao, valor, mes, fim=None):
+        cursor = conn.execute(
+            "INSERT INTO custos_fixos (descricao, valor, vigencia_inicio, vigencia_fim) VALUES (?, ?, ?, ?)",
+            (descricao, valor, mes, fim)
+        )
+        return cursor.lastrowid
+
+    def _inserir_custos_fixos(self, conn, custos):
+        conn.executemany(
+            "INSERT INTO custos_fixos (descricao, valor, vigencia_inicio, vigencia_fim) VALUES (?, ?, ?, ?)",
+            ((c["descricao"], float(c.get("valor") or 0.0), c.get("vigencia_inicio"), c.get("vigencia_fim")) for c in custos)
+        )
+
+    # --- Configurações ---
+    def obter_config(self, chave, padrao=None):
+        with self._lock:
+            linha = self.conn.execute("SELECT valor FROM config WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha["valor"]) if linha else padrao
+
+    def definir_config(self, chave, valor):
+        with self.transacao() as conn:
+            conn.execute(
+                "INSERT INTO config (chave, valor) VALUES (?, ?) ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor",
+                (chave, json.dumps(valor))
+            )
+
+    # --- Operações em Massa ---
+    def resetar(self):
+        with self.transacao() as conn:
+            conn.execute("DELETE FROM diario_vendas")
+            conn.execute("DELETE FROM vendas")
+            conn.execute("DELETE FROM produtos")
+            conn.execute("DELETE FROM custos_fixos")
+
+    @contextmanager
+    def carga_completa(self):
+        # Substitui todo o conteúdo em uma única transação (tudo ou nada)
+        with self.transacao() as conn:
+            conn.execute("DELETE FROM diario_vendas")
+            conn.execute("DELETE FROM vendas")
+            conn.execute("DELETE FROM produtos")
+            conn.execute("DELETE FROM custos_fixos")
+            yield CargaEmLote(self, conn)
+            conn.execute(SQL_VINCULAR_PRODUTOS, (0,))
+
+
+class CargaEmLote:
+    # Inserções em massa dentro da transação aberta por BancoDados.carga_completa
+    def __init__(self, banco, conn):
+        self.banco = banco
+        self.conn = conn
+
+    def custos_fixos(self, custos):
+        self.banco._inserir_custos_fixos(self.conn, custos)
+
+    def produtos(self, produtos):
+        self.banco._inserir_produtos(self.conn, produtos)
+
+    def vendas(self, linhas):
+        # Tuplas na ordem de COLUNAS_VENDA
+        self.conn.executemany(SQL_INSERIR_VENDA, linhas)
+
+    def meta(self, valor):
+        self.conn.execute(
+            "INSERT INTO config (chave, valor) VALUES ('meta', ?) ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor",
+            (json.dumps(valor),)
+        )
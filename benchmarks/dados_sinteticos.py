@@ -0,0 +1,92 @@
+# Gerador determinístico (semente fixa) de catálogo, custos fixos e vendas com
+# cara de dados reais: preços log-normais, poucos produtos concentrando as vendas,
+# mais festas em dezembro/janeiro e nos fins de semana, 1% de vendas avulsas
+# (fora do catálogo) e metade das contas fixas com um reajuste no meio do histórico.
+import os
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from banco_dados import BancoDados  # noqa: E402
+
+# Peso de cada mês (jan..dez) na escolha da data da venda
+SAZONALIDADE = np.array([1.3, 0.8, 0.8, 0.9, 1.0, 1.0, 1.1, 0.9, 0.9, 1.0, 1.2, 1.6])
+CONTAS_FIXAS = ["Aluguel", "Folha de Pagamento", "Energia", "Água", "Internet", "Contador", "Seguro", "Marketing"]
+TAMANHO_LOTE = 100_000
+
+
+def gerar_catalogo(n_produtos, rng):
+    precos = np.round(rng.lognormal(np.log(2500), 0.6, n_produtos), 2)
+    custos = np.round(precos * rng.uniform(0.3, 0.85, n_produtos), 2)
+    return [
+        {
+            "nome": f"Produto {i:04d}", "preco_venda": float(preco),
+            "custos_lista": [{"item": "Insumos", "valor": float(custo)}],
+            "custo_total": float(custo), "margem": float(preco - custo),
+        }
+        for i, (preco, custo) in enumerate(zip(precos, custos))
+    ]
+
+
+def gerar_custos_fixos(inicio, fim, rng):
+    meio = inicio + (fim - inicio) / 2
+    mes_reajuste = f"{meio.year}-{meio.month:02d}"
+    mes_anterior = f"{meio.year - 1}-12" if meio.month == 1 else f"{meio.year}-{meio.month - 1:02d}"
+    custos = []
+    for i, descricao in enumerate(CONTAS_FIXAS):
+        valor = float(np.round(rng.uniform(200, 8000), 2))
+        if i % 2:
+            custos.append({"descricao": descricao, "valor": valor, "vigencia_fim": mes_anterior})
+            custos.append({"descricao": descricao, "valor": round(valor * 1.08, 2), "vigencia_inicio": mes_reajuste})
+        else:
+            custos.append({"descricao": descricao, "valor": valor})
+    return custos
+
+
+def gerar_vendas(n_vendas, catalogo, inicio, fim, rng):
+    # Lotes de tuplas na ordem de COLUNAS_VENDA, em ordem de data
+    dias = np.arange(np.datetime64(inicio), np.datetime64(fim), dtype="datetime64[D]")
+    meses = dias.astype("datetime64[M]").astype(int) % 12
+    fim_de_semana = ((dias.astype(int) + 3) % 7) >= 5  # 1970-01-01 foi quinta-feira
+    peso = SAZONALIDADE[meses] * np.where(fim_de_semana, 2.5, 1.0)
+    dia_venda = np.sort(rng.choice(dias, n_vendas, p=peso / peso.sum()))
+
+    popularidade = 1 / np.arange(1, len(catalogo) + 1) ** 0.8
+    produto = rng.choice(len(catalogo), n_vendas, p=popularidade / popularidade.sum())
+    avulsa = rng.random(n_vendas) < 0.01
+    qtd = rng.choice([1, 2, 3], n_vendas, p=[0.8, 0.15, 0.05])
+    precos = np.array([p["preco_venda"] for p in catalogo])
+    custos = np.array([p["custo_total"] for p in catalogo])
+    preco = np.round(precos[produto] * (1 + rng.normal(0, 0.03, n_vendas)), 2)
+    custo = custos[produto]
+    nomes = np.array([p["nome"] for p in catalogo], dtype=object)
+    nome = np.where(avulsa, "Serviço Avulso", nomes[produto])
+
+    datas = np.datetime_as_string(dia_venda, unit="D")
+    for inicio_lote in range(0, n_vendas, TAMANHO_LOTE):
+        fatia = slice(inicio_lote, inicio_lote + TAMANHO_LOTE)
+        lote = []
+        for i, data, nome_produto, q, p, c in zip(
+            range(inicio_lote, n_vendas), datas[fatia], nome[fatia], qtd[fatia].tolist(), preco[fatia].tolist(), custo[fatia].tolist()
+        ):
+            lote.append((i, data, int(data[5:7]), int(data[:4]), nome_produto, q, p, c, p * q, c * q, (p - c) * q))
+        yield lote
+
+
+def criar_banco(caminho, n_vendas, n_produtos=500, anos=3, semente=42, meta=35000.0):
+    # Banco novo em `caminho` com o conjunto gerado; devolve o BancoDados aberto
+    rng = np.random.default_rng(semente)
+    fim = date.today().replace(day=1)
+    inicio = fim - timedelta(days=365 * anos)
+    catalogo = gerar_catalogo(n_produtos, rng)
+    banco = BancoDados(caminho)
+    with banco.carga_completa() as carga:
+        carga.custos_fixos(gerar_custos_fixos(inicio, fim, rng))
+        carga.produtos(catalogo)
+        for lote in gerar_vendas(n_vendas, catalogo, inicio, fim, rng):
+            carga.vendas(lote)
+        carga.meta(meta)
+    return banco
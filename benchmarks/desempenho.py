@@ -0,0 +1,154 @@
+# Tempo e pico de memória de cada caminho quente do app sobre dados sintéticos
+# (benchmarks/dados_sinteticos.py), para vários tamanhos de histórico:
+#
+#   python benchmarks/desempenho.py --vendas 10000 100000 1000000 [--produtos 500]
+#                                   [--repeticoes 3] [--so dre] [--csv resultados.csv]
+#
+# Tempo = mediana das repetições; pico = maior alocação Python/NumPy durante uma
+# execução extra sob tracemalloc (medida à parte para não distorcer o tempo).
+import argparse
+import csv
+import gc
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calculos  # noqa: E402
+import dre  # noqa: E402
+import previsao  # noqa: E402
+import reprecificacao  # noqa: E402
+from backup import gerar_backup, restaurar_backup  # noqa: E402
+from banco_dados import BancoDados  # noqa: E402
+from catalogo import CatalogoProdutos  # noqa: E402
+from cubo_mensal import CuboMensal  # noqa: E402
+from dados_sinteticos import criar_banco  # noqa: E402
+from dados_vendas import CacheVendas  # noqa: E402
+from graficos import go, px  # noqa: E402
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    gc.collect()
+    tracemalloc.start()
+    funcao()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(tempos), pico
+
+
+def figuras(cubo, ano):
+    # As mesmas figuras do dashboard e dos relatórios, só montadas (sem renderizar)
+    serie = cubo.serie_mensal(ano)
+    anual = go.Figure()
+    anual.add_trace(go.Bar(x=serie.index, y=serie.values, name="Faturamento"))
+    anual.add_trace(go.Scatter(x=serie.index, y=[35000.0] * 12, name="Meta"))
+    por_produto = cubo.por_produto()
+    ranking = px.bar(por_produto.sort_values("margem_total"), x="margem_total", y="produto", orientation="h", color="margem_total")
+    por_produto["margem_perc"] = por_produto["margem_total"] / por_produto["faturamento"] * 100
+    eficiencia = px.scatter(por_produto, x="margem_perc", y="margem_total", size="faturamento", color="produto")
+    return anual, ranking, eficiencia
+
+
+def etapas(banco, pasta):
+    # (nome, função sem argumentos); o estado comum é montado uma vez por tamanho
+    vendas = CacheVendas(banco)
+    catalogo = CatalogoProdutos(banco)
+    cubo = vendas.cubo
+    df_vendas = vendas.df
+    df_cubo = cubo.df
+    historico = banco.historico_custos_fixos()
+    matriz = dre.matriz_mensal(df_cubo, historico)
+    ultimo = matriz.index.max()
+    custo_fixo = sum(c["valor"] for c in banco.listar_custos_fixos())
+    tabela_precos = reprecificacao.tabela_do_catalogo(catalogo.df, f"{ultimo.year}-01-01")
+    backup_ndjson = gerar_backup(banco, 35000.0, "ndjson.gz").read()
+    backup_json = gerar_backup(banco, 35000.0, "json").read()
+    destino = BancoDados(os.path.join(pasta, "restauracao.db"))
+
+    def df_vendas_nova_versao():
+        # vendas.df é memorizado por versão: simula uma escrita para medir a montagem
+        vendas.versao += 1
+        return vendas.df
+
+    def eficiencia():
+        df = cubo.por_produto()
+        df["margem_perc"] = (df["margem_total"] / df["faturamento"].where(df["faturamento"] > 0) * 100).fillna(0)
+        return df
+
+    return [
+        ("Carga do cache de vendas", lambda: CacheVendas(banco)),
+        ("DataFrame de vendas (vendas.df)", df_vendas_nova_versao),
+        ("Cubo mensal: construção", lambda: CuboMensal().construir(df_vendas)),
+        ("Cubo: total do mês", lambda: cubo.total_mes(ultimo.year, ultimo.month)),
+        ("Cubo: série do gráfico anual", lambda: cubo.serie_mensal(ultimo.year)),
+        ("Eficiência por produto", eficiencia),
+        ("DRE: matriz mensal", lambda: dre.matriz_mensal(df_cubo, historico)),
+        ("DRE: período e ano anterior", lambda: dre.comparar_ano_anterior(matriz, ultimo - 11, ultimo)),
+        ("Ponto de equilíbrio por produto", lambda: calculos.tabela_ponto_equilibrio(catalogo.df, custo_fixo)),
+        ("Mix de produtos (otimizador)", lambda: calculos.otimizar_mix(catalogo.df, custo_fixo, 40, 3, objetivo="equilibrio")),
+        ("Previsão de receita", lambda: previsao.prever(df_cubo)),
+        ("Reprecificação do histórico", lambda: reprecificacao.reprecificar(df_vendas, tabela_precos)),
+        ("Histórico: primeira página", lambda: banco.pagina_vendas(50)),
+        ("Fechamento do mês (CLI)", lambda: calculos.fechamento(banco, f"{ultimo.year}-{ultimo.month:02d}")),
+        ("Figuras Plotly", lambda: figuras(cubo, ultimo.year)),
+        ("Backup NDJSON.gz", lambda: gerar_backup(banco, 35000.0, "ndjson.gz").close()),
+        ("Backup JSON", lambda: gerar_backup(banco, 35000.0, "json").close()),
+        ("Restauração NDJSON.gz", lambda: restaurar_backup(destino, io.BytesIO(backup_ndjson))),
+        # Backups antigos num único documento JSON (caminho de compatibilidade do backup.py)
+        ("Restauração JSON", lambda: restaurar_backup(destino, io.BytesIO(backup_json))),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos quentes com dados sintéticos.")
+    parser.add_argument("--vendas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--so", help="mede só as etapas cujo nome contém este texto")
+    parser.add_argument("--csv", help="grava os resultados (formato longo) neste arquivo")
+    args = parser.parse_args()
+
+    resultados = []
+    for n_vendas in args.vendas:
+        with tempfile.TemporaryDirectory() as pasta:
+            inicio = time.perf_counter()
+            banco = criar_banco(os.path.join(pasta, "bench.db"), n_vendas, args.produtos, semente=args.semente)
+            print(f"{n_vendas:,} vendas / {args.produtos} produtos gerados em {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+            for nome, funcao in etapas(banco, pasta):
+                if args.so and args.so.lower() not in nome.lower():
+                    continue
+                segundos, pico = medir(funcao, args.repeticoes)
+                resultados.append({"etapa": nome, "vendas": n_vendas, "tempo_ms": segundos * 1000, "pico_mb": pico / 2**20})
+            banco.fechar()
+
+    tabela = pd.DataFrame(resultados)
+    larga = tabela.pivot(index="etapa", columns="vendas", values=["tempo_ms", "pico_mb"])
+    larga = larga.reindex(tabela["etapa"].drop_duplicates())
+    larga.columns = [f"{'ms' if medida == 'tempo_ms' else 'MB'} @ {n:,}" for medida, n in larga.columns]
+    ordem = [f"{unidade} @ {n:,}" for n in args.vendas for unidade in ("ms", "MB")]
+    print(larga[ordem].to_string(float_format=lambda v: f"{v:,.1f}" if np.isfinite(v) else "-"))
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=["etapa", "vendas", "tempo_ms", "pico_mb"])
+            escritor.writeheader()
+            escritor.writerows(resultados)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Partida a frio do app: tempo de import de cada dependência e, numa sessão
+# simulada (AppTest), o tempo até o primeiro elemento da sidebar, até o fim da
+# primeira execução e de uma reexecução. Cada medida roda num processo novo.
+#
+#   python benchmarks/inicializacao.py [--vendas 20000] [--produtos 500] [--repeticoes 3] [--json saida.json]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from dados_sinteticos import criar_banco
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS = [
+    "streamlit", "numpy", "pandas", "plotly.express", "plotly.graph_objects",
+    "banco_dados", "dados_vendas", "dre", "simulacao", "previsao", "exportacao",
+]
+
+# Roda no processo filho: o Streamlit já importado faz parte do servidor, não do script
+SESSAO = """
+import json, sys, time
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+from streamlit.testing.v1 import AppTest
+
+marcas = {}
+enqueue_original = ScriptRunContext.enqueue
+def enqueue(self, msg):
+    if "sidebar" not in marcas and msg.HasField("delta") and msg.metadata.delta_path[:1] == [1]:
+        marcas["sidebar"] = time.perf_counter()
+    return enqueue_original(self, msg)
+ScriptRunContext.enqueue = enqueue
+
+at = AppTest.from_file(sys.argv[1], default_timeout=300)
+inicio = time.perf_counter()
+at.run()
+fim = time.perf_counter()
+at.run()
+resultado = {
+    "sidebar": marcas["sidebar"] - inicio,
+    "primeira_execucao": fim - inicio,
+    "reexecucao": time.perf_counter() - fim,
+    "plotly_carregado": "plotly" in sys.modules,
+    "erros": [e.value for e in at.exception],
+}
+print(json.dumps(resultado))
+"""
+
+
+def tempo_import(modulo):
+    # Tempo acumulado (s) do import em um interpretador novo, via -X importtime
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stderr
+    for linha in reversed(saida.splitlines()):
+        partes = [p.strip() for p in linha.split("|")]
+        if len(partes) == 3 and partes[2] == modulo:
+            return int(partes[1]) / 1e6
+    return float("nan")
+
+
+def medir_sessao(caminho_banco):
+    saida = subprocess.run(
+        [sys.executable, "-c", SESSAO, os.path.join(RAIZ, "streamlit_GestaoApp.py")],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+        env={**os.environ, "GESTAO_DB": caminho_banco},
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partida a frio do app: imports e primeira execução.")
+    parser.add_argument("--vendas", type=int, default=20000)
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    imports = {m: statistics.median(tempo_import(m) for _ in range(args.repeticoes)) for m in MODULOS}
+    print("Import (processo novo, mediana):")
+    for modulo, segundos in imports.items():
+        print(f"  {modulo:<22} {segundos * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        criar_banco(caminho, args.vendas, args.produtos).fechar()
+        sessoes = [medir_sessao(caminho) for _ in range(args.repeticoes)]
+    erros = [e for s in sessoes for e in s["erros"]]
+    if erros:
+        sys.exit(f"O app falhou durante a medição: {erros[0]}")
+    sessao = {k: statistics.median(s[k] for s in sessoes) for k in ["sidebar", "primeira_execucao", "reexecucao"]}
+    print(f"Sessão nova com {args.vendas:,} vendas (mediana de {args.repeticoes}):")
+    print(f"  primeiro elemento da sidebar {sessao['sidebar'] * 1000:8.1f} ms")
+    print(f"  primeira execução completa   {sessao['primeira_execucao'] * 1000:8.1f} ms")
+    print(f"  reexecução                   {sessao['reexecucao'] * 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump({"vendas": args.vendas, "imports": imports, "sessao": sessao}, arquivo, indent=2)
+
+
+if __name__ == "__main__":
+    main()
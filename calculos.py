@@ -0,0 +1,225 @@
+# Cálculos do negócio sem Streamlit: funções puras sobre DataFrames/arrays, usadas
+# pelo app e pela linha de comando (fechamento do mês sem abrir o navegador):
+#
+#   python calculos.py --mes 2026-09 --saida fechamento/ --formato csv
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import dre
+from cubo_mensal import CHAVES, MEDIDAS
+from simulacao import lucro_cenario
+
+MARGEM_PADRAO = 0.40  # margem média assumida quando ainda não há vendas
+
+
+# --- KPIs ---
+def ponto_equilibrio(custo_fixo, receita, custo_variavel):
+    # Receita que cobre o custo fixo com a margem de contribuição % observada
+    margem_perc = (receita - custo_variavel) / receita if receita > 0 else 0.0
+    return custo_fixo / margem_perc if margem_perc > 0 else 0.0
+
+
+def kpis_mes(receita, custo_variavel, custo_fixo):
+    margem = receita - custo_variavel
+    lucro = margem - custo_fixo
+    pe = ponto_equilibrio(custo_fixo, receita, custo_variavel)
+    return {
+        "receita": receita,
+        "custo_variavel": custo_variavel,
+        "custo_fixo": custo_fixo,
+        "custos_totais": custo_fixo + custo_variavel,
+        "margem_contribuicao": margem,
+        "lucro": lucro,
+        "margem_liquida_perc": lucro / receita * 100 if receita > 0 else 0.0,
+        "ponto_equilibrio": pe,
+        "folga_ponto_equilibrio": receita - pe,
+    }
+
+
+def margem_media(totais):
+    # Margem de contribuição média do histórico (totais do cubo)
+    return totais["margem_total"] / totais["faturamento"] if totais["faturamento"] > 0 else MARGEM_PADRAO
+
+
+# --- Simulador ---
+def cenario(base_vendas, margem, custo_fixo, fator_vendas, fator_preco, fator_custo):
+    # Fatores como variação decimal (0.10 = +10%), na mesma fórmula do Monte Carlo
+    receita = base_vendas * (1 + fator_vendas) * (1 + fator_preco)
+    lucro = lucro_cenario(base_vendas, margem, custo_fixo, fator_vendas, fator_preco, fator_custo)
+    return {
+        "receita": receita,
+        "lucro": lucro,
+        "lucro_base": base_vendas * margem - custo_fixo,
+        "margem_liquida_perc": lucro / receita * 100 if receita > 0 else 0.0,
+    }
+
+
+def tabela_ponto_equilibrio(df_catalogo, custo_fixo):
+    # Quantidade de cada produto que sozinha cobriria o custo fixo
+    preco = df_catalogo["preco_venda"].to_numpy(dtype=float)
+    custo = df_catalogo["custo_total"].to_numpy(dtype=float)
+    margem_unit = preco - custo
+    positiva = margem_unit > 0
+    qtd = np.full(len(preco), np.inf)
+    qtd[positiva] = custo_fixo / margem_unit[positiva]
+    return pd.DataFrame({
+        "Produto": df_catalogo["nome"].to_numpy(),
+        "Preço Venda": preco,
+        "Custo Variável": custo,
+        "Margem Unitária": margem_unit,
+        "Qtd Necessária (PE)": qtd,
+        "Meta Faturamento (PE)": np.where(positiva, qtd * preco, 0.0),
+        "Dificuldade": np.select(
+            [~positiva, qtd < 10, qtd < 30], ["Impossível (Margem Negativa)", "Baixa", "Média"], "Alta"
+        ),
+    })
+
+
+# --- Mix de produtos ---
+OBJETIVOS_MIX = {"lucro": "Maior lucro", "equilibrio": "Equilíbrio com menos eventos"}
+
+
+def otimizar_mix(df_catalogo, custo_fixo, capacidade, maximo, minimo=0, objetivo="lucro"):
+    # Quantos eventos de cada produto vender no mês com `capacidade` datas no total e
+    # entre `minimo` e `maximo` eventos por produto (escalares ou arrays na ordem do catálogo).
+    # Cada evento ocupa uma data, então preencher as datas livres pela maior margem unitária
+    # é a solução inteira ótima: o maior lucro possível, ou o ponto de equilíbrio com o menor
+    # número de eventos. Uma ordenação e somas acumuladas, sem laço por produto.
+    preco = df_catalogo["preco_venda"].to_numpy(dtype=float)
+    margem = preco - df_catalogo["custo_total"].to_numpy(dtype=float)
+    n = len(preco)
+    minimo = np.broadcast_to(np.asarray(minimo, dtype=np.int64), n)
+    maximo = np.maximum(np.broadcast_to(np.asarray(maximo, dtype=np.int64), n), minimo)
+    qtd = minimo.copy()
+    livres = int(capacidade) - int(qtd.sum())
+
+    if livres > 0:
+        ordem = np.argsort(-margem, kind="stable")
+        ordem = ordem[margem[ordem] > 0]
+        extra = (maximo - minimo)[ordem]
+        if objetivo == "equilibrio":
+            falta = custo_fixo - float(margem @ qtd)
+            ganho = np.cumsum(extra * margem[ordem])
+            # Primeiro produto em que o acumulado cobre o que falta: ele entra só com o necessário
+            k = int(np.searchsorted(ganho, falta)) if falta > 0 else 0
+            if k < len(ordem):
+                anterior = ganho[k - 1] if k else 0.0
+                necessario = np.ceil((falta - anterior) / margem[ordem[k]] - 1e-9) if falta > 0 else 0
+                extra = np.concatenate([extra[:k], [min(necessario, extra[k])], np.zeros(len(ordem) - k - 1, dtype=np.int64)])
+        # Corta o que passar das datas livres, na mesma ordem de margem
+        antes = np.cumsum(extra) - extra
+        qtd[ordem] += np.clip(livres - antes, 0, extra).astype(np.int64)
+
+    margem_total = float(margem @ qtd)
+    tabela = pd.DataFrame({
+        "Produto": df_catalogo["nome"].to_numpy(),
+        "Margem Unitária": margem,
+        "Mínimo": minimo,
+        "Máximo": maximo,
+        "Qtd": qtd,
+        "Faturamento": qtd * preco,
+        "Margem": qtd * margem,
+    })
+    resumo = {
+        "viavel": livres >= 0,  # os mínimos cabem na capacidade
+        "eventos": int(qtd.sum()),
+        "faturamento": float(qtd @ preco),
+        "margem_contribuicao": margem_total,
+        "lucro": margem_total - custo_fixo,
+        "atinge_equilibrio": margem_total >= custo_fixo,
+    }
+    return tabela, resumo
+
+
+# --- DRE ---
+def dre_periodo(df_cubo, custo_fixo_mensal, inicio=None, fim=None):
+    # DRE somada do intervalo, com análise vertical e ponto de equilíbrio do período
+    valores = dre.periodo(dre.matriz_mensal(df_cubo, custo_fixo_mensal, inicio, fim), inicio, fim)
+    tabela = pd.DataFrame({
+        "linha": dre.LINHAS,
+        "conceito": [dre.ROTULOS[l] for l in dre.LINHAS],
+        "valor": valores[dre.LINHAS].to_numpy(),
+        "analise_vertical_perc": dre.analise_vertical(valores)[dre.LINHAS].to_numpy(),
+    })
+    return tabela, dre.ponto_equilibrio(valores)
+
+
+# --- Linha de comando ---
+def fechamento(banco, mes, inicio=None):
+    # KPIs do mês, DRE de `inicio` (padrão: janeiro do mesmo ano) até o mês e tabela de PE
+    inicio = inicio or f"{mes[:4]}-01"
+    df_cubo = pd.DataFrame(banco.agregar_vendas_mensal(), columns=CHAVES + MEDIDAS)
+    do_mes = df_cubo[(df_cubo["ano"] == int(mes[:4])) & (df_cubo["mes"] == int(mes[5:7]))]
+    custo_fixo = sum(c["valor"] for c in banco.listar_custos_fixos(mes))
+    tabela_dre, pe_periodo = dre_periodo(df_cubo, banco.historico_custos_fixos(), inicio, mes)
+    df_catalogo = pd.DataFrame(banco.listar_produtos(), columns=["id", "nome", "preco_venda", "custo_total"])
+    return {
+        "kpis": kpis_mes(float(do_mes["faturamento"].sum()), float(do_mes["custo_total"].sum()), custo_fixo),
+        "dre": tabela_dre,
+        "ponto_equilibrio_periodo": pe_periodo,
+        "ponto_equilibrio_produtos": tabela_ponto_equilibrio(df_catalogo, custo_fixo),
+    }
+
+
+def gravar_fechamento(resultado, mes, pasta, formato):
+    os.makedirs(pasta, exist_ok=True)
+    if formato == "csv":
+        kpis = pd.Series(resultado["kpis"], name="valor").rename_axis("indicador").reset_index()
+        arquivos = {
+            f"kpis_{mes}.csv": kpis,
+            f"dre_{mes}.csv": resultado["dre"],
+            f"ponto_equilibrio_{mes}.csv": resultado["ponto_equilibrio_produtos"],
+        }
+        for nome, tabela in arquivos.items():
+            tabela.to_csv(os.path.join(pasta, nome), index=False)
+        return [os.path.join(pasta, nome) for nome in arquivos]
+    caminho = os.path.join(pasta, f"fechamento_{mes}.json")
+    conteudo = {
+        "mes": mes,
+        "kpis": resultado["kpis"],
+        "dre": resultado["dre"].to_dict(orient="records"),
+        "ponto_equilibrio_periodo": resultado["ponto_equilibrio_periodo"],
+        # inf (margem negativa) não existe em JSON: vira null
+        "ponto_equilibrio_produtos": resultado["ponto_equilibrio_produtos"].replace(np.inf, None).to_dict(orient="records"),
+    }
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(conteudo, arquivo, ensure_ascii=False, indent=2, default=float)
+    return [caminho]
+
+
+def mes_aaaa_mm(texto):
+    # Tipo do argparse: o erro vira uma mensagem de uso (parser.error), sem traceback
+    if not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", texto):
+        raise argparse.ArgumentTypeError(f"mês inválido: {texto!r} (use AAAA-MM, ex.: 2026-09)")
+    return texto
+
+
+def main(argumentos=None):
+    from banco_dados import CAMINHO_PADRAO, BancoDados, mes_anterior, mes_atual
+
+    parser = argparse.ArgumentParser(description="Fechamento do mês: KPIs, DRE e ponto de equilíbrio em JSON/CSV.")
+    parser.add_argument("--banco", default=CAMINHO_PADRAO, help="arquivo SQLite (padrão: GESTAO_DB ou gestao_salao.db)")
+    parser.add_argument("--mes", type=mes_aaaa_mm, default=mes_anterior(mes_atual()), help="mês AAAA-MM (padrão: o mês passado)")
+    parser.add_argument("--inicio", type=mes_aaaa_mm, help="primeiro mês AAAA-MM da DRE (padrão: janeiro do ano do mês)")
+    parser.add_argument("--saida", default=".", help="pasta de destino")
+    parser.add_argument("--formato", choices=["json", "csv"], default="json")
+    args = parser.parse_args(argumentos)
+    if not os.path.exists(args.banco):
+        parser.error(f"banco de dados não encontrado: {args.banco}")
+
+    banco = BancoDados(args.banco)
+    try:
+        resultado = fechamento(banco, args.mes, args.inicio)
+    finally:
+        banco.fechar()
+    for caminho in gravar_fechamento(resultado, args.mes, args.saida, args.formato):
+        print(caminho)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import threading
+
+import pandas as pd
+
+
+class CatalogoProdutos:
+    # Catálogo em memória indexado por id (estável) e por nome (único).
+    # Lido do banco uma vez e mantido em sincronia a cada escrita.
+    def __init__(self, banco):
+        self.banco = banco
+        self._lock = threading.RLock()
+        self.versao = 0
+        self.recarregar()
+
+    def recarregar(self):
+        with self._lock:
+            self._por_id = {p["id"]: p for p in self.banco.listar_produtos()}
+            self._reindexar()
+
+    def _reindexar(self):
+        self._por_nome = {p["nome"]: id_produto for id_produto, p in self._por_id.items()}
+        self._nomes = list(self._por_nome)
+        self._df = None
+        self.versao += 1
+
+    # --- Consultas O(1) ---
+    def __len__(self):
+        return len(self._por_id)
+
+    @property
+    def vazio(self):
+        return not self._por_id
+
+    def obter(self, id_produto):
+        return self._por_id.get(id_produto)
+
+    def por_nome(self, nome):
+        id_produto = self._por_nome.get(nome)
+        return self._por_id[id_produto] if id_produto is not None else None
+
+    def nomes(self):
+        return self._nomes
+
+    def ids(self):
+        return list(self._por_id)
+
+    @property
+    def df(self):
+        with self._lock:
+            if self._df is None:
+                self._df = pd.DataFrame(
+                    list(self._por_id.values()),
+                    columns=["id", "nome", "preco_venda", "custo_total", "margem"]
+                )
+            return self._df
+
+    # --- Escrita ---
+    def salvar(self, prod_obj, id_produto=None):
+        # Devolve o id e o nome anterior (None para produto novo)
+        with self._lock:
+            existente = self._por_nome.get(prod_obj["nome"])
+            if existente is not None and existente != id_produto:
+                raise ValueError(f"Já existe um produto chamado '{prod_obj['nome']}'.")
+            nome_anterior = self._por_id[id_produto]["nome"] if id_produto is not None else None
+            id_produto = self.banco.salvar_produto(prod_obj, id_produto)
+            self._por_id[id_produto] = {"id": id_produto, **prod_obj}
+            self._reindexar()
+            return id_produto, nome_anterior
+
+    def excluir(self, id_produto):
+        with self._lock:
+            self.banco.excluir_produto(id_produto)
+            self._por_id.pop(id_produto, None)
+            self._reindexar()
@@ -0,0 +1,93 @@
+import threading
+
+import pandas as pd
+
+CHAVES = ["ano", "mes", "produto"]
+MEDIDAS = ["faturamento", "custo_total", "margem_total", "qtd"]
+
+
+class CuboMensal:
+    # Agregado pré-calculado por (ano, mes, produto), mantido incrementalmente.
+    # Cada célula guarda as somas das medidas e quantas vendas a compõem.
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._celulas = {}
+        self._df = None
+
+    def construir(self, df_vendas):
+        with self._lock:
+            self._celulas = {}
+            self._df = None
+            self.adicionar_lote(df_vendas)
+
+    def adicionar_lote(self, df_vendas):
+        if df_vendas.empty:
+            return
+        agrupado = df_vendas.groupby(CHAVES)[MEDIDAS].agg("sum")
+        agrupado["n_vendas"] = df_vendas.groupby(CHAVES).size()
+        with self._lock:
+            for chave, linha in zip(agrupado.index, agrupado.itertuples(index=False)):
+                chave = (int(chave[0]), int(chave[1]), chave[2])
+                celula = self._celulas.get(chave)
+                if celula is None:
+                    self._celulas[chave] = list(linha)
+                else:
+                    for i, valor in enumerate(linha):
+                        celula[i] += valor
+            self._df = None
+
+    def _aplicar(self, registro, sinal):
+        chave = (int(registro["ano"]), int(registro["mes"]), registro["produto"])
+        with self._lock:
+            celula = self._celulas.setdefault(chave, [0.0] * (len(MEDIDAS) + 1))
+            for i, medida in enumerate(MEDIDAS):
+                celula[i] += sinal * registro[medida]
+            celula[-1] += sinal
+            if celula[-1] <= 0:
+                del self._celulas[chave]
+            self._df = None
+
+    def adicionar(self, registro):
+        self._aplicar(registro, 1)
+
+    def remover(self, registro):
+        self._aplicar(registro, -1)
+
+    def renomear_produto(self, nome_anterior, nome_novo):
+        with self._lock:
+            for chave in [c for c in self._celulas if c[2] == nome_anterior]:
+                celula = self._celulas.pop(chave)
+                destino = self._celulas.setdefault((chave[0], chave[1], nome_novo), [0.0] * len(celula))
+                for i, valor in enumerate(celula):
+                    destino[i] += valor
+            self._df = None
+
+    @property
+    def df(self):
+        with self._lock:
+            if self._df is None:
+                linhas = [chave + tuple(valores[:-1]) for chave, valores in self._celulas.items()]
+                self._df = pd.DataFrame(linhas, columns=CHAVES + MEDIDAS)
+            return self._df
+
+    @property
+    def vazio(self):
+        return not self._celulas
+
+    # --- Consultas ---
+    def anos(self):
+        return sorted({chave[0] for chave in self._celulas})
+
+    def total_mes(self, ano, mes):
+        df = self.df
+        return df.loc[(df["ano"] == ano) & (df["mes"] == mes), MEDIDAS].sum()
+
+    def totais(self):
+        return self.df[MEDIDAS].sum()
+
+    def serie_mensal(self, ano, medida="faturamento"):
+        df = self.df
+        return df[df["ano"] == ano].groupby("mes")[medida].sum().reindex(range(1, 13), fill_value=0)
+
+    def por_produto(self):
+        return self.df.groupby("produto")[["faturamento", "margem_total", "qtd"]].sum().reset_index()
@@ -0,0 +1,277 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cubo_mensal import CuboMensal
+
+# Em memória ficam só os campos que não podem ser derivados, em tipos compactos:
+# `dia` conta os dias desde 1970-01-01 e `produto` é o código do nome em CacheVendas.nomes.
+# Os totais gravados vêm do banco (podem diferir de preço × qtd em vendas restauradas).
+# `ativa` é falso nas vendas estornadas, que ficam no lugar até a próxima compactação.
+TIPOS_COLUNAS = {
+    "id": np.int64, "produto_id": np.int32, "dia": np.int32, "produto": np.int32,
+    "qtd": np.int32, "preco_unitario": np.float64, "custo_unitario": np.float64,
+    "faturamento": np.float64, "custo_total": np.float64, "ativa": np.bool_,
+}
+SEM_PRODUTO = -1  # produto_id de vendas sem vínculo com o catálogo
+COLUNAS_FRAME = [
+    "id", "produto_id", "data", "mes", "ano", "produto", "qtd",
+    "preco_unitario", "custo_unitario", "faturamento", "custo_total", "margem_total",
+]
+
+
+def _concatenar(partes):
+    if not partes:
+        return {c: np.empty(0, dtype=t) for c, t in TIPOS_COLUNAS.items()}
+    if len(partes) == 1:
+        return partes[0]
+    return {c: np.concatenate([p[c] for p in partes]) for c in TIPOS_COLUNAS}
+
+
+class CacheVendas:
+    # Histórico de vendas em colunas tipadas (57 bytes por venda), lido uma vez e
+    # atualizado no lugar a cada escrita. Data por extenso, mês, ano e margem são
+    # calculados na leitura. `versao` muda sempre que o conteúdo muda e serve de
+    # chave para caches derivados (inclusive o DataFrame de `df`).
+    def __init__(self, banco):
+        self.banco = banco
+        self._lock = threading.RLock()
+        self.versao = 0
+        self.cubo = CuboMensal()
+        self.recarregar()
+
+    def recarregar(self):
+        with self._lock:
+            self.nomes = []
+            self._codigos = {}
+            self._pendentes = []
+            self._removidas = 0
+            self._df = None
+            self._colunas = self._ler()
+            self.cubo.construir(self._derivar(self._colunas))
+            self.versao += 1
+
+    # --- Conversão ---
+    def _codigo(self, nome):
+        codigo = self._codigos.get(nome)
+        if codigo is None:
+            codigo = self._codigos[nome] = len(self.nomes)
+            self.nomes.append(nome)
+        return codigo
+
+    def _compactar(self, linhas):
+        # Tuplas (id, produto_id, data, produto, qtd, preco, custo, faturamento, custo_total) -> colunas tipadas
+        ids, produto_ids, datas, produtos, qtds, precos, custos, faturamentos, custos_totais = zip(*linhas)
+        return {
+            "id": np.array(ids, dtype=np.int64),
+            "produto_id": np.array([SEM_PRODUTO if p is None else p for p in produto_ids], dtype=np.int32),
+            "dia": np.array(datas, dtype="datetime64[D]").astype(np.int32),
+            "produto": np.array([self._codigo(n) for n in produtos], dtype=np.int32),
+            "qtd": np.array(qtds, dtype=np.int32),
+            "preco_unitario": np.array(precos, dtype=np.float64),
+            "custo_unitario": np.array(custos, dtype=np.float64),
+            "faturamento": np.array(faturamentos, dtype=np.float64),
+            "custo_total": np.array(custos_totais, dtype=np.float64),
+            "ativa": np.ones(len(ids), dtype=np.bool_),
+        }
+
+    def _ler(self, desde_id=0):
+        return _concatenar([self._compactar(lote) for lote in self.banco.iterar_lotes_compactos(desde_id)])
+
+    def _tudo(self):
+        # Inserções ficam num buffer e são anexadas de uma vez na próxima leitura
+        if self._pendentes:
+            self._colunas = _concatenar([self._colunas, self._compactar(self._pendentes)])
+            self._pendentes = []
+        # Descarta as vendas estornadas quando já são mais de um quarto das colunas
+        if self._removidas > len(self._colunas["id"]) // 4:
+            ativa = self._colunas["ativa"]
+            self._colunas = {nome: coluna[ativa] for nome, coluna in self._colunas.items()}
+            self._removidas = 0
+        return self._colunas
+
+    def _vivas(self):
+        c = self._tudo()
+        if not self._removidas:
+            return c
+        return {nome: coluna[c["ativa"]] for nome, coluna in c.items()}
+
+    def _derivar(self, colunas, com_data=False):
+        dias = colunas["dia"].astype("datetime64[D]")
+        meses = dias.astype("datetime64[M]").astype(np.int64)
+        qtd = colunas["qtd"]
+        faturamento = colunas["faturamento"]
+        custo_total = colunas["custo_total"]
+        df = pd.DataFrame({
+            "id": colunas["id"],
+            "produto_id": pd.arrays.IntegerArray(colunas["produto_id"].copy(), colunas["produto_id"] == SEM_PRODUTO),
+            "mes": meses % 12 + 1,
+            "ano": meses // 12 + 1970,
+            "produto": np.asarray(self.nomes, dtype=object)[colunas["produto"]],
+            "qtd": qtd,
+            "preco_unitario": colunas["preco_unitario"],
+            "custo_unitario": colunas["custo_unitario"],
+            "faturamento": faturamento,
+            "custo_total": custo_total,
+            "margem_total": faturamento - custo_total,
+        })
+        if com_data:
+            df.insert(2, "data", np.datetime_as_string(dias, unit="D"))
+        return df
+
+    @staticmethod
+    def _registro(linha):
+        # Mesmos campos derivados de _derivar, para uma única venda
+        id_linha, produto_id, data, produto, qtd, preco, custo, faturamento, custo_total = linha
+        return {
+            "id": id_linha, "produto_id": produto_id, "data": data,
+            "mes": int(data[5:7]), "ano": int(data[:4]), "produto": produto, "qtd": qtd,
+            "preco_unitario": preco, "custo_unitario": custo,
+            "faturamento": faturamento, "custo_total": custo_total, "margem_total": faturamento - custo_total,
+        }
+
+    # --- Leitura ---
+    @property
+    def df(self):
+        # Montado uma vez por versão a partir das colunas compactas e compartilhado:
+        # quem o recebe não deve alterá-lo. Prefira o cubo para agregados.
+        with self._lock:
+            if self._df is None or self._df[0] != self.versao:
+                self._df = (self.versao, self._derivar(self._vivas(), com_data=True)[COLUNAS_FRAME])
+            return self._df[1]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._colunas["id"]) + len(self._pendentes) - self._removidas
+
+    @property
+    def vazio(self):
+        return len(self) == 0
+
+    # --- Escrita ---
+    def registrar(self, registro):
+        with self._lock:
+            id_linha = self.banco.inserir_venda(registro)
+            linha = (
+                id_linha, registro.get("produto_id"), registro["data"], registro["produto"],
+                registro["qtd"], registro["preco_unitario"], registro["custo_unitario"],
+                registro["faturamento"], registro["custo_total"],
+            )
+            self._pendentes.append(linha)
+            self.cubo.adicionar(self._registro(linha))
+            self.versao += 1
+            return id_linha
+
+    def registrar_lote(self, linhas):
+        # Tuplas na ordem de COLUNAS_VENDA, gravadas numa única transação
+        if not linhas:
+            return 0
+        with self._lock:
+            ids = self.banco.inserir_linhas_vendas(linhas)
+            # Relê o intervalo recém-gravado para trazer o produto_id resolvido pelo banco
+            novos = self._ler(ids[0])
+            self._colunas = _concatenar([self._tudo(), novos])
+            self.cubo.adicionar_lote(self._derivar(novos))
+            self.versao += 1
+            return len(linhas)
+
+    def estornar(self, id_linha):
+        with self._lock:
+            return self._aplicar(*self.banco.estornar_venda(id_linha))
+
+    def corrigir(self, id_linha, campos):
+        with self._lock:
+            return self._aplicar(*self.banco.corrigir_venda(id_linha, campos))
+
+    def desfazer(self):
+        # Devolve o evento revertido (dict do diário) ou None se não havia o que desfazer
+        with self._lock:
+            resultado = self.banco.desfazer_evento()
+            if resultado is not None:
+                self._aplicar(*resultado[1:])
+                return resultado[0]
+
+    def refazer(self):
+        with self._lock:
+            resultado = self.banco.refazer_evento()
+            if resultado is not None:
+                self._aplicar(*resultado[1:])
+                return resultado[0]
+
+    def _aplicar(self, antes, depois):
+        # Leva para as colunas e o cubo uma venda que passou de `antes` para `depois`
+        # (dicts do banco; None = não existe). Os ids ficam em ordem crescente, então a
+        # busca binária acha a posição e a venda é sobrescrita ou marcada como inativa no lugar.
+        c = self._tudo()
+        if antes is not None:
+            self.cubo.remover(self._registro(self._linha_do_banco(antes)))
+        if depois is not None:
+            self.cubo.adicionar(self._registro(self._linha_do_banco(depois)))
+        id_linha = (antes or depois)["id"]
+        posicao = int(np.searchsorted(c["id"], id_linha))
+        presente = posicao < len(c["id"]) and c["id"][posicao] == id_linha
+        if depois is None:
+            c["ativa"][posicao] = False
+            self._removidas += 1
+        else:
+            nova = self._compactar([self._linha_do_banco(depois)])
+            if not presente:
+                # Estorno desfeito depois de a venda sair das colunas na compactação
+                self._colunas = {nome: np.insert(coluna, posicao, nova[nome]) for nome, coluna in c.items()}
+            else:
+                if not c["ativa"][posicao]:
+                    self._removidas -= 1
+                for nome, coluna in c.items():
+                    coluna[posicao] = nova[nome][0]
+        self.versao += 1
+        return antes, depois
+
+    @staticmethod
+    def _linha_do_banco(venda):
+        return (
+            venda["id"], venda["produto_id"], venda["data"], venda["produto"],
+            venda["qtd"], venda["preco_unitario"], venda["custo_unitario"],
+            venda["faturamento"], venda["custo_total"],
+        )
+
+    def atualizar_valores(self, ids, precos, custos):
+        # Regrava preço/custo unitário das vendas `ids` (reprecificação) e refaz o cubo
+        with self._lock:
+            ids = np.asarray(ids, dtype=np.int64)
+            precos = np.asarray(precos, dtype=np.float64)
+            custos = np.asarray(custos, dtype=np.float64)
+            self.banco.atualizar_valores_vendas(list(zip(precos.tolist(), custos.tolist(), ids.tolist())))
+            c = self._tudo()
+            # Os ids crescem com a ordem de inserção, então a busca binária localiza cada venda
+            posicoes = np.searchsorted(c["id"], ids)
+            c["preco_unitario"][posicoes] = precos
+            c["custo_unitario"][posicoes] = custos
+            # Mesmos totais que o banco regrava
+            c["faturamento"][posicoes] = precos * c["qtd"][posicoes]
+            c["custo_total"][posicoes] = custos * c["qtd"][posicoes]
+            self.cubo.construir(self._derivar(self._vivas()))
+            self.versao += 1
+            return len(ids)
+
+    # --- Sincronia com o catálogo ---
+    def renomear_produto(self, id_produto, nome_anterior, nome_novo):
+        with self._lock:
+            c = self._tudo()
+            c["produto"][c["produto_id"] == id_produto] = self._codigo(nome_novo)
+            self.cubo.renomear_produto(nome_anterior, nome_novo)
+            self.versao += 1
+
+    def vincular_produto(self, id_produto, nome):
+        with self._lock:
+            c = self._tudo()
+            codigo = self._codigos.get(nome)
+            if codigo is not None:
+                c["produto_id"][(c["produto"] == codigo) & (c["produto_id"] == SEM_PRODUTO)] = id_produto
+            self.versao += 1
+
+    def desvincular_produto(self, id_produto):
+        with self._lock:
+            c = self._tudo()
+            c["produto_id"][c["produto_id"] == id_produto] = SEM_PRODUTO
+            self.versao += 1
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Linhas da DRE gerencial, na ordem de apresentação
+LINHAS = ["receita", "custo_variavel", "margem_contribuicao", "custo_fixo", "resultado"]
+ROTULOS = {
+    "receita": "1. Faturamento Bruto",
+    "custo_variavel": "2. (-) Custos Variáveis (Produtos)",
+    "margem_contribuicao": "= 3. Margem de Contribuição",
+    "custo_fixo": "4. (-) Custos Fixos",
+    "resultado": "= 5. Resultado Líquido (Lucro/Prejuízo)",
+}
+
+
+# --- Custo fixo de cada mês (contas com vigência) ---
+def custo_fixo_por_mes(historico, meses):
+    # Soma, para cada mês, as contas cuja vigência (AAAA-MM, inclusive) o cobre; sem
+    # início/fim a conta vale desde sempre/para sempre. Varredura única: cada conta soma
+    # seu valor no mês de início e subtrai no mês seguinte ao fim, e a soma acumulada
+    # dá o total mês a mês, qualquer que seja o número de anos.
+    meses = pd.PeriodIndex(meses, freq="M")
+    totais = pd.Series(0.0, index=meses)
+    if not historico or meses.empty:
+        return totais
+    primeiro, ultimo = meses.min().ordinal, meses.max().ordinal
+    contas = pd.DataFrame(historico).reindex(columns=["valor", "vigencia_inicio", "vigencia_fim"])
+
+    def ordinais(coluna, padrao):
+        periodos = pd.to_datetime(contas[coluna], format="%Y-%m").dt.to_period("M")
+        return np.where(periodos.isna(), padrao, periodos.array.asi8)
+
+    inicio = np.maximum(ordinais("vigencia_inicio", primeiro), primeiro)
+    fim = np.minimum(ordinais("vigencia_fim", ultimo), ultimo)
+    validas = inicio <= fim
+    variacao = np.zeros(ultimo - primeiro + 2)
+    np.add.at(variacao, inicio[validas] - primeiro, contas["valor"].to_numpy(dtype=float)[validas])
+    np.add.at(variacao, fim[validas] - primeiro + 1, -contas["valor"].to_numpy(dtype=float)[validas])
+    por_ordinal = np.cumsum(variacao[:-1])
+    totais[:] = por_ordinal[meses.asi8 - primeiro]
+    return totais
+
+
+# --- Matriz mensal ---
+def matriz_mensal(df_cubo, custo_fixo_mensal, inicio=None, fim=None):
+    # Uma linha por mês, de `inicio` (padrão: o primeiro mês com vendas) até `fim` (padrão:
+    # o último com vendas); os limites só estendem a matriz, nunca a cortam.
+    # Meses sem venda entram com receita zero e pagam o custo fixo do mesmo jeito.
+    # `custo_fixo_mensal` é um valor único, uma Series indexada por Period mensal ou o
+    # histórico de contas com vigência (lista de dicts, ver custo_fixo_por_mes).
+    mensal = df_cubo.groupby(["ano", "mes"])[["faturamento", "custo_total"]].sum()
+    if mensal.empty:
+        return pd.DataFrame(columns=LINHAS, index=pd.PeriodIndex([], freq="M", name="periodo"), dtype=float)
+    ano, mes = mensal.index.get_level_values("ano"), mensal.index.get_level_values("mes")
+    mensal.index = pd.PeriodIndex.from_ordinals((ano - 1970) * 12 + mes - 1, freq="M")
+    inicio = min(mensal.index.min(), pd.Period(inicio, freq="M")) if inicio is not None else mensal.index.min()
+    fim = max(mensal.index.max(), pd.Period(fim, freq="M")) if fim is not None else mensal.index.max()
+    meses = pd.period_range(inicio, fim, freq="M", name="periodo")
+    mensal = mensal.reindex(meses, fill_value=0.0)
+
+    matriz = pd.DataFrame(index=meses)
+    matriz["receita"] = mensal["faturamento"]
+    matriz["custo_variavel"] = mensal["custo_total"]
+    matriz["margem_contribuicao"] = matriz["receita"] - matriz["custo_variavel"]
+    if isinstance(custo_fixo_mensal, list):
+        matriz["custo_fixo"] = custo_fixo_por_mes(custo_fixo_mensal, meses)
+    elif isinstance(custo_fixo_mensal, pd.Series):
+        matriz["custo_fixo"] = custo_fixo_mensal.reindex(meses, fill_value=0.0)
+    else:
+        matriz["custo_fixo"] = float(custo_fixo_mensal)
+    matriz["resultado"] = matriz["margem_contribuicao"] - matriz["custo_fixo"]
+    return matriz
+
+
+def analise_vertical(valores):
+    # Cada linha em % da receita (Series de uma DRE ou matriz mês a mês)
+    receita = valores["receita"]
+    if isinstance(receita, pd.Series):
+        return valores.div(receita.where(receita > 0), axis=0).mul(100).fillna(0.0)
+    return valores / receita * 100 if receita > 0 else valores * 0.0
+
+
+# --- Recortes da matriz ---
+def periodo(matriz, inicio=None, fim=None):
+    # DRE somada de um intervalo de meses (inclusive); sem limites, o acumulado todo
+    inicio = pd.Period(inicio, freq="M") if inicio is not None else None
+    fim = pd.Period(fim, freq="M") if fim is not None else None
+    return matriz.loc[inicio:fim, LINHAS].sum()
+
+
+def janela_movel(matriz, meses):
+    # Soma móvel de `meses` meses, mês a mês (ex.: 3 = trimestre móvel, 12 = ano móvel)
+    return matriz[LINHAS].rolling(meses, min_periods=meses).sum().dropna()
+
+
+def comparar_ano_anterior(matriz, inicio, fim):
+    # Mesmo intervalo um ano antes; meses anteriores ao histórico contam como zero
+    inicio, fim = pd.Period(inicio, freq="M"), pd.Period(fim, freq="M")
+    anterior_inicio, anterior_fim = inicio - 12, fim - 12
+    atual = periodo(matriz, inicio, fim)
+    anterior = periodo(matriz, anterior_inicio, anterior_fim) if anterior_fim >= matriz.index.min() else atual * 0.0
+    comparacao = pd.DataFrame({"atual": atual, "anterior": anterior})
+    comparacao["variacao"] = comparacao["atual"] - comparacao["anterior"]
+    comparacao["variacao_perc"] = (comparacao["variacao"] / comparacao["anterior"].abs().where(comparacao["anterior"] != 0) * 100)
+    return comparacao
+
+
+def ponto_equilibrio(dre):
+    # Receita que cobriria o custo fixo do período com a margem de contribuição média dele
+    margem_perc = dre["margem_contribuicao"] / dre["receita"] if dre["receita"] > 0 else 0.0
+    return dre["custo_fixo"] / margem_perc if margem_perc > 0 else 0.0
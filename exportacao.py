@@ -0,0 +1,142 @@
+import io
+import zipfile
+
+import pandas as pd
+
+import dre
+from calculos import tabela_ponto_equilibrio
+
+FORMATOS_RELATORIO = {
+    "xlsx": {"rotulo": "Excel (.xlsx)", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    "pdf": {"rotulo": "PDF (.pdf)", "mime": "application/pdf"},
+}
+MESES_ABREV = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+# --- Tabelas de um ano ---
+def tabelas_do_ano(matriz, df_cubo, df_catalogo, ano):
+    # Mesmas tabelas da aba de relatórios e do simulador, recortadas no ano. O ponto de
+    # equilíbrio usa o custo fixo médio dos meses do ano, o mesmo da DRE exportada.
+    meses = matriz.loc[pd.Period(f"{ano}-01", freq="M"):pd.Period(f"{ano}-12", freq="M"), dre.LINHAS]
+    total = dre.periodo(meses)
+    tabela_dre = pd.DataFrame({
+        "Conceito": [dre.ROTULOS[l] for l in dre.LINHAS],
+        "Valor (R$)": total[dre.LINHAS].values,
+        "Análise Vertical (%)": dre.analise_vertical(total)[dre.LINHAS].values,
+    })
+    mensal = meses.rename(columns=dre.ROTULOS).T
+    mensal.columns = [MESES_ABREV[p.month - 1] for p in mensal.columns]
+    mensal.index.name = "Conceito"
+
+    ranking = df_cubo[df_cubo["ano"] == ano].groupby("produto")[["qtd", "faturamento", "margem_total"]].sum()
+    ranking["margem_perc"] = (ranking["margem_total"] / ranking["faturamento"].where(ranking["faturamento"] > 0) * 100).fillna(0)
+    ranking = ranking.sort_values("margem_total", ascending=False).reset_index()
+    ranking.columns = ["Produto", "Qtd", "Faturamento (R$)", "Lucro Bruto (R$)", "Margem (%)"]
+    return {
+        f"DRE {ano}": tabela_dre,
+        "DRE Mês a Mês": mensal.reset_index(),
+        "Ranking de Produtos": ranking,
+        "Ponto de Equilíbrio": tabela_ponto_equilibrio(df_catalogo, float(meses["custo_fixo"].mean()) if len(meses) else 0.0),
+    }
+
+
+# --- Formatos ---
+def gerar_xlsx(tabelas):
+    destino = io.BytesIO()
+    try:
+        with pd.ExcelWriter(destino, engine="openpyxl") as planilha:
+            for nome, tabela in tabelas.items():
+                tabela.to_excel(planilha, sheet_name=nome[:31], index=False)
+                # Rótulos como "= 3. Margem..." seriam gravados como fórmula
+                for linha in planilha.sheets[nome[:31]].iter_rows():
+                    for celula in linha:
+                        if celula.data_type == "f":
+                            celula.data_type = "s"
+    except ImportError:
+        raise ValueError("Exportar para Excel requer o pacote 'openpyxl'.") from None
+    return destino.getvalue()
+
+
+def _texto_celula(valor):
+    if isinstance(valor, float):
+        return "-" if pd.isna(valor) or valor == float("inf") else f"{valor:,.2f}"
+    return str(valor)
+
+
+def gerar_pdf(titulo, tabelas):
+    try:
+        from fpdf import FPDF
+    except ImportError:
+        raise ValueError("Exportar para PDF requer o pacote 'fpdf2'.") from None
+    pdf = FPDF(orientation="landscape", format="A4")
+    pdf.set_auto_page_break(True, margin=12)
+    for nome, tabela in tabelas.items():
+        pdf.add_page()
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.cell(0, 10, f"{titulo} - {nome}", new_x="LMARGIN", new_y="NEXT")
+        # Fontes padrão do PDF são latin-1; caracteres fora dele viram "?"
+        pdf.set_font("Helvetica", size=7 if len(tabela.columns) > 8 else 9)
+        with pdf.table(text_align="RIGHT", first_row_as_headings=True) as grade:
+            for linha in [list(tabela.columns), *tabela.itertuples(index=False, name=None)]:
+                celulas = grade.row()
+                for valor in linha:
+                    celulas.cell(_texto_celula(valor).encode("latin-1", "replace").decode("latin-1"))
+    return bytes(pdf.output())
+
+
+def gerar_arquivo(formato, titulo, tabelas):
+    return gerar_xlsx(tabelas) if formato == "xlsx" else gerar_pdf(titulo, tabelas)
+
+
+# --- Exportação em segundo plano ---
+class ExportacaoRelatorios:
+    # Um arquivo por ano, gerados em paralelo no pool compartilhado. O script do Streamlit
+    # só consulta o andamento; as tabelas partem de cópias tiradas no início da exportação.
+    def __init__(self, pool, formato, anos, matriz, df_cubo, df_catalogo):
+        self.formato = formato
+        self.anos = sorted(anos)
+        self._resultado = None
+        self._futuros = {
+            ano: pool.submit(self._gerar, formato, ano, matriz, df_cubo.copy(), df_catalogo.copy())
+            for ano in self.anos
+        }
+
+    @staticmethod
+    def _gerar(formato, ano, matriz, df_cubo, df_catalogo):
+        return gerar_arquivo(formato, f"Relatório Gerencial {ano}", tabelas_do_ano(matriz, df_cubo, df_catalogo, ano))
+
+    @property
+    def concluidos(self):
+        return sum(f.done() for f in self._futuros.values())
+
+    @property
+    def progresso(self):
+        return self.concluidos / len(self._futuros)
+
+    @property
+    def concluida(self):
+        return self.concluidos == len(self._futuros)
+
+    @property
+    def erro(self):
+        for futuro in self._futuros.values():
+            if futuro.done() and futuro.exception() is not None:
+                return futuro.exception()
+        return None
+
+    def resultado(self):
+        # (nome do arquivo, conteúdo, mime); vários anos vão num .zip, um arquivo por ano
+        if self._resultado is None:
+            self._resultado = self._empacotar()
+        return self._resultado
+
+    def _empacotar(self):
+        arquivos = {f"relatorio_{ano}.{self.formato}": f.result() for ano, f in self._futuros.items()}
+        if len(arquivos) == 1:
+            (nome, conteudo), = arquivos.items()
+            return nome, conteudo, FORMATOS_RELATORIO[self.formato]["mime"]
+        destino = io.BytesIO()
+        with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as pacote:
+            for nome, conteudo in arquivos.items():
+                pacote.writestr(nome, conteudo)
+        return f"relatorios_{self.anos[0]}_{self.anos[-1]}.zip", destino.getvalue(), "application/zip"
@@ -0,0 +1,49 @@
+import importlib
+import threading
+from collections import OrderedDict
+
+
+class ModuloSobDemanda:
+    # Adia o import de um módulo pesado até o primeiro acesso a um atributo dele
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return getattr(self._modulo, atributo)
+
+
+# O Plotly só é carregado quando o primeiro gráfico é montado
+px = ModuloSobDemanda("plotly.express")
+go = ModuloSobDemanda("plotly.graph_objects")
+
+
+class CacheFiguras:
+    # Figuras Plotly prontas, indexadas pelo nome do gráfico e pelos valores de que
+    # ele depende (versão dos dados, período, meta...). LRU limitado: ao passar do
+    # limite, a figura usada há mais tempo é descartada.
+    def __init__(self, limite=64):
+        self.limite = limite
+        self._lock = threading.RLock()
+        self._figuras = OrderedDict()
+
+    def obter(self, nome, chave, construir):
+        # As figuras são compartilhadas entre sessões: quem as recebe não deve alterá-las
+        chave = (nome, chave)
+        with self._lock:
+            fig = self._figuras.get(chave)
+            if fig is not None:
+                self._figuras.move_to_end(chave)
+                return fig
+        fig = construir()
+        with self._lock:
+            self._figuras[chave] = fig
+            self._figuras.move_to_end(chave)
+            while len(self._figuras) > self.limite:
+                self._figuras.popitem(last=False)
+        return fig
+
+    def __len__(self):
+        return len(self._figuras)
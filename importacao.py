@@ -0,0 +1,69 @@
+import unicodedata
+
+import pandas as pd
+
+from backup import validar_vendas
+
+# Nomes de coluna aceitos na planilha (já normalizados: minúsculas e sem acento)
+SINONIMOS = {
+    "data": "data", "data do evento": "data", "dia": "data",
+    "produto": "produto", "produto/servico": "produto", "servico": "produto",
+    "qtd": "qtd", "quantidade": "qtd", "qtde": "qtd",
+}
+COLUNAS_OBRIGATORIAS = ["data", "produto", "qtd"]
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return texto.strip().lower()
+
+
+def ler_planilha(arquivo, nome_arquivo):
+    if nome_arquivo.lower().endswith((".xlsx", ".xls")):
+        try:
+            df = pd.read_excel(arquivo)
+        except ImportError:
+            raise ValueError("Leitura de Excel requer o pacote 'openpyxl'. Salve a planilha como CSV ou instale-o.") from None
+    else:
+        # Detecta o separador (vírgula ou ponto e vírgula, comum em planilhas brasileiras)
+        df = pd.read_csv(arquivo, sep=None, engine="python", dtype=str)
+    df = df.rename(columns=lambda c: SINONIMOS.get(_normalizar(c), c))
+    faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+    return df[COLUNAS_OBRIGATORIAS]
+
+
+def _datas_iso(coluna):
+    if pd.api.types.is_datetime64_any_dtype(coluna):
+        return coluna.dt.strftime("%Y-%m-%d")
+    texto = coluna.astype("string").str.strip()
+    # ISO primeiro; o que falhar é tentado no formato brasileiro (dd/mm/aaaa)
+    datas = pd.to_datetime(texto.str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+    datas = datas.fillna(pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce"))
+    return datas.dt.strftime("%Y-%m-%d")
+
+
+def preparar_importacao(df_planilha, df_catalogo):
+    # Resolve preço e custo pelo catálogo com um único merge e calcula os totais por coluna
+    df = pd.DataFrame({
+        "data": _datas_iso(df_planilha["data"]),
+        "produto": df_planilha["produto"].astype("string").str.strip(),
+        "qtd": pd.to_numeric(df_planilha["qtd"].astype("string").str.replace(",", ".", regex=False), errors="coerce"),
+    })
+    df_catalogo = df_catalogo[["nome", "preco_venda", "custo_total"]].rename(columns={
+        "nome": "produto", "preco_venda": "preco_unitario", "custo_total": "custo_unitario"
+    })
+    df_catalogo["produto"] = df_catalogo["produto"].astype("string")
+    df = df.merge(df_catalogo, on="produto", how="left", validate="many_to_one")
+
+    desconhecidos = df.loc[df["preco_unitario"].isna() & df["produto"].notna(), "produto"]
+    desconhecidos = desconhecidos.value_counts().rename_axis("produto").reset_index(name="linhas")
+    df = df[df["preco_unitario"].notna()].copy()
+
+    df["faturamento"] = df["preco_unitario"] * df["qtd"]
+    df["custo_total"] = df["custo_unitario"] * df["qtd"]
+    df["margem_total"] = df["faturamento"] - df["custo_total"]
+
+    linhas, invalidos = validar_vendas(df)
+    return linhas, desconhecidos, invalidos
@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+# Uma linha JSON por execução medida, para acompanhar percentis ao longo do tempo
+CAMINHO_METRICAS = os.environ.get("GESTAO_METRICAS", "metricas_gestao.ndjson")
+
+# Cada sessão do Streamlit executa o script na sua própria thread: a medição ativa
+# fica por thread, e os ganchos globais só contam quando há uma medição nela
+_ativa = threading.local()
+_lock = threading.Lock()
+_instalado = False
+
+
+class Medicao:
+    # Tempos por seção de uma execução do script, DataFrames criados e bytes enviados
+    # ao navegador por tipo de elemento. Seções podem se aninhar (um gráfico dentro
+    # de uma aba): o tempo da de fora inclui o da de dentro.
+    def __init__(self):
+        self.inicio = datetime.now()
+        self._relogio = time.perf_counter()
+        self.secoes = {}
+        self.dataframes = 0
+        self.elementos = defaultdict(lambda: [0, 0])  # tipo -> [quantidade, bytes]
+        self.total = None
+
+    @contextmanager
+    def secao(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.secoes[nome] = self.secoes.get(nome, 0.0) + time.perf_counter() - inicio
+
+    def registro(self):
+        return {
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "total_ms": round(self.total * 1000, 2),
+            "secoes_ms": {nome: round(s * 1000, 2) for nome, s in self.secoes.items()},
+            "dataframes": self.dataframes,
+            "elementos": {tipo: {"quantidade": q, "bytes": b} for tipo, (q, b) in self.elementos.items()},
+        }
+
+
+# --- Ganchos (instalados uma vez por processo) ---
+def _instalar():
+    global _instalado
+    with _lock:
+        if _instalado:
+            return
+        init_original = pd.DataFrame.__init__
+
+        def init_contado(self, *args, **kwargs):
+            medicao = getattr(_ativa, "medicao", None)
+            if medicao is not None:
+                medicao.dataframes += 1
+            init_original(self, *args, **kwargs)
+
+        pd.DataFrame.__init__ = init_contado
+
+        try:
+            from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+        except ImportError:
+            # Módulo interno do Streamlit; sem ele só os bytes por elemento deixam de ser contados
+            ScriptRunContext = None
+        if ScriptRunContext is not None:
+            enqueue_original = ScriptRunContext.enqueue
+
+            def enqueue_contado(self, msg):
+                medicao = getattr(_ativa, "medicao", None)
+                if medicao is not None and msg.HasField("delta"):
+                    delta = msg.delta
+                    tipo = delta.new_element.WhichOneof("type") if delta.HasField("new_element") else delta.WhichOneof("type")
+                    contagem = medicao.elementos[tipo or "outro"]
+                    contagem[0] += 1
+                    contagem[1] += msg.ByteSize()
+                return enqueue_original(self, msg)
+
+            ScriptRunContext.enqueue = enqueue_contado
+        _instalado = True
+
+
+def iniciar():
+    _instalar()
+    _ativa.medicao = Medicao()
+    return _ativa.medicao
+
+
+def encerrar(medicao):
+    medicao.total = time.perf_counter() - medicao._relogio
+    _ativa.medicao = None
+    return medicao.registro()
+
+
+def secao(medicao, nome):
+    # Contexto que mede `nome` quando há medição; sem ela, não faz nada
+    return medicao.secao(nome) if medicao is not None else nullcontext()
+
+
+def gravar(registro, caminho=None):
+    with _lock, open(caminho or CAMINHO_METRICAS, "a", encoding="utf-8") as arquivo:
+        arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+# --- Resumos ---
+def percentis(registros, quantis=(50, 90, 99)):
+    # Uma linha por seção (e o total): execuções medidas e percentis de tempo em ms
+    linhas = [{"secao": "Total", "ms": r["total_ms"]} for r in registros]
+    linhas += [{"secao": nome, "ms": ms} for r in registros for nome, ms in r["secoes_ms"].items()]
+    if not linhas:
+        return pd.DataFrame(columns=["secao", "execucoes", *[f"p{q}" for q in quantis]])
+    tempos = pd.DataFrame(linhas).groupby("secao", sort=False)["ms"]
+    resumo = tempos.quantile([q / 100 for q in quantis]).unstack()
+    resumo.columns = [f"p{q}" for q in quantis]
+    resumo.insert(0, "execucoes", tempos.size())
+    return resumo.reset_index()
+
+
+def elementos(registro):
+    tabela = pd.DataFrame(
+        [(tipo, c["quantidade"], c["bytes"]) for tipo, c in registro["elementos"].items()],
+        columns=["elemento", "quantidade", "bytes"],
+    )
+    return tabela.sort_values("bytes", ascending=False, ignore_index=True)
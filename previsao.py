@@ -0,0 +1,98 @@
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+ESTACAO = 12
+HORIZONTE = 12
+Z_FAIXA = 1.2816  # faixa de 80% em torno da previsão
+# Combinações de suavização testadas para cada produto (nível, tendência, sazonalidade)
+GRADE = np.array(list(product([0.1, 0.3, 0.5, 0.8], [0.0, 0.1], [0.1, 0.3])))
+
+
+# --- Séries mensais ---
+def series_mensais(df_cubo, medida="faturamento"):
+    # Meses contíguos (do primeiro ao último com vendas) x produtos; zero onde não houve venda
+    mensal = df_cubo.groupby(["ano", "mes", "produto"])[medida].sum().unstack("produto", fill_value=0.0)
+    ano, mes = mensal.index.get_level_values("ano"), mensal.index.get_level_values("mes")
+    mensal.index = pd.PeriodIndex.from_ordinals((ano - 1970) * 12 + mes - 1, freq="M")
+    meses = pd.period_range(mensal.index.min(), mensal.index.max(), freq="M", name="periodo")
+    return mensal.reindex(meses, fill_value=0.0)
+
+
+# --- Holt-Winters aditivo, todos os produtos e parâmetros de uma vez ---
+def _ajustar(y, horizonte):
+    # y: (meses, produtos). Cada combinação da GRADE roda em paralelo sobre todos os
+    # produtos (estado com forma (combinações, produtos)); o laço é só no tempo. Cada
+    # produto fica com a combinação de menor erro quadrático um passo à frente.
+    n_meses, n_produtos = y.shape
+    alfa, beta, gama = (GRADE[:, i, np.newaxis] for i in range(3))
+    sazonal = n_meses >= 2 * ESTACAO
+    if sazonal:
+        nivel = np.broadcast_to(y[:ESTACAO].mean(axis=0), (len(GRADE), n_produtos)).copy()
+        tendencia = np.broadcast_to((y[ESTACAO:2 * ESTACAO].mean(axis=0) - nivel[0]) / ESTACAO, nivel.shape).copy()
+        estacao = np.broadcast_to((y[:ESTACAO] - nivel[0])[:, np.newaxis, :], (ESTACAO, *nivel.shape)).copy()
+    else:
+        # Menos de dois anos: sem componente sazonal (Holt com tendência)
+        nivel = np.broadcast_to(y[0], (len(GRADE), n_produtos)).copy()
+        tendencia = np.zeros_like(nivel)
+        estacao = np.zeros((ESTACAO, *nivel.shape))
+        gama = np.zeros_like(gama)
+
+    inicio_erro = ESTACAO if sazonal else 1
+    sse = np.zeros_like(nivel)
+    for t in range(n_meses):
+        s = estacao[t % ESTACAO]
+        erro = y[t] - (nivel + tendencia + s)
+        if t >= inicio_erro:
+            sse += erro ** 2
+        novo_nivel = alfa * (y[t] - s) + (1 - alfa) * (nivel + tendencia)
+        tendencia = beta * (novo_nivel - nivel) + (1 - beta) * tendencia
+        estacao[t % ESTACAO] = gama * (y[t] - novo_nivel) + (1 - gama) * s
+        nivel = novo_nivel
+
+    melhor = sse.argmin(axis=0)
+    colunas = np.arange(n_produtos)
+    passos = np.arange(1, horizonte + 1)[:, np.newaxis]
+    previsto = (
+        nivel[melhor, colunas] + passos * tendencia[melhor, colunas]
+        + estacao[(n_meses + passos - 1) % ESTACAO, melhor, colunas]
+    )
+    # Variância cresce com o horizonte (aproximação do alisamento exponencial simples)
+    sigma2 = sse[melhor, colunas] / max(n_meses - inicio_erro, 1)
+    variancia = sigma2 * (1 + (passos - 1) * GRADE[melhor, 0] ** 2)
+    return np.maximum(previsto, 0.0), variancia
+
+
+def prever(df_cubo, horizonte=HORIZONTE):
+    # Receita prevista por produto nos `horizonte` meses seguintes ao último com vendas,
+    # e o total com faixa de 80% e margem de contribuição (margem % dos últimos 12 meses)
+    receita = series_mensais(df_cubo, "faturamento")
+    custo = series_mensais(df_cubo, "custo_total").reindex_like(receita).fillna(0.0)
+    previsto, variancia = _ajustar(receita.to_numpy(), horizonte)
+    meses = pd.period_range(receita.index.max() + 1, periods=horizonte, freq="M", name="periodo")
+    por_produto = pd.DataFrame(previsto, index=meses, columns=receita.columns)
+
+    recente_receita, recente_custo = receita.iloc[-ESTACAO:].sum(), custo.iloc[-ESTACAO:].sum()
+    margem_perc = (1 - recente_custo / recente_receita.where(recente_receita > 0)).fillna(0.0)
+    total = pd.DataFrame(index=meses)
+    total["receita"] = por_produto.sum(axis=1)
+    desvio = np.sqrt(variancia.sum(axis=1))
+    total["inferior"] = np.maximum(total["receita"] - Z_FAIXA * desvio, 0.0)
+    total["superior"] = total["receita"] + Z_FAIXA * desvio
+    total["margem_contribuicao"] = por_produto.mul(margem_perc, axis=1).sum(axis=1)
+    return total, por_produto
+
+
+# --- Ponto de equilíbrio previsto ---
+def mes_equilibrio(matriz, previsao, ano):
+    # Primeiro mês do ano em que o resultado acumulado (realizado e, nos meses ainda sem
+    # vendas, previsto) cobre os custos fixos acumulados; None se não cobrir no ano.
+    # `matriz` deve se estender até o fim da previsão (dre.matriz_mensal com `fim`).
+    meses = matriz.loc[pd.Period(f"{ano}-01", freq="M"):pd.Period(f"{ano}-12", freq="M")]
+    margem = meses["margem_contribuicao"].copy()
+    futuros = meses.index.intersection(previsao.index)
+    margem[futuros] = previsao.loc[futuros, "margem_contribuicao"]
+    acumulado = (margem - meses["custo_fixo"]).cumsum()
+    cobertos = acumulado.index[acumulado >= 0]
+    return cobertos[0] if len(cobertos) else None
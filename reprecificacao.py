@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from cubo_mensal import CHAVES, MEDIDAS
+import dre
+
+CAMPOS = ["preco_unitario", "custo_unitario"]
+
+
+# --- Tabela de preços/custos versionada ---
+def tabela_do_catalogo(df_catalogo, inicio, fim=None, campos=CAMPOS, produtos=None):
+    # Uma versão por produto com os valores atuais do catálogo, vigente de `inicio` a `fim`
+    # (datas inclusivas; sem `fim`, até hoje). Campos fora de `campos` ficam como estão.
+    tabela = df_catalogo.rename(columns={
+        "id": "produto_id", "preco_venda": "preco_unitario", "custo_total": "custo_unitario"
+    })
+    if produtos is not None:
+        tabela = tabela[tabela["produto_id"].isin(produtos)]
+    tabela = tabela[["produto_id", *campos]].copy()
+    tabela["vigencia_inicio"] = pd.Timestamp(inicio)
+    tabela["vigencia_fim"] = pd.Timestamp(fim) if fim is not None else pd.NaT
+    return tabela
+
+
+# --- Recálculo do histórico ---
+def reprecificar(df_vendas, tabela):
+    # Cada venda recebe a versão da tabela vigente na sua data (merge_asof por produto_id)
+    # e tem faturamento/custo/margem recalculados. Vendas sem produto_id ou fora de
+    # qualquer vigência mantêm os valores. A coluna `alterada` marca o que mudou.
+    resultado = df_vendas.reset_index(drop=True).copy()
+    datas = pd.to_datetime(resultado["data"], format="%Y-%m-%d").astype("datetime64[ns]")
+    campos = [c for c in CAMPOS if c in tabela.columns]
+
+    vinculadas = resultado["produto_id"].notna()
+    esquerda = pd.DataFrame({
+        "linha": np.flatnonzero(vinculadas),
+        "produto_id": resultado.loc[vinculadas, "produto_id"].astype("int64").to_numpy(),
+        "data": datas[vinculadas].to_numpy(),
+    }).sort_values("data")
+    direita = tabela.astype({
+        "produto_id": "int64", "vigencia_inicio": "datetime64[ns]", "vigencia_fim": "datetime64[ns]"
+    }).sort_values("vigencia_inicio")
+    unido = pd.merge_asof(
+        esquerda, direita, left_on="data", right_on="vigencia_inicio", by="produto_id", direction="backward"
+    )
+    vigente = unido["vigencia_inicio"].notna() & (unido["vigencia_fim"].isna() | (unido["data"] <= unido["vigencia_fim"]))
+    unido = unido[vigente]
+
+    antes = resultado[campos].to_numpy(copy=True)
+    for campo in campos:
+        novos = unido[campo].notna()
+        resultado.loc[unido.loc[novos, "linha"].to_numpy(), campo] = unido.loc[novos, campo].to_numpy()
+    resultado["faturamento"] = resultado["preco_unitario"] * resultado["qtd"]
+    resultado["custo_total"] = resultado["custo_unitario"] * resultado["qtd"]
+    resultado["margem_total"] = resultado["faturamento"] - resultado["custo_total"]
+    resultado["alterada"] = ~np.isclose(resultado[campos].to_numpy(), antes).all(axis=1)
+    return resultado
+
+
+# --- E se? ---
+def cubo_de(df_vendas):
+    return df_vendas.groupby(CHAVES)[MEDIDAS].sum().reset_index()
+
+
+def comparar_dre(df_atual, df_simulado, custo_fixo_mensal, inicio=None, fim=None):
+    # DRE do intervalo com os valores gravados e com os recalculados, lado a lado
+    atual = dre.periodo(dre.matriz_mensal(cubo_de(df_atual), custo_fixo_mensal, inicio, fim), inicio, fim)
+    simulada = dre.periodo(dre.matriz_mensal(cubo_de(df_simulado), custo_fixo_mensal, inicio, fim), inicio, fim)
+    comparacao = pd.DataFrame({"atual": atual, "simulado": simulada})
+    comparacao["diferenca"] = comparacao["simulado"] - comparacao["atual"]
+    return comparacao
+
+
+def impacto_por_produto(df_atual, df_simulado):
+    colunas = ["faturamento", "custo_total", "margem_total"]
+    atual = df_atual.groupby("produto")[colunas].sum()
+    simulado = df_simulado.groupby("produto")[colunas].sum()
+    impacto = simulado - atual
+    impacto["vendas_alteradas"] = df_simulado.groupby("produto")["alterada"].sum()
+    return impacto[impacto["vendas_alteradas"] > 0].reset_index()
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+FATORES = ["vendas", "preco", "custo"]
+PERCENTIS = [5, 10, 25, 50, 75, 90, 95]
+# Sem histórico suficiente, cada fator varia em torno de zero com desvio de 10%
+PARAMETROS_PADRAO = {"media": 0.0, "desvio": 0.10}
+# Limita a matriz sorteios × produtos para manter o pico de memória controlado
+ELEMENTOS_POR_BLOCO = 2_000_000
+
+
+# --- Fórmula do simulador (a mesma do cenário determinístico) ---
+def lucro_cenario(base_vendas, margem_media, custo_fixo, fator_vendas, fator_preco, fator_custo):
+    # Fatores como variação decimal (0.10 = +10%); aceita escalares ou arrays
+    nova_receita = base_vendas * (1 + fator_vendas) * (1 + fator_preco)
+    novo_custo_var = (base_vendas * (1 - margem_media)) * (1 + fator_vendas) * (1 + fator_custo)
+    return nova_receita - novo_custo_var - custo_fixo
+
+
+def grade_sensibilidade(base_vendas, margem_media, custo_fixo,
+                        vendas_pct=range(-50, 51), preco_pct=range(-20, 21), custo_pct=range(-20, 21)):
+    # Avalia a fórmula em toda a grade custo × preço × volume de uma vez (broadcast).
+    # Eixos em pontos percentuais; lucro[i, j, k] = (custo[i], preco[j], vendas[k]).
+    eixos = {
+        "custo": np.asarray(custo_pct, dtype=float),
+        "preco": np.asarray(preco_pct, dtype=float),
+        "vendas": np.asarray(vendas_pct, dtype=float),
+    }
+    lucro = lucro_cenario(
+        base_vendas, margem_media, custo_fixo,
+        eixos["vendas"][np.newaxis, np.newaxis, :] / 100,
+        eixos["preco"][np.newaxis, :, np.newaxis] / 100,
+        eixos["custo"][:, np.newaxis, np.newaxis] / 100,
+    )
+    return {**eixos, "lucro": lucro}
+
+
+# --- Ajuste dos parâmetros pelo histórico mensal ---
+def _variacoes_mensais(df_cubo, por=None):
+    chaves = ["ano", "mes"] + ([por] if por else [])
+    mensal = df_cubo.groupby(chaves)[["faturamento", "custo_total", "qtd"]].sum()
+    qtd = mensal["qtd"].where(mensal["qtd"] > 0)
+    series = pd.DataFrame({
+        "vendas": mensal["qtd"],
+        "preco": mensal["faturamento"] / qtd,
+        "custo": mensal["custo_total"] / qtd,
+    })
+    if por:
+        series = series.unstack(por)
+    return series.pct_change(fill_method=None).replace([np.inf, -np.inf], np.nan)
+
+
+def _resumir(variacoes, minimo_meses):
+    media = variacoes.mean()
+    desvio = variacoes.std()
+    validos = variacoes.notna().sum() >= minimo_meses
+    media = media.where(validos, PARAMETROS_PADRAO["media"])
+    desvio = desvio.where(validos, PARAMETROS_PADRAO["desvio"])
+    return media, desvio
+
+
+def ajustar_parametros(df_cubo, minimo_meses=3):
+    # Média e desvio da variação mês a mês de volume, preço médio e custo unitário médio
+    if df_cubo.empty:
+        return {f: dict(PARAMETROS_PADRAO) for f in FATORES}
+    media, desvio = _resumir(_variacoes_mensais(df_cubo), minimo_meses)
+    return {f: {"media": float(media[f]), "desvio": float(desvio[f])} for f in FATORES}
+
+
+def ajustar_parametros_por_produto(df_cubo, minimo_meses=3):
+    # Uma linha por produto: participação na receita, margem e parâmetros de cada fator
+    por_produto = df_cubo.groupby("produto")[["faturamento", "custo_total"]].sum()
+    por_produto = por_produto[por_produto["faturamento"] > 0]
+    resultado = pd.DataFrame(index=por_produto.index)
+    resultado["participacao"] = por_produto["faturamento"] / por_produto["faturamento"].sum()
+    resultado["margem"] = 1 - por_produto["custo_total"] / por_produto["faturamento"]
+    media, desvio = _resumir(_variacoes_mensais(df_cubo, por="produto"), minimo_meses)
+    for f in FATORES:
+        resultado[f"{f}_media"] = media[f].reindex(resultado.index).fillna(PARAMETROS_PADRAO["media"])
+        resultado[f"{f}_desvio"] = desvio[f].reindex(resultado.index).fillna(PARAMETROS_PADRAO["desvio"])
+    return resultado
+
+
+# --- Sorteios ---
+def _sortear(rng, media, desvio, forma):
+    # Variações abaixo de -100% não fazem sentido (volume/preço/custo negativos)
+    return np.maximum(rng.normal(media, desvio, size=forma), -1.0)
+
+
+def simular_monte_carlo(base_vendas, margem_media, custo_fixo, parametros, n=1_000_000, semente=None):
+    rng = np.random.default_rng(semente)
+    fatores = [_sortear(rng, parametros[f]["media"], parametros[f]["desvio"], n) for f in FATORES]
+    return lucro_cenario(base_vendas, margem_media, custo_fixo, *fatores)
+
+
+def simular_monte_carlo_por_produto(base_vendas, custo_fixo, parametros_produto, n=100_000, semente=None):
+    # Cada produto tem seus próprios fatores; a receita base é rateada pela participação histórica
+    rng = np.random.default_rng(semente)
+    base = base_vendas * parametros_produto["participacao"].to_numpy()
+    margem = parametros_produto["margem"].to_numpy()
+    medias = {f: parametros_produto[f"{f}_media"].to_numpy() for f in FATORES}
+    desvios = {f: parametros_produto[f"{f}_desvio"].to_numpy() for f in FATORES}
+
+    lucros = np.empty(n)
+    bloco = max(1, ELEMENTOS_POR_BLOCO // max(len(base), 1))
+    for inicio in range(0, n, bloco):
+        forma = (min(bloco, n - inicio), len(base))
+        fatores = [_sortear(rng, medias[f], desvios[f], forma) for f in FATORES]
+        lucros[inicio:inicio + forma[0]] = lucro_cenario(base, margem, 0.0, *fatores).sum(axis=1)
+    return lucros - custo_fixo
+
+
+# --- Resumo da distribuição ---
+def resumir_distribuicao(lucros, faixas=60):
+    percentis = np.percentile(lucros, PERCENTIS)
+    contagens, bordas = np.histogram(lucros, bins=faixas)
+    return {
+        "media": float(lucros.mean()),
+        "desvio": float(lucros.std()),
+        "prob_prejuizo": float((lucros < 0).mean()),
+        "percentis": dict(zip(PERCENTIS, percentis.tolist())),
+        "histograma": pd.DataFrame({
+            "lucro": (bordas[:-1] + bordas[1:]) / 2,
+            "frequencia": contagens / len(lucros),
+        }),
+    }
@@ -1,9 +1,26 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from collections import deque
 from datetime import datetime, date
-import json
+from banco_dados import BancoDados, META_PADRAO, SITUACOES_EVENTO, TIPOS_EVENTO
+from dados_vendas import CacheVendas
+from backup import FORMATOS, gerar_backup, restaurar_backup
+from importacao import ler_planilha, preparar_importacao
+from catalogo import CatalogoProdutos
+from graficos import CacheFiguras, go, px
+import calculos
+import dre
+import instrumentacao
+import reprecificacao
+import previsao
+from exportacao import FORMATOS_RELATORIO, ExportacaoRelatorios
+from simulacao import (
+    PERCENTIS, ajustar_parametros, ajustar_parametros_por_produto, grade_sensibilidade,
+    resumir_distribuicao, simular_monte_carlo, simular_monte_carlo_por_produto
+)
 
 # --- Configuração da Página ---
 st.set_page_config(
@@ -13,78 +30,234 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# --- Diagnóstico de desempenho (opcional, ligado na sidebar) ---
+# Mede cada seção desta execução; desligado, medir() não faz nada
+diagnostico = instrumentacao.iniciar() if st.session_state.get("diagnostico") else None
+
+def medir(nome):
+    return instrumentacao.secao(diagnostico, nome)
+
 # --- Estilização CSS Profissional ---
-st.markdown("""
-    <style>
-    .main { background-color: #f8f9fa; }
-    .big-font { font-size:24px !important; font-weight: bold; color: #2C3E50; }
-    .metric-container {
-        background-color: #ffffff;
-        border-left: 5px solid #3498db;
-        padding: 15px;
-        border-radius: 8px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .sim-card {
-        background-color: #ffffff;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.05);
-        margin-bottom: 20px;
-        border: 1px solid #e0e0e0;
-    }
-    .stTabs [data-baseweb="tab-list"] { gap: 2px; }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: #ffffff;
-        border-radius: 4px 4px 0px 0px;
-        box-shadow: 0 -1px 2px rgba(0,0,0,0.05);
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #eef2f6;
-        color: #2980b9;
-        font-weight: bold;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-# --- Inicialização de Estado ---
-if "custos_fixos_lista" not in st.session_state:
-    st.session_state.custos_fixos_lista = []
-if "catalogo_produtos" not in st.session_state:
-    st.session_state.catalogo_produtos = []
-if "vendas_registradas" not in st.session_state:
-    st.session_state.vendas_registradas = []
-if "meta_faturamento" not in st.session_state:
-    st.session_state.meta_faturamento = 35000.00
-if "temp_custos_produto" not in st.session_state:
-    st.session_state.temp_custos_produto = []
+with medir("Estilo"):
+    st.markdown("""
+        <style>
+        .main { background-color: #f8f9fa; }
+        .big-font { font-size:24px !important; font-weight: bold; color: #2C3E50; }
+        .metric-container {
+            background-color: #ffffff;
+            border-left: 5px solid #3498db;
+            padding: 15px;
+            border-radius: 8px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        }
+        .sim-card {
+            background-color: #ffffff;
+            padding: 20px;
+            border-radius: 10px;
+            box-shadow: 0 4px 6px rgba(0,0,0,0.05);
+            margin-bottom: 20px;
+            border: 1px solid #e0e0e0;
+        }
+        .stTabs [data-baseweb="tab-list"] { gap: 2px; }
+        .stTabs [data-baseweb="tab"] {
+            height: 50px;
+            white-space: pre-wrap;
+            background-color: #ffffff;
+            border-radius: 4px 4px 0px 0px;
+            box-shadow: 0 -1px 2px rgba(0,0,0,0.05);
+        }
+        .stTabs [aria-selected="true"] {
+            background-color: #eef2f6;
+            color: #2980b9;
+            font-weight: bold;
+        }
+        </style>
+        """, unsafe_allow_html=True)
+
+# --- Banco de Dados (compartilhado entre sessões) ---
+@st.cache_resource
+def obter_banco():
+    return BancoDados()
+
+@st.cache_resource
+def obter_vendas():
+    return CacheVendas(obter_banco())
+
+@st.cache_resource
+def obter_catalogo():
+    return CatalogoProdutos(obter_banco())
+
+@st.cache_resource
+def obter_figuras():
+    return CacheFiguras(limite=64)
+
+@st.cache_resource
+def obter_pool_exportacao():
+    # Compartilhado entre sessões: exportações longas não seguram o script de ninguém
+    return ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="exportacao")
+
+with medir("Recursos compartilhados"):
+    db = obter_banco()
+    figuras = obter_figuras()
+# Vendas e catálogo são carregados depois da sidebar, que assim aparece antes da leitura do histórico
+
+# --- Inicialização de Estado (uma vez por sessão) ---
+with medir("Estado da sessão"):
+    if "sessao_iniciada" not in st.session_state:
+        st.session_state.meta_faturamento = db.obter_config("meta", META_PADRAO)
+        st.session_state.temp_custos_produto = []
+        st.session_state.temp_custo_total = 0.0
+        st.session_state.rascunhos_fixos = []  # linhas novas ainda sem descrição
+        st.session_state.geracao_editores = {}
+        for chave in ["sim_fator_vendas", "sim_fator_preco", "sim_fator_custo"]:
+            st.session_state[chave] = 0
+        st.session_state.reprec_periodo = (date(date.today().year, 1, 1), date.today())
+        st.session_state.sessao_iniciada = True
+
+    # Abas fechadas não renderizam seus widgets e o Streamlit descartaria o estado deles;
+    # reatribuir as chaves a cada execução preserva as escolhas ao trocar de aba
+    WIDGETS_PERSISTENTES = ["dash_ano", "dash_mes", "sim_fator_vendas", "sim_fator_preco", "sim_fator_custo", "hist_periodo", "hist_produto", "fixos_reajuste", "dash_previsao",
+                            "reprec_periodo", "reprec_campos", "reprec_produtos", "mix_objetivo", "mix_capacidade", "mix_maximo"]
+    for chave in WIDGETS_PERSISTENTES:
+        if chave in st.session_state:
+            st.session_state[chave] = st.session_state[chave]
+
+TAMANHO_PAGINA_HISTORICO = 50
+
+lista_meses = {1:"Janeiro", 2:"Fevereiro", 3:"Março", 4:"Abril", 5:"Maio", 6:"Junho", 
+               7:"Julho", 8:"Agosto", 9:"Setembro", 10:"Outubro", 11:"Novembro", 12:"Dezembro"}
 
 # --- Funções Auxiliares ---
-def converter_dados_para_json():
-    dados = {
-        "custos_fixos": st.session_state.custos_fixos_lista,
-        "produtos": st.session_state.catalogo_produtos,
-        "vendas": st.session_state.vendas_registradas,
-        "meta": st.session_state.meta_faturamento
-    }
-    return json.dumps(dados, default=str)
+def periodo_referencia():
+    # Ano/mês escolhidos no dashboard; por padrão o último ano com vendas e o mês atual
+    anos = vendas.cubo.anos()
+    ano = st.session_state.get("dash_ano")
+    if ano not in anos:
+        ano = anos[-1] if anos else datetime.now().year
+    return ano, st.session_state.get("dash_mes", datetime.now().month)
 
-def carregar_dados_json(arquivo):
+def mostrar_grafico(nome, chave, construir):
+    # Reaproveita a figura enquanto a chave (os dados de que ela depende) não mudar
+    with medir(f"Gráfico: {nome}"):
+        st.plotly_chart(figuras.obter(nome, chave, construir), use_container_width=True)
+
+def chave_custos_fixos(custos):
+    return tuple(tuple(c.values()) for c in custos)
+
+# --- Editores de tabela (aplicação por diferença) ---
+# Cada editor recebe uma chave com número de geração. O callback lê só o que o editor
+# reportou (linhas editadas/incluídas/excluídas), aplica isso ao armazenamento e avança
+# a geração, para o editor recomeçar da base atualizada e sem alterações acumuladas.
+def chave_editor(nome):
+    return f"{nome}_{st.session_state.geracao_editores.get(nome, 0)}"
+
+def mudancas_editor(nome):
+    estado = st.session_state.get(chave_editor(nome)) or {}
+    st.session_state.geracao_editores[nome] = st.session_state.geracao_editores.get(nome, 0) + 1
+    editadas = {int(i): mudanca for i, mudanca in estado.get("edited_rows", {}).items()}
+    return editadas, estado.get("added_rows", []), sorted(estado.get("deleted_rows", []), reverse=True)
+
+def valor_custo(linha):
     try:
-        dados = json.load(arquivo)
-        st.session_state.custos_fixos_lista = dados.get("custos_fixos", [])
-        st.session_state.catalogo_produtos = dados.get("produtos", [])
-        st.session_state.vendas_registradas = dados.get("vendas", [])
-        st.session_state.meta_faturamento = dados.get("meta", 35000.00)
-        return True
+        return max(float(linha.get("valor") or 0.0), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def aplicar_edicoes_fixos(nome_editor, custos, mes_vigencia):
+    # `custos`: contas (com id) exibidas na montagem do editor, seguidas dos rascunhos
+    editadas, incluidas, excluidas = mudancas_editor(nome_editor)
+    rascunhos = st.session_state.rascunhos_fixos
+    n_banco = len(custos)
+    for i, mudanca in editadas.items():
+        if i >= n_banco:
+            rascunhos[i - n_banco].update(mudanca)
+        elif i not in excluidas:
+            conta = {**custos[i], **mudanca}
+            if conta.get("descricao"):
+                db.alterar_custo_fixo(conta["id"], conta["descricao"], valor_custo(conta), mes_vigencia)
+            else:
+                db.encerrar_custo_fixo(conta["id"], mes_vigencia)
+    for i in excluidas:
+        if i >= n_banco:
+            rascunhos.pop(i - n_banco)
+        else:
+            db.encerrar_custo_fixo(custos[i]["id"], mes_vigencia)
+    rascunhos.extend(dict(linha) for linha in incluidas)
+    # Só vão para o banco as linhas novas que já têm descrição
+    for linha in [r for r in rascunhos if r.get("descricao")]:
+        db.incluir_custo_fixo(linha["descricao"], valor_custo(linha), mes_vigencia)
+        rascunhos.remove(linha)
+
+def aplicar_edicoes_ficha():
+    # Atualiza a ficha técnica em edição e o custo total pela diferença de cada linha
+    editadas, incluidas, excluidas = mudancas_editor("editor_custos_prod")
+    custos = st.session_state.temp_custos_produto
+    total = st.session_state.temp_custo_total
+    for i, mudanca in editadas.items():
+        novo = {**custos[i], **mudanca}
+        total += valor_ficha(novo) - valor_ficha(custos[i])
+        custos[i] = novo
+    for i in excluidas:
+        total -= valor_ficha(custos.pop(i))
+    for linha in incluidas:
+        custos.append({"item": linha.get("item"), "valor": linha.get("valor")})
+        total += valor_ficha(custos[-1])
+    st.session_state.temp_custo_total = total
+
+def valor_ficha(linha):
+    # Só entram no custo do produto os insumos com nome e valor não negativo
+    return valor_custo(linha) if linha.get("item") else 0.0
+
+def carregar_backup(arquivo):
+    barra = st.progress(0.0, text="Restaurando backup...")
+
+    def ao_progredir(fracao, resumo):
+        barra.progress(fracao, text=f"Restaurando backup... {resumo['vendas']:,} vendas")
+
+    try:
+        resumo = restaurar_backup(db, arquivo, ao_progredir=ao_progredir)
     except Exception as e:
+        barra.empty()
         st.error(f"Erro ao carregar arquivo: {e}")
         return False
+    obter_vendas().recarregar()
+    obter_catalogo().recarregar()
+    st.session_state.meta_faturamento = resumo["meta"]
+    st.session_state.resumo_restauracao = resumo
+    return True
+
+# --- DRE mês a mês (recalculada quando as vendas ou o custo fixo mudam) ---
+@st.cache_data(max_entries=4)
+def matriz_dre(versao_vendas, historico_custos, _df_cubo):
+    return dre.matriz_mensal(_df_cubo, historico_custos)
+
+# --- Previsão de receita (refeita só quando entram vendas novas) ---
+@st.cache_data(max_entries=4)
+def previsao_receita(versao_vendas, historico_custos, _df_cubo):
+    # A matriz vai até o fim da previsão para ter o custo fixo dos meses futuros
+    total, por_produto = previsao.prever(_df_cubo)
+    return total, por_produto, dre.matriz_mensal(_df_cubo, historico_custos, fim=total.index.max())
+
+# --- Simulação Monte Carlo (cacheada pelos parâmetros de entrada) ---
+@st.cache_data(max_entries=4)
+def parametros_historicos(versao_vendas, _df_cubo):
+    return ajustar_parametros(_df_cubo), ajustar_parametros_por_produto(_df_cubo)
+
+@st.cache_data(max_entries=16)
+def rodar_monte_carlo(base_vendas, margem_media, custo_fixo, parametros, n, semente=42):
+    return resumir_distribuicao(simular_monte_carlo(base_vendas, margem_media, custo_fixo, parametros, n, semente))
+
+@st.cache_data(max_entries=16)
+def rodar_monte_carlo_por_produto(base_vendas, custo_fixo, parametros_produto, n, semente=42):
+    return resumir_distribuicao(simular_monte_carlo_por_produto(base_vendas, custo_fixo, parametros_produto, n, semente))
+
+# A grade só é recalculada quando base, margem ou custo fixo mudam
+@st.cache_data(max_entries=8)
+def grade_sensibilidade_cacheada(base_vendas, margem_media, custo_fixo):
+    return grade_sensibilidade(base_vendas, margem_media, custo_fixo)
 
 # --- SIDEBAR: CONTROLE E BACKUP ---
-with st.sidebar:
+with medir("Sidebar e backup"), st.sidebar:
     st.title("💎 Gestão Premium")
     st.caption("Painel de Controle Financeiro")
     st.markdown("---")
@@ -93,6 +266,7 @@ with st.sidebar:
     nova_meta = st.number_input("Meta Mensal (R$)", value=float(st.session_state.meta_faturamento), step=1000.0, format="%.2f")
     if nova_meta != st.session_state.meta_faturamento:
         st.session_state.meta_faturamento = nova_meta
+        db.definir_config("meta", nova_meta)
         st.rerun()
 
     st.markdown("---")
@@ -100,84 +274,87 @@ with st.sidebar:
     
     col_dl, col_ul = st.columns(2)
     with col_dl:
-        json_data = converter_dados_para_json()
+        formato_backup = st.selectbox("Formato do Backup", options=list(FORMATOS.keys()), format_func=lambda f: FORMATOS[f]["rotulo"])
+        meta_backup = st.session_state.meta_faturamento
+        # O backup só é gerado quando o botão é clicado (callable), nunca a cada rerun
         st.download_button(
             label="⬇️ Backup",
-            data=json_data,
-            file_name=f"backup_salao_{datetime.now().strftime('%Y%m%d')}.json",
-            mime="application/json",
+            data=lambda: gerar_backup(db, meta_backup, formato_backup),
+            file_name=f"backup_salao_{datetime.now().strftime('%Y%m%d')}.{formato_backup}",
+            mime=FORMATOS[formato_backup]["mime"],
+            on_click="ignore",
             use_container_width=True
         )
     
-    uploaded_file = st.file_uploader("Restaurar Dados", type="json", label_visibility="collapsed")
+    uploaded_file = st.file_uploader("Restaurar Dados", type=["json", "ndjson", "gz"], label_visibility="collapsed")
     if uploaded_file is not None:
         if st.button("Carregar Arquivo", use_container_width=True):
-            if carregar_dados_json(uploaded_file):
-                st.success("Sistema atualizado!")
+            if carregar_backup(uploaded_file):
                 st.rerun()
+    if "resumo_restauracao" in st.session_state:
+        resumo = st.session_state.pop("resumo_restauracao")
+        st.success(f"Sistema atualizado! {resumo['vendas']:,} vendas, {resumo['produtos']} produtos e {resumo['custos_fixos']} custos fixos carregados.")
+        if resumo["rejeitados"]:
+            st.warning(f"{resumo['rejeitados']:,} registros inválidos foram ignorados.")
     
     st.divider()
     if st.button("⚠️ Resetar Sistema", type="primary", use_container_width=True):
-        st.session_state.custos_fixos_lista = []
-        st.session_state.catalogo_produtos = []
-        st.session_state.vendas_registradas = []
+        db.resetar()
+        obter_vendas().recarregar()
+        obter_catalogo().recarregar()
         st.rerun()
+    
+    st.divider()
+    st.toggle("🛠️ Diagnóstico de desempenho", key="diagnostico", help="Mede o tempo de cada seção, os DataFrames criados e os bytes enviados por elemento")
+    painel_diagnostico = st.container()
+
+with medir("Carga de vendas e catálogo"):
+    vendas = obter_vendas()
+    catalogo = obter_catalogo()
+
+# --- Leitura do Banco para esta execução ---
+with medir("Leitura dos custos fixos"):
+    custos_fixos_lista = db.listar_custos_fixos()  # contas vigentes no mês atual
+    historico_custos = db.historico_custos_fixos()  # todas as versões, com vigência
 
 # --- TABS PRINCIPAIS ---
 st.title("📊 Dashboard Financeiro Integrado")
+# Com on_change="rerun" cada aba sabe se está aberta (.open) e só a visível é processada
 tab_dash, tab_lancamentos, tab_produtos, tab_relatorios, tab_simulador = st.tabs([
     "📈 Visão Geral", 
     "📝 Lançamentos (Vendas/Custos)", 
     "📦 Catálogo de Produtos", 
     "📑 Relatórios Avançados",
     "🔮 Simulador & Ponto de Equilíbrio"
-])
+], key="aba_principal", on_change="rerun")
 
 # ==========================================
 # TAB 1: DASHBOARD EXECUTIVO (VISÃO GERAL)
 # ==========================================
-with tab_dash:
+def pagina_dashboard():
     # Filtro de Mês para o Dashboard
-    df_vendas = pd.DataFrame(st.session_state.vendas_registradas)
-    custo_fixo_total = sum(item['valor'] for item in st.session_state.custos_fixos_lista)
-    
+    cubo = vendas.cubo
     col_ano, col_mes, col_vazio = st.columns([1, 1, 3])
+    sel_ano, sel_mes = periodo_referencia()
+    st.session_state.dash_ano, st.session_state.dash_mes = sel_ano, sel_mes
     with col_ano:
-        ano_atual = datetime.now().year
-        if not df_vendas.empty:
-            lista_anos = sorted(list(set(df_vendas["ano"])))
-            sel_ano = st.selectbox("Ano de Referência", lista_anos, index=len(lista_anos)-1)
-        else:
-            sel_ano = ano_atual
-            st.selectbox("Ano de Referência", [ano_atual])
+        lista_anos = cubo.anos() or [sel_ano]
+        sel_ano = st.selectbox("Ano de Referência", lista_anos, key="dash_ano")
             
     with col_mes:
-        mes_atual = datetime.now().month
-        lista_meses = {1:"Janeiro", 2:"Fevereiro", 3:"Março", 4:"Abril", 5:"Maio", 6:"Junho", 
-                       7:"Julho", 8:"Agosto", 9:"Setembro", 10:"Outubro", 11:"Novembro", 12:"Dezembro"}
-        sel_mes = st.selectbox("Mês de Referência", options=list(lista_meses.keys()), format_func=lambda x: lista_meses[x], index=mes_atual-1)
-
-    # Cálculos do Mês Selecionado
-    receita_mes = 0.0
-    custo_var_mes = 0.0
-    lucro_mes = -custo_fixo_total # Começa negativo pelo custo fixo
-    ponto_equilibrio_mes = 0.0
-    
-    if not df_vendas.empty:
-        mask = (df_vendas["ano"] == sel_ano) & (df_vendas["mes"] == sel_mes)
-        df_filtrado = df_vendas[mask]
-        
-        if not df_filtrado.empty:
-            receita_mes = df_filtrado["faturamento"].sum()
-            custo_var_mes = df_filtrado["custo_total"].sum()
-            margem_contrib = receita_mes - custo_var_mes
-            lucro_mes = margem_contrib - custo_fixo_total
-            
-            # Cálculo do Ponto de Equilíbrio
-            # PE = Custo Fixo / Margem de Contribuição Percentual
-            margem_perc_mes = (margem_contrib / receita_mes) if receita_mes > 0 else 0
-            if margem_perc_mes > 0:
-                ponto_equilibrio_mes = custo_fixo_total / margem_perc_mes
+        sel_mes = st.selectbox("Mês de Referência", options=list(lista_meses.keys()), format_func=lambda x: lista_meses[x], key="dash_mes")
+
+    # Custo fixo vigente no mês escolhido (reajustes não reescrevem meses passados)
+    custo_fixo_total = sum(item['valor'] for item in db.listar_custos_fixos(f"{sel_ano}-{sel_mes:02d}"))
+
+    # Cálculos do Mês Selecionado (sem vendas no mês, o lucro é só o custo fixo negativo)
+    receita_mes = custo_var_mes = 0.0
+    if not cubo.vazio:
+        totais_mes = cubo.total_mes(sel_ano, sel_mes)
+        receita_mes, custo_var_mes = float(totais_mes["faturamento"]), float(totais_mes["custo_total"])
+    kpis = calculos.kpis_mes(receita_mes, custo_var_mes, custo_fixo_total)
+    lucro_mes = kpis["lucro"]
+    ponto_equilibrio_mes = kpis["ponto_equilibrio"]
     
     # --- CARDS DE KPI ---
     c1, c2, c3, c4, c5 = st.columns(5)
@@ -191,7 +368,7 @@ with tab_dash:
         
     with c2:
         st.markdown('<div class="metric-container" style="border-left-color: #e74c3c;">', unsafe_allow_html=True)
-        st.metric("Custos Totais", f"R$ {(custo_fixo_total + custo_var_mes):,.2f}", help=f"Fixo: {custo_fixo_total} | Var: {custo_var_mes}")
+        st.metric("Custos Totais", f"R$ {kpis['custos_totais']:,.2f}", help=f"Fixo: {custo_fixo_total} | Var: {custo_var_mes}")
         st.markdown('</div>', unsafe_allow_html=True)
         
     with c3:
@@ -201,15 +378,14 @@ with tab_dash:
         st.markdown('</div>', unsafe_allow_html=True)
         
     with c4:
-        margem_liq = (lucro_mes / receita_mes * 100) if receita_mes > 0 else 0
         st.markdown('<div class="metric-container" style="border-left-color: #f1c40f;">', unsafe_allow_html=True)
-        st.metric("Margem Líq. %", f"{margem_liq:.1f}%", help="% que sobra no bolso")
+        st.metric("Margem Líq. %", f"{kpis['margem_liquida_perc']:.1f}%", help="% que sobra no bolso")
         st.markdown('</div>', unsafe_allow_html=True)
 
     with c5:
         # Card Ponto de Equilíbrio
         st.markdown('<div class="metric-container" style="border-left-color: #8e44ad;">', unsafe_allow_html=True)
-        delta_pe = receita_mes - ponto_equilibrio_mes
+        delta_pe = kpis["folga_ponto_equilibrio"]
         label_pe = "Acima do PE" if delta_pe >= 0 else "Abaixo do PE"
         st.metric("Ponto Equilíbrio", f"R$ {ponto_equilibrio_mes:,.2f}", delta=f"{delta_pe:,.2f} ({label_pe})", help="Faturamento mínimo para não ter prejuízo")
         st.markdown('</div>', unsafe_allow_html=True)
@@ -221,149 +397,358 @@ with tab_dash:
     
     with g1:
         st.subheader("Evolução Anual: Realizado vs Meta")
-        if not df_vendas.empty:
-            df_ano_full = df_vendas[df_vendas["ano"] == sel_ano]
-            df_agrupado = df_ano_full.groupby("mes")["faturamento"].sum().reindex(range(1, 13), fill_value=0).reset_index()
-            df_agrupado["nome_mes"] = df_agrupado["mes"].map(lista_meses).str[:3]
-            
-            fig = go.Figure()
-            fig.add_trace(go.Bar(x=df_agrupado["nome_mes"], y=df_agrupado["faturamento"], name="Faturamento", marker_color="#3498db"))
-            fig.add_trace(go.Scatter(x=df_agrupado["nome_mes"], y=[st.session_state.meta_faturamento]*12, name="Meta", line=dict(color="red", dash="dash")))
-            fig.update_layout(height=350, margin=dict(l=20, r=20, t=20, b=20))
-            st.plotly_chart(fig, use_container_width=True)
+        if not cubo.vazio:
+            meta = st.session_state.meta_faturamento
+            com_previsao = st.toggle("Mostrar previsão dos próximos 12 meses", key="dash_previsao")
+            if com_previsao:
+                with medir("Previsão de receita"):
+                    total_previsto, _, matriz_prevista = previsao_receita(vendas.versao, historico_custos, cubo.df)
+                previsto_ano = total_previsto[total_previsto.index.year == sel_ano]
+                mes_equilibrio = previsao.mes_equilibrio(matriz_prevista, total_previsto, sel_ano)
+            def montar_anual():
+                df_agrupado = cubo.serie_mensal(sel_ano).rename_axis("mes").reset_index()
+                df_agrupado["nome_mes"] = df_agrupado["mes"].map(lista_meses).str[:3]
+                
+                fig = go.Figure()
+                fig.add_trace(go.Bar(x=df_agrupado["nome_mes"], y=df_agrupado["faturamento"], name="Faturamento", marker_color="#3498db"))
+                fig.add_trace(go.Scatter(x=df_agrupado["nome_mes"], y=[meta]*12, name="Meta", line=dict(color="red", dash="dash")))
+                if com_previsao and not previsto_ano.empty:
+                    x_prev = [lista_meses[p.month][:3] for p in previsto_ano.index]
+                    fig.add_trace(go.Scatter(
+                        x=x_prev + x_prev[::-1], y=list(previsto_ano["superior"]) + list(previsto_ano["inferior"])[::-1],
+                        fill="toself", fillcolor="rgba(41,128,185,0.15)", line=dict(width=0), name="Faixa 80%", hoverinfo="skip"
+                    ))
+                    fig.add_trace(go.Scatter(x=x_prev, y=previsto_ano["receita"], name="Previsão", mode="lines+markers", line=dict(color="#2980b9", dash="dot")))
+                if com_previsao and mes_equilibrio is not None:
+                    fig.add_annotation(x=lista_meses[mes_equilibrio.month][:3], y=meta, text="Equilíbrio do ano", showarrow=True, arrowhead=2, ay=-40)
+                fig.update_layout(height=350, margin=dict(l=20, r=20, t=20, b=20))
+                return fig
+            chave_previsao = (com_previsao, chave_custos_fixos(historico_custos)) if com_previsao else False
+            mostrar_grafico("anual", (vendas.versao, sel_ano, meta, chave_previsao), montar_anual)
+            if com_previsao:
+                if mes_equilibrio is not None:
+                    st.caption(f"Pela previsão, o resultado acumulado de {sel_ano} cobre os custos fixos em **{lista_meses[mes_equilibrio.month]}**.")
+                else:
+                    st.caption(f"Pela previsão, o resultado acumulado de {sel_ano} não cobre os custos fixos até o fim do ano.")
         else:
             st.info("Sem dados para exibir gráfico anual.")
 
     with g2:
         st.subheader("Composição de Custos")
         if (custo_fixo_total + custo_var_mes) > 0:
-            labels = ["Custos Fixos", "Custos Variáveis (Vendas)"]
-            values = [custo_fixo_total, custo_var_mes]
-            fig_pie = px.pie(names=labels, values=values, hole=0.4, color_discrete_sequence=["#95a5a6", "#e74c3c"])
-            fig_pie.update_layout(height=350, margin=dict(l=20, r=20, t=20, b=20), showlegend=True, legend=dict(orientation="h"))
-            st.plotly_chart(fig_pie, use_container_width=True)
+            def montar_pizza():
+                labels = ["Custos Fixos", "Custos Variáveis (Vendas)"]
+                values = [custo_fixo_total, custo_var_mes]
+                fig_pie = px.pie(names=labels, values=values, hole=0.4, color_discrete_sequence=["#95a5a6", "#e74c3c"])
+                fig_pie.update_layout(height=350, margin=dict(l=20, r=20, t=20, b=20), showlegend=True, legend=dict(orientation="h"))
+                return fig_pie
+            mostrar_grafico("composicao_custos", (custo_fixo_total, custo_var_mes), montar_pizza)
         else:
             st.info("Sem custos registrados.")
 
+if tab_dash.open:
+    with medir("Aba: Visão Geral"), tab_dash:
+        pagina_dashboard()
+
 # ==========================================
 # TAB 2: LANÇAMENTOS (VENDAS E CUSTOS FIXOS)
 # ==========================================
-with tab_lancamentos:
-    st.markdown("### 📝 Central de Lançamentos")
+# --- REGISTRO DE VENDAS ---
+def secao_registrar_venda():
+    col_form, col_hist = st.columns([1, 2])
     
-    subtab_vendas, subtab_fixos = st.tabs(["💰 Registrar Venda", "🏢 Gerenciar Custos Fixos"])
+    with col_form:
+        with st.container(border=True):
+            st.subheader("Nova Venda")
+            if catalogo.vazio:
+                st.warning("⚠️ Cadastre produtos primeiro!")
+            else:
+                dt_venda = st.date_input("Data do Evento", datetime.now())
     
-    # --- REGISTRO DE VENDAS ---
-    with subtab_vendas:
-        col_form, col_hist = st.columns([1, 2])
-        
-        with col_form:
-            with st.container(border=True):
-                st.subheader("Nova Venda")
-                if not st.session_state.catalogo_produtos:
-                    st.warning("⚠️ Cadastre produtos primeiro!")
-                else:
-                    dt_venda = st.date_input("Data do Evento", datetime.now())
-                    
-                    lista_prods = [p['nome'] for p in st.session_state.catalogo_produtos]
-                    if lista_prods:
-                        prod_sel = st.selectbox("Produto/Serviço", lista_prods)
-                        qtd_sel = st.number_input("Quantidade", 1, 100, 1)
-                        
-                        prod_obj = next((p for p in st.session_state.catalogo_produtos if p['nome'] == prod_sel), None)
-                        
-                        if prod_obj:
-                            st.caption(f"Valor Unit: R$ {prod_obj['preco_venda']:.2f} | Custo Unit: R$ {prod_obj['custo_total']:.2f}")
-                            
-                            if st.button("Confirmar Lançamento", type="primary", use_container_width=True):
-                                registro = {
-                                    "id_venda": datetime.now().timestamp(),
-                                    "data": dt_venda.strftime("%Y-%m-%d"),
-                                    "mes": dt_venda.month,
-                                    "ano": dt_venda.year,
-                                    "produto": prod_sel,
-                                    "qtd": qtd_sel,
-                                    "preco_unitario": prod_obj['preco_venda'],
-                                    "custo_unitario": prod_obj['custo_total'],
-                                    "faturamento": prod_obj['preco_venda'] * qtd_sel,
-                                    "custo_total": prod_obj['custo_total'] * qtd_sel,
-                                    "margem_total": (prod_obj['preco_venda'] - prod_obj['custo_total']) * qtd_sel
-                                }
-                                st.session_state.vendas_registradas.append(registro)
-                                st.success("Venda Registrada!")
-                                st.rerun()
-                        else:
-                            st.error("Erro ao recuperar dados do produto.")
+                lista_prods = catalogo.nomes()
+                if lista_prods:
+                    prod_sel = st.selectbox("Produto/Serviço", lista_prods)
+                    qtd_sel = st.number_input("Quantidade", 1, 100, 1)
+    
+                    prod_obj = catalogo.por_nome(prod_sel)
+    
+                    if prod_obj:
+                        st.caption(f"Valor Unit: R$ {prod_obj['preco_venda']:.2f} | Custo Unit: R$ {prod_obj['custo_total']:.2f}")
+    
+                        if st.button("Confirmar Lançamento", type="primary", use_container_width=True):
+                            registro = {
+                                "id_venda": datetime.now().timestamp(),
+                                "data": dt_venda.strftime("%Y-%m-%d"),
+                                "mes": dt_venda.month,
+                                "ano": dt_venda.year,
+                                "produto": prod_sel,
+                                "produto_id": prod_obj['id'],
+                                "qtd": qtd_sel,
+                                "preco_unitario": prod_obj['preco_venda'],
+                                "custo_unitario": prod_obj['custo_total'],
+                                "faturamento": prod_obj['preco_venda'] * qtd_sel,
+                                "custo_total": prod_obj['custo_total'] * qtd_sel,
+                                "margem_total": (prod_obj['preco_venda'] - prod_obj['custo_total']) * qtd_sel
+                            }
+                            vendas.registrar(registro)
+                            st.success("Venda Registrada!")
+                            st.rerun()
                     else:
-                        st.warning("Nenhum produto cadastrado.")
-
-        with col_hist:
-            st.subheader("Histórico de Vendas")
-            if st.session_state.vendas_registradas:
-                df_hist = pd.DataFrame(st.session_state.vendas_registradas)
-                df_hist = df_hist.sort_values("data", ascending=False)
-                
-                st.dataframe(
-                    df_hist[["data", "produto", "qtd", "faturamento", "margem_total"]],
-                    column_config={
-                        "data": "Data",
-                        "faturamento": st.column_config.NumberColumn("Total (R$)", format="R$ %.2f"),
-                        "margem_total": st.column_config.NumberColumn("Lucro Bruto", format="R$ %.2f")
-                    },
-                    use_container_width=True,
-                    hide_index=True
-                )
-                if st.button("🗑️ Excluir Último Lançamento"):
-                    st.session_state.vendas_registradas.pop()
-                    st.rerun()
-            else:
-                st.info("Nenhuma venda lançada.")
+                        st.error("Erro ao recuperar dados do produto.")
+                else:
+                    st.warning("Nenhum produto cadastrado.")
+    
+    with col_hist:
+        historico_vendas()
 
-    # --- CUSTOS FIXOS ---
-    with subtab_fixos:
-        st.markdown("**Custos Fixos Mensais (Recorrentes)**")
-        st.info("Edite diretamente na tabela abaixo. As alterações são salvas automaticamente.")
-        
-        df_fixos = pd.DataFrame(st.session_state.custos_fixos_lista)
-        if df_fixos.empty:
-            df_fixos = pd.DataFrame([{"descricao": "", "valor": 0.0}])
-        
-        edited_fixos = st.data_editor(
-            df_fixos,
-            num_rows="dynamic",
+# Fragmento: navegar e filtrar o histórico reexecuta só este painel
+@st.fragment
+def historico_vendas():
+    st.subheader("Histórico de Vendas")
+    if vendas.vazio:
+        st.info("Nenhuma venda lançada.")
+        return
+    
+    col_periodo, col_produto = st.columns([3, 2])
+    periodo = col_periodo.date_input("Período", value=(), format="DD/MM/YYYY", key="hist_periodo")
+    produto_filtro = col_produto.selectbox("Produto", ["Todos"] + catalogo.nomes(), key="hist_produto")
+    filtros = {
+        "data_inicio": periodo[0].strftime("%Y-%m-%d") if len(periodo) > 0 else None,
+        "data_fim": periodo[-1].strftime("%Y-%m-%d") if len(periodo) > 0 else None,
+        "produto": None if produto_filtro == "Todos" else produto_filtro,
+    }
+    
+    # Pilha com o cursor (data, id) do início de cada página já visitada; filtros novos voltam à primeira
+    if st.session_state.get("hist_filtros") != filtros:
+        st.session_state.hist_filtros = filtros
+        st.session_state.hist_cursores = [None]
+    cursores = st.session_state.hist_cursores
+    
+    linhas, tem_mais = db.pagina_vendas(TAMANHO_PAGINA_HISTORICO, cursores[-1], **filtros)
+    selecionada = None
+    if linhas:
+        evento_tabela = st.dataframe(
+            pd.DataFrame(linhas)[["id", "data", "produto", "qtd", "faturamento", "margem_total"]],
             column_config={
-                "descricao": "Descrição da Conta",
-                "valor": st.column_config.NumberColumn("Valor Mensal (R$)", format="R$ %.2f", min_value=0)
+                "id": st.column_config.NumberColumn("Nº", format="%d"),
+                "data": "Data",
+                "faturamento": st.column_config.NumberColumn("Total (R$)", format="R$ %.2f"),
+                "margem_total": st.column_config.NumberColumn("Lucro Bruto", format="R$ %.2f")
             },
             use_container_width=True,
-            key="editor_fixos_pro"
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="hist_tabela"
         )
-        
-        novos_fixos = []
-        for idx, row in edited_fixos.iterrows():
-            if row["descricao"]:
-                novos_fixos.append({"descricao": row["descricao"], "valor": float(row["valor"] or 0.0)})
-        
-        st.session_state.custos_fixos_lista = novos_fixos
+        linhas_sel = [i for i in evento_tabela.selection.rows if i < len(linhas)]
+        selecionada = linhas[linhas_sel[0]] if linhas_sel else None
+    else:
+        st.info("Nenhuma venda no filtro selecionado.")
+    
+    # Os botões só mexem na pilha (callbacks), antes da reexecução do fragmento
+    col_ant, col_pag, col_prox = st.columns([1, 2, 1])
+    col_ant.button("◀ Mais recentes", disabled=len(cursores) == 1, use_container_width=True, on_click=cursores.pop)
+    col_pag.caption(f"Página {len(cursores)}")
+    proximo = (linhas[-1]["data"], linhas[-1]["id"]) if linhas else None
+    col_prox.button("Mais antigas ▶", disabled=not tem_mais, use_container_width=True, on_click=cursores.append, args=(proximo,))
+    
+    if selecionada is None:
+        st.caption("Selecione uma venda na tabela para corrigir ou estornar.")
+    else:
+        corrigir_venda(selecionada)
+    
+    diario_vendas()
 
-        # --- NOVA ÁREA: ANÁLISE DE CUSTOS FIXOS ---
-        if st.session_state.custos_fixos_lista:
-            st.divider()
-            st.subheader("📊 Análise de Custos Fixos")
-            
-            df_analise_fixos = pd.DataFrame(st.session_state.custos_fixos_lista)
-            
-            # Totais
-            total_mensal = df_analise_fixos["valor"].sum()
-            total_anual = total_mensal * 12
-            
-            # Colunas de Métricas
-            col_tot1, col_tot2 = st.columns(2)
-            col_tot1.metric("Total Mensal Comprometido", f"R$ {total_mensal:,.2f}")
-            col_tot2.metric("Projeção Anual (12 meses)", f"R$ {total_anual:,.2f}", help="Quanto sua empresa gasta por ano só para existir")
-            
-            # Gráfico de Barras Horizontais
-            st.markdown("**Distribuição por Conta**")
+def corrigir_venda(venda):
+    # Chaves com o id da venda: trocar a seleção recarrega os valores dela
+    id_linha = venda["id"]
+    with st.container(border=True):
+        st.markdown(f"**Venda nº {id_linha}** — {venda['produto']}")
+        c_data, c_prod, c_qtd = st.columns([2, 3, 1])
+        nova_data = c_data.date_input("Data", date.fromisoformat(venda["data"]), format="DD/MM/YYYY", key=f"corr_data_{id_linha}")
+        nomes = catalogo.nomes()
+        opcoes = nomes if venda["produto"] in nomes else [venda["produto"]] + nomes
+        novo_produto = c_prod.selectbox("Produto/Serviço", opcoes, index=opcoes.index(venda["produto"]), key=f"corr_prod_{id_linha}")
+        nova_qtd = c_qtd.number_input("Qtd", 1, 100, int(venda["qtd"]), key=f"corr_qtd_{id_linha}")
+        c_preco, c_custo = st.columns(2)
+        novo_preco = c_preco.number_input("Valor Unit. (R$)", 0.0, value=float(venda["preco_unitario"]), step=10.0, key=f"corr_preco_{id_linha}")
+        novo_custo = c_custo.number_input("Custo Unit. (R$)", 0.0, value=float(venda["custo_unitario"]), step=10.0, key=f"corr_custo_{id_linha}")
+    
+        campos = {"data": nova_data.strftime("%Y-%m-%d"), "qtd": nova_qtd, "preco_unitario": novo_preco, "custo_unitario": novo_custo}
+        if novo_produto != venda["produto"]:
+            # Trocar de produto não muda os valores digitados; use os do catálogo se quiser
+            prod_obj = catalogo.por_nome(novo_produto)
+            campos.update(produto=novo_produto, produto_id=prod_obj["id"] if prod_obj else None)
+        alterada = any(campos[c] != venda[c] for c in campos if c != "produto_id")
+    
+        c_salvar, c_estornar = st.columns(2)
+        salvar = c_salvar.button("💾 Salvar Correção", type="primary", disabled=not alterada, use_container_width=True, key=f"corr_salvar_{id_linha}")
+        estornar = c_estornar.button("🗑️ Estornar Venda", use_container_width=True, key=f"corr_estornar_{id_linha}")
+        if salvar or estornar:
+            try:
+                if salvar:
+                    vendas.corrigir(id_linha, campos)
+                else:
+                    vendas.estornar(id_linha)
+            except ValueError as e:  # venda já estornada em outra sessão
+                st.session_state.erro_diario = str(e)
+            st.rerun()
+
+def diario_vendas():
+    # Desfazer/refazer percorrem o diário de vendas (inclusões, estornos e correções)
+    proximo_desfazer, proximo_refazer = db.pilhas_diario()
+    def rotulo(evento):
+        return f"{TIPOS_EVENTO[evento['tipo']].lower()} da venda nº {evento['id_linha']}" if evento else ""
+    
+    if "erro_diario" in st.session_state:
+        st.error(st.session_state.pop("erro_diario"))
+    c_desfazer, c_refazer = st.columns(2)
+    for coluna, evento, rotulo_botao, acao in [
+        (c_desfazer, proximo_desfazer, "↩️ Desfazer", vendas.desfazer),
+        (c_refazer, proximo_refazer, "↪️ Refazer", vendas.refazer),
+    ]:
+        if coluna.button(rotulo_botao, disabled=evento is None, help=rotulo(evento).capitalize() or None, use_container_width=True):
+            try:
+                acao()
+            except ValueError as e:
+                st.session_state.erro_diario = str(e)
+            st.rerun()
+    
+    with st.expander("📜 Diário de lançamentos"):
+        eventos = db.listar_diario()
+        if not eventos:
+            st.caption("Nenhum lançamento avulso registrado.")
+        else:
+            def resumo(venda):
+                return f"{venda['data']} · {venda['produto']} · {venda['qtd']} × R$ {venda['preco_unitario']:,.2f}" if venda else "—"
+            st.dataframe(
+                pd.DataFrame({
+                    "Quando": [e["momento"] for e in eventos],
+                    "Evento": [TIPOS_EVENTO[e["tipo"]] for e in eventos],
+                    "Venda": [e["id_linha"] for e in eventos],
+                    "Antes": [resumo(e["antes"]) for e in eventos],
+                    "Depois": [resumo(e["depois"]) for e in eventos],
+                    "Situação": [SITUACOES_EVENTO[e["desfeito"]] for e in eventos],
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+# --- IMPORTAÇÃO EM LOTE ---
+def secao_importar_planilha():
+    st.markdown("**Importar vendas de uma planilha (CSV ou Excel)**")
+    st.caption("Colunas esperadas: Data, Produto e Quantidade. Preço e custo vêm do catálogo de produtos.")
+    
+    if "resumo_importacao" in st.session_state:
+        st.success(f"{st.session_state.pop('resumo_importacao'):,} vendas importadas!")
+    
+    # Chave com geração: depois de importar, o uploader volta vazio e o mesmo arquivo não é importado de novo
+    arquivo_planilha = st.file_uploader("Planilha de Vendas", type=["csv", "xlsx"], key=chave_editor("upload_planilha"))
+    if arquivo_planilha is not None:
+        # A preparação é feita uma vez por arquivo, não a cada rerun
+        preparada = st.session_state.get("importacao_preparada")
+        if preparada is None or preparada[0] != arquivo_planilha.file_id:
+            try:
+                df_planilha = ler_planilha(arquivo_planilha, arquivo_planilha.name)
+                preparada = (arquivo_planilha.file_id, *preparar_importacao(df_planilha, catalogo.df))
+            except Exception as e:
+                preparada = None
+                st.error(f"Erro ao ler planilha: {e}")
+            st.session_state.importacao_preparada = preparada
+    
+        if preparada is not None:
+            _, linhas_importacao, df_desconhecidos, qtd_invalidas = preparada
+            c_imp1, c_imp2, c_imp3 = st.columns(3)
+            c_imp1.metric("Vendas Válidas", f"{len(linhas_importacao):,}")
+            c_imp2.metric("Produtos Desconhecidos", f"{int(df_desconhecidos['linhas'].sum()):,}", help="Linhas cujo produto não está no catálogo")
+            c_imp3.metric("Linhas Inválidas", f"{qtd_invalidas:,}", help="Data, quantidade ou produto inválidos")
+    
+            if not df_desconhecidos.empty:
+                st.warning("Os produtos abaixo não existem no catálogo e serão ignorados:")
+                st.dataframe(df_desconhecidos, column_config={"produto": "Produto", "linhas": "Linhas"}, hide_index=True)
+    
+            if linhas_importacao and st.button(f"Importar {len(linhas_importacao):,} Vendas", type="primary"):
+                st.session_state.resumo_importacao = vendas.registrar_lote(linhas_importacao)
+                del st.session_state.importacao_preparada
+                geracao = st.session_state.geracao_editores
+                geracao["upload_planilha"] = geracao.get("upload_planilha", 0) + 1
+                st.rerun()
+
+# --- CUSTOS FIXOS ---
+# Fragmento: editar a tabela reexecuta só esta seção, não a página inteira
+@st.fragment
+def secao_custos_fixos():
+    st.markdown("**Custos Fixos Mensais (Recorrentes)**")
+    st.info("Edite diretamente na tabela abaixo. As alterações são salvas automaticamente, linha a linha.")
+    
+    # Lidos aqui (e não no topo do script) porque o fragmento reexecuta sozinho depois de cada edição
+    historico_fixos = db.historico_custos_fixos()
+    
+    # Sem histórico ainda, o padrão é cadastrar valores que valem para todo o período
+    st.session_state.setdefault("fixos_reajuste", bool(historico_fixos))
+    col_modo, col_vig, col_vig_info = st.columns([1, 1, 2])
+    reajuste = col_modo.toggle("Reajuste a partir de um mês", key="fixos_reajuste", help="Desligado, as alterações corrigem os valores em todo o período de cada conta.")
+    if reajuste:
+        data_vigencia = col_vig.date_input("Vigente a partir de", value=date.today(), format="DD/MM/YYYY")
+        mes_vigencia = data_vigencia.strftime("%Y-%m")
+        col_vig_info.caption(f"Valores de {lista_meses[data_vigencia.month]}/{data_vigencia.year} em diante; meses anteriores mantêm os valores da época.")
+    else:
+        mes_vigencia = None
+        col_vig_info.caption("Correção: os novos valores substituem os antigos em todo o histórico.")
+    
+    custos_com_id = db.listar_custos_fixos(mes_vigencia, incluir_ids=True)
+    nome_editor = f"editor_fixos_{mes_vigencia}"
+    contas_editor = [{"descricao": c["descricao"], "valor": c["valor"]} for c in custos_com_id]
+    
+    st.data_editor(
+        pd.DataFrame(contas_editor + st.session_state.rascunhos_fixos, columns=["descricao", "valor"]),
+        num_rows="dynamic",
+        column_config={
+            "descricao": "Descrição da Conta",
+            "valor": st.column_config.NumberColumn("Valor Mensal (R$)", format="R$ %.2f", min_value=0)
+        },
+        use_container_width=True,
+        key=chave_editor(nome_editor),
+        on_change=aplicar_edicoes_fixos,
+        args=(nome_editor, custos_com_id, mes_vigencia)
+    )
+    
+    with st.expander("🕒 Histórico de vigências"):
+        df_historico = pd.DataFrame(historico_fixos, columns=["descricao", "valor", "vigencia_inicio", "vigencia_fim"])
+        st.dataframe(
+            df_historico.fillna({"vigencia_inicio": "início", "vigencia_fim": "atual"}),
+            column_config={
+                "descricao": "Conta",
+                "valor": st.column_config.NumberColumn("Valor Mensal (R$)", format="R$ %.2f"),
+                "vigencia_inicio": "De (mês)",
+                "vigencia_fim": "Até (mês)",
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    # --- NOVA ÁREA: ANÁLISE DE CUSTOS FIXOS ---
+    # As contas do editor já refletem as edições: o on_change grava antes de o fragmento reexecutar
+    contas_vigentes = contas_editor
+    if contas_vigentes:
+        st.divider()
+        st.subheader("📊 Análise de Custos Fixos")
+    
+        df_analise_fixos = pd.DataFrame(contas_vigentes)
+    
+        # Totais
+        total_mensal = df_analise_fixos["valor"].sum()
+        total_anual = total_mensal * 12
+    
+        # Colunas de Métricas
+        col_tot1, col_tot2 = st.columns(2)
+        col_tot1.metric("Total Mensal Comprometido", f"R$ {total_mensal:,.2f}")
+        col_tot2.metric("Projeção Anual (12 meses)", f"R$ {total_anual:,.2f}", help="Quanto sua empresa gasta por ano só para existir")
+    
+        # Gráfico de Barras Horizontais
+        st.markdown("**Distribuição por Conta**")
+        def montar_ranking_fixos():
             fig_cf_bar = px.bar(
                 df_analise_fixos.sort_values("valor", ascending=True), 
                 x="valor", 
@@ -374,163 +759,213 @@ with tab_lancamentos:
             )
             fig_cf_bar.update_layout(xaxis_title="Valor Mensal (R$)", yaxis_title="Conta")
             fig_cf_bar.update_traces(marker_color="#3498db")
-            st.plotly_chart(fig_cf_bar, use_container_width=True)
+            return fig_cf_bar
+        mostrar_grafico("ranking_fixos", chave_custos_fixos(contas_vigentes), montar_ranking_fixos)
+
+def pagina_lancamentos():
+    st.markdown("### 📝 Central de Lançamentos")
+    
+    subtab_vendas, subtab_importar, subtab_fixos = st.tabs(
+        ["💰 Registrar Venda", "📥 Importar Planilha", "🏢 Gerenciar Custos Fixos"],
+        key="aba_lancamentos", on_change="rerun"
+    )
+    if subtab_vendas.open:
+        with subtab_vendas:
+            secao_registrar_venda()
+    if subtab_importar.open:
+        with subtab_importar:
+            secao_importar_planilha()
+    if subtab_fixos.open:
+        with subtab_fixos:
+            secao_custos_fixos()
+
+if tab_lancamentos.open:
+    with medir("Aba: Lançamentos"), tab_lancamentos:
+        pagina_lancamentos()
 
 # ==========================================
 # TAB 3: CATÁLOGO DE PRODUTOS (EDITÁVEL)
 # ==========================================
-with tab_produtos:
-    st.markdown("### 📦 Gestão de Produtos e Custos")
+# Fragmento: editar a ficha técnica reexecuta só o formulário
+@st.fragment
+def formulario_produto(id_edit):
+    dados = {"nome": "", "preco": 0.0, "custos": []}
     
-    col_lista, col_detalhe = st.columns([1, 2])
+    p = catalogo.obter(id_edit)
+    if p:
+        dados = {"nome": p['nome'], "preco": p['preco_venda'], "custos": p['custos_lista']}
     
-    # Seletor de Produto
-    opcoes = ["➕ Novo Produto"] + [p['nome'] for p in st.session_state.catalogo_produtos]
-    selecao = col_lista.radio("Selecione o Produto", options=opcoes)
+    with st.container(border=True):
+        st.subheader(f"Editando: {dados['nome'] or '➕ Novo Produto'}")
     
-    idx_edit = -1
-    dados = {"nome": "", "preco": 0.0, "custos": []}
+        nome = st.text_input("Nome do Produto", value=dados['nome'])
+        preco = st.number_input("Preço de Venda (R$)", value=float(dados['preco']), step=10.0)
     
-    if selecao != "➕ Novo Produto":
-        for i, p in enumerate(st.session_state.catalogo_produtos):
-            if p['nome'] == selecao:
-                dados = {"nome": p['nome'], "preco": p['preco_venda'], "custos": p['custos_lista']}
-                idx_edit = i
-                break
+        st.markdown("---")
+        st.markdown("**Composição de Custos (Ficha Técnica)**")
     
-    with col_detalhe:
-        with st.container(border=True):
-            st.subheader(f"Editando: {selecao}")
-            
-            nome = st.text_input("Nome do Produto", value=dados['nome'])
-            preco = st.number_input("Preço de Venda (R$)", value=float(dados['preco']), step=10.0)
-            
-            st.markdown("---")
-            st.markdown("**Composição de Custos (Ficha Técnica)**")
-            
-            # Carregar custos na sessão temporária
-            if "last_prod_sel" not in st.session_state or st.session_state.last_prod_sel != selecao:
-                st.session_state.temp_custos_produto = list(dados['custos'])
-                st.session_state.last_prod_sel = selecao
-
-            df_custos_temp = pd.DataFrame(st.session_state.temp_custos_produto)
-            if df_custos_temp.empty:
-                df_custos_temp = pd.DataFrame(columns=["item", "valor"])
-            
-            edited_custos = st.data_editor(
-                df_custos_temp,
-                num_rows="dynamic",
-                column_config={
-                    "item": "Insumo / Custo",
-                    "valor": st.column_config.NumberColumn("Custo (R$)", format="R$ %.2f")
-                },
-                use_container_width=True,
-                key="editor_custos_prod"
-            )
-            
-            custo_total = edited_custos["valor"].sum() if not edited_custos.empty else 0
-            margem = preco - custo_total
-            margem_perc = (margem/preco*100) if preco > 0 else 0
-            
-            c1, c2, c3 = st.columns(3)
-            c1.info(f"Custo Total: R$ {custo_total:.2f}")
-            c2.success(f"Margem: R$ {margem:.2f}")
-            c3.metric("Margem %", f"{margem_perc:.1f}%")
-            
-            st.divider()
-            
-            col_save, col_del = st.columns([4, 1])
-            
-            with col_save:
-                if st.button("💾 Salvar Produto", type="primary", use_container_width=True):
-                    if nome and preco > 0:
-                        nova_lista_custos = edited_custos.to_dict('records')
-                        nova_lista_custos = [x for x in nova_lista_custos if x['item'] and x['valor'] >= 0]
-                        
-                        prod_obj = {
-                            "nome": nome,
-                            "preco_venda": preco,
-                            "custos_lista": nova_lista_custos,
-                            "custo_total": custo_total,
-                            "margem": margem
-                        }
-                        
-                        if idx_edit >= 0:
-                            st.session_state.catalogo_produtos[idx_edit] = prod_obj
-                            st.toast("Produto Atualizado!")
-                        else:
-                            st.session_state.catalogo_produtos.append(prod_obj)
-                            st.toast("Produto Criado!")
+        # Carregar custos na sessão temporária
+        if "last_prod_sel" not in st.session_state or st.session_state.last_prod_sel != id_edit:
+            st.session_state.temp_custos_produto = [dict(c) for c in dados['custos']]
+            st.session_state.temp_custo_total = sum(valor_ficha(c) for c in dados['custos'])
+            st.session_state.last_prod_sel = id_edit
+            st.session_state.geracao_editores["editor_custos_prod"] = st.session_state.geracao_editores.get("editor_custos_prod", 0) + 1
+    
+        st.data_editor(
+            pd.DataFrame(st.session_state.temp_custos_produto, columns=["item", "valor"]),
+            num_rows="dynamic",
+            column_config={
+                "item": "Insumo / Custo",
+                "valor": st.column_config.NumberColumn("Custo (R$)", format="R$ %.2f")
+            },
+            use_container_width=True,
+            key=chave_editor("editor_custos_prod"),
+            on_change=aplicar_edicoes_ficha
+        )
+    
+        custo_total = round(st.session_state.temp_custo_total, 2)
+        margem = preco - custo_total
+        margem_perc = (margem/preco*100) if preco > 0 else 0
+    
+        c1, c2, c3 = st.columns(3)
+        c1.info(f"Custo Total: R$ {custo_total:.2f}")
+        c2.success(f"Margem: R$ {margem:.2f}")
+        c3.metric("Margem %", f"{margem_perc:.1f}%")
+    
+        st.divider()
+    
+        col_save, col_del = st.columns([4, 1])
+    
+        with col_save:
+            if st.button("💾 Salvar Produto", type="primary", use_container_width=True):
+                if nome and preco > 0:
+                    nova_lista_custos = [
+                        {"item": x['item'], "valor": valor_custo(x)}
+                        for x in st.session_state.temp_custos_produto if x.get('item')
+                    ]
+    
+                    prod_obj = {
+                        "nome": nome,
+                        "preco_venda": preco,
+                        "custos_lista": nova_lista_custos,
+                        "custo_total": custo_total,
+                        "margem": margem
+                    }
+    
+                    try:
+                        id_salvo, nome_anterior = catalogo.salvar(prod_obj, id_edit)
+                    except ValueError as e:
+                        st.error(str(e))
+                    else:
+                        if nome_anterior is None:
+                            vendas.vincular_produto(id_salvo, nome)
+                        elif nome_anterior != nome:
+                            vendas.renomear_produto(id_salvo, nome_anterior, nome)
+                        st.toast("Produto Atualizado!" if id_edit is not None else "Produto Criado!")
                         st.rerun()
-            
-            with col_del:
-                if idx_edit >= 0:
-                    if st.button("🗑️ Excluir", type="secondary", use_container_width=True):
-                         st.session_state.catalogo_produtos.pop(idx_edit)
-                         st.toast("Produto removido com sucesso!")
-                         st.rerun()
+    
+        with col_del:
+            if id_edit is not None:
+                if st.button("🗑️ Excluir", type="secondary", use_container_width=True):
+                     catalogo.excluir(id_edit)
+                     vendas.desvincular_produto(id_edit)
+                     st.toast("Produto removido com sucesso!")
+                     st.rerun()
+
+def pagina_produtos():
+    st.markdown("### 📦 Gestão de Produtos e Custos")
+    
+    col_lista, col_detalhe = st.columns([1, 2])
+    
+    # Seletor de Produto (pelo id, que não muda quando o produto é renomeado)
+    opcoes = [None] + catalogo.ids()
+    selecao = col_lista.radio(
+        "Selecione o Produto",
+        options=opcoes,
+        format_func=lambda i: "➕ Novo Produto" if i is None else catalogo.obter(i)['nome']
+    )
+    
+    with col_detalhe:
+        formulario_produto(selecao)
+
+if tab_produtos.open:
+    with medir("Aba: Produtos"), tab_produtos:
+        pagina_produtos()
 
 # ==========================================
 # TAB 4: RELATÓRIOS AVANÇADOS (BI)
 # ==========================================
-with tab_relatorios:
+def pagina_relatorios():
     st.markdown("### 📑 Relatórios Contábeis e Gerenciais")
     
-    if not st.session_state.vendas_registradas:
+    if vendas.vazio:
         st.info("Registre vendas para gerar relatórios.")
     else:
-        df_full = pd.DataFrame(st.session_state.vendas_registradas)
-        custo_fixo_mensal = sum(c['valor'] for c in st.session_state.custos_fixos_lista)
+        cubo = vendas.cubo
         
         # 1. DRE Gerencial
-        st.subheader("DRE Gerencial (Visão Acumulada Anual)")
+        st.subheader("DRE Gerencial")
         
-        receita_total = df_full["faturamento"].sum()
-        custo_var_total = df_full["custo_total"].sum()
-        margem_total = receita_total - custo_var_total
+        # Matriz mês a mês (calculada uma vez por versão dos dados); os recortes são fatias dela
+        with medir("DRE: matriz mensal"):
+            matriz = matriz_dre(vendas.versao, historico_custos, cubo.df)
+        meses = list(matriz.index)
         
-        meses_ativos = df_full["mes"].nunique()
-        custo_fixo_acumulado = custo_fixo_mensal * (meses_ativos if meses_ativos > 0 else 1)
-        
-        lucro_liquido_total = margem_total - custo_fixo_acumulado
-        div_receita = receita_total if receita_total > 0 else 1
+        col_recorte, col_intervalo = st.columns([1, 3])
+        with col_recorte:
+            recorte = st.selectbox("Período", ["Acumulado", "Últimos 12 meses", "Últimos 3 meses", "Intervalo"], key="dre_recorte")
+        with col_intervalo:
+            if recorte == "Intervalo":
+                inicio, fim = st.select_slider(
+                    "Meses", options=meses, value=(meses[max(0, len(meses) - 12)], meses[-1]),
+                    format_func=lambda p: f"{lista_meses[p.month][:3]}/{p.year}"
+                )
+            else:
+                n_meses = {"Acumulado": len(meses), "Últimos 12 meses": 12, "Últimos 3 meses": 3}[recorte]
+                inicio, fim = meses[max(0, len(meses) - n_meses)], meses[-1]
+                st.caption(f"De {lista_meses[inicio.month]}/{inicio.year} a {lista_meses[fim.month]}/{fim.year} ({fim.ordinal - inicio.ordinal + 1} meses, custo fixo cobrado em todos).")
+            comparar = st.toggle("Comparar com o mesmo período do ano anterior", key="dre_comparar")
         
-        margem_media_perc = (margem_total / div_receita)
-        pe_acumulado = 0.0
-        if margem_media_perc > 0:
-            pe_acumulado = custo_fixo_acumulado / margem_media_perc
+        comparacao = dre.comparar_ano_anterior(matriz, inicio, fim)
+        dre_sel = comparacao["atual"]
+        receita_total = dre_sel["receita"]
+        custo_var_total = dre_sel["custo_variavel"]
+        custo_fixo_acumulado = dre_sel["custo_fixo"]
+        lucro_liquido_total = dre_sel["resultado"]
+        pe_acumulado = dre.ponto_equilibrio(dre_sel)
             
         col_pe1, col_pe2 = st.columns([1, 3])
         with col_pe1:
-             st.metric("Ponto de Equilíbrio (Acumulado)", f"R$ {pe_acumulado:,.2f}", help="Valor total que precisaria ter vendido no período para cobrir todos os custos.")
-
-        dre_data = {
-            "Conceito": [
-                "1. Faturamento Bruto", 
-                "2. (-) Custos Variáveis (Produtos)", 
-                "= 3. Margem de Contribuição", 
-                "4. (-) Custos Fixos", 
-                "= 5. Resultado Líquido (Lucro/Prejuízo)"
-            ],
-            "Valor (R$)": [
-                receita_total, 
-                -custo_var_total, 
-                margem_total, 
-                -custo_fixo_acumulado, 
-                lucro_liquido_total
-            ],
-            "Análise Vertical (%)": [
-                100.0, 
-                (custo_var_total/div_receita*100), 
-                (margem_total/div_receita*100), 
-                (custo_fixo_acumulado/div_receita*100), 
-                (lucro_liquido_total/div_receita*100)
-            ]
-        }
-        st.dataframe(pd.DataFrame(dre_data).style.format({
-            "Valor (R$)": "R$ {:,.2f}", 
-            "Análise Vertical (%)": "{:.1f}%"
-        }), use_container_width=True)
+             st.metric("Ponto de Equilíbrio (Período)", f"R$ {pe_acumulado:,.2f}", help="Valor total que precisaria ter vendido no período para cobrir todos os custos.")
+
+        # Custos aparecem negativos na tabela (o "+ 0.0" evita exibir "-0,00")
+        sinais = pd.Series({"receita": 1, "custo_variavel": -1, "margem_contribuicao": 1, "custo_fixo": -1, "resultado": 1})
+        dre_data = pd.DataFrame({
+            "Conceito": [dre.ROTULOS[l] for l in dre.LINHAS],
+            "Valor (R$)": (dre_sel * sinais + 0.0)[dre.LINHAS].values,
+            "Análise Vertical (%)": dre.analise_vertical(dre_sel)[dre.LINHAS].values,
+        })
+        formatos = {"Valor (R$)": "R$ {:,.2f}", "Análise Vertical (%)": "{:.1f}%"}
+        if comparar:
+            dre_data["Ano Anterior (R$)"] = (comparacao["anterior"] * sinais + 0.0)[dre.LINHAS].values
+            dre_data["Variação (%)"] = comparacao["variacao_perc"][dre.LINHAS].values
+            formatos.update({"Ano Anterior (R$)": "R$ {:,.2f}", "Variação (%)": "{:+.1f}%"})
+        st.dataframe(dre_data.style.format(formatos, na_rep="—"), use_container_width=True, hide_index=True)
+        
+        with st.expander("📅 DRE mês a mês e resultado móvel"):
+            tabela_mensal = matriz.loc[inicio:fim, dre.LINHAS].rename(columns=dre.ROTULOS)
+            tabela_mensal.index = [f"{lista_meses[p.month][:3]}/{p.year}" for p in tabela_mensal.index]
+            st.dataframe(tabela_mensal.T.style.format("R$ {:,.0f}"), use_container_width=True)
+            
+            def montar_movel():
+                fig_movel = go.Figure()
+                for n_janela, cor in [(3, "#3498db"), (12, "#2C3E50")]:
+                    movel = dre.janela_movel(matriz, n_janela)["resultado"]
+                    fig_movel.add_trace(go.Scatter(x=movel.index.to_timestamp(), y=movel, name=f"Resultado {n_janela} meses", line=dict(color=cor)))
+                fig_movel.add_hline(y=0, line_dash="dash", line_color="red")
+                fig_movel.update_layout(height=300, margin=dict(l=20, r=20, t=30, b=20), yaxis_title="R$", legend=dict(orientation="h"))
+                return fig_movel
+            mostrar_grafico("resultado_movel", (vendas.versao, chave_custos_fixos(historico_custos)), montar_movel)
         
         st.divider()
         
@@ -541,25 +976,29 @@ with tab_relatorios:
             st.markdown("**Para onde vai o dinheiro? (Visão Macro)**")
             labels_macro = ["Custos Variáveis (Operação)", "Custos Fixos (Estrutura)", "Lucro Líquido (Bolso)"]
             vals_macro = [custo_var_total, custo_fixo_acumulado, max(0, lucro_liquido_total)]
-            fig_macro = px.pie(names=labels_macro, values=vals_macro, hole=0.4, color_discrete_sequence=px.colors.qualitative.Set2)
-            st.plotly_chart(fig_macro, use_container_width=True)
+            mostrar_grafico(
+                "macro", tuple(vals_macro),
+                lambda: px.pie(names=labels_macro, values=vals_macro, hole=0.4, color_discrete_sequence=px.colors.qualitative.Set2)
+            )
             
         with col_dre_g2:
             st.markdown("**Top Ofensores: Custos Fixos**")
-            if st.session_state.custos_fixos_lista:
-                df_cf = pd.DataFrame(st.session_state.custos_fixos_lista)
-                df_cf = df_cf.sort_values("valor", ascending=True)
-                fig_cf = px.bar(
-                    df_cf, 
-                    x="valor", 
-                    y="descricao", 
-                    orientation='h',
-                    title="Peso de cada conta no orçamento mensal",
-                    labels={"valor": "Valor Mensal (R$)", "descricao": "Conta"},
-                    text_auto=".2s"
-                )
-                fig_cf.update_traces(marker_color='#e74c3c')
-                st.plotly_chart(fig_cf, use_container_width=True)
+            if custos_fixos_lista:
+                def montar_ofensores():
+                    df_cf = pd.DataFrame(custos_fixos_lista)
+                    df_cf = df_cf.sort_values("valor", ascending=True)
+                    fig_cf = px.bar(
+                        df_cf, 
+                        x="valor", 
+                        y="descricao", 
+                        orientation='h',
+                        title="Peso de cada conta no orçamento mensal",
+                        labels={"valor": "Valor Mensal (R$)", "descricao": "Conta"},
+                        text_auto=".2s"
+                    )
+                    fig_cf.update_traces(marker_color='#e74c3c')
+                    return fig_cf
+                mostrar_grafico("ofensores_fixos", chave_custos_fixos(custos_fixos_lista), montar_ofensores)
             else:
                 st.info("Nenhum custo fixo cadastrado para análise.")
 
@@ -568,144 +1007,318 @@ with tab_relatorios:
         col_g1, col_g2 = st.columns(2)
         with col_g1:
             st.subheader("🏆 Ranking de Produtos (Lucro Bruto)")
-            df_prod_rank = df_full.groupby("produto")[["faturamento", "margem_total", "qtd"]].sum().reset_index()
-            df_prod_rank = df_prod_rank.sort_values("margem_total", ascending=True)
-            fig_rank = px.bar(
-                df_prod_rank, 
-                x="margem_total", 
-                y="produto", 
-                orientation='h',
-                text_auto='.2s',
-                color="margem_total",
-                color_continuous_scale="Blues"
-            )
-            st.plotly_chart(fig_rank, use_container_width=True)
+            def montar_ranking_produtos():
+                df_prod_rank = cubo.por_produto()
+                df_prod_rank = df_prod_rank.sort_values("margem_total", ascending=True)
+                return px.bar(
+                    df_prod_rank, 
+                    x="margem_total", 
+                    y="produto", 
+                    orientation='h',
+                    text_auto='.2s',
+                    color="margem_total",
+                    color_continuous_scale="Blues"
+                )
+            mostrar_grafico("ranking_produtos", vendas.versao, montar_ranking_produtos)
             
         with col_g2:
             st.subheader("📊 Matriz de Eficiência")
-            df_eficiencia = df_full.groupby("produto").agg({
-                "faturamento": "sum",
-                "margem_total": "sum",
-                "qtd": "sum"
-            }).reset_index()
-            
-            df_eficiencia["margem_perc"] = df_eficiencia.apply(lambda x: (x["margem_total"] / x["faturamento"] * 100) if x["faturamento"] > 0 else 0, axis=1)
-            
-            fig_scatter = px.scatter(
-                df_eficiencia,
-                x="margem_perc",
-                y="margem_total",
-                size="faturamento",
-                color="produto",
-                title="Margem % (Eixo X) vs Lucro Total R$ (Eixo Y)",
-                hover_name="produto"
-            )
-            fig_scatter.add_vline(x=df_eficiencia["margem_perc"].mean(), line_dash="dash", line_color="gray", annotation_text="Média %")
-            fig_scatter.add_hline(y=df_eficiencia["margem_total"].mean(), line_dash="dash", line_color="gray", annotation_text="Média R$")
-            st.plotly_chart(fig_scatter, use_container_width=True)
+            def montar_eficiencia():
+                df_eficiencia = cubo.por_produto()
+                
+                df_eficiencia["margem_perc"] = (df_eficiencia["margem_total"] / df_eficiencia["faturamento"].where(df_eficiencia["faturamento"] > 0) * 100).fillna(0)
+                
+                fig_scatter = px.scatter(
+                    df_eficiencia,
+                    x="margem_perc",
+                    y="margem_total",
+                    size="faturamento",
+                    color="produto",
+                    title="Margem % (Eixo X) vs Lucro Total R$ (Eixo Y)",
+                    hover_name="produto"
+                )
+                fig_scatter.add_vline(x=df_eficiencia["margem_perc"].mean(), line_dash="dash", line_color="gray", annotation_text="Média %")
+                fig_scatter.add_hline(y=df_eficiencia["margem_total"].mean(), line_dash="dash", line_color="gray", annotation_text="Média R$")
+                return fig_scatter
+            mostrar_grafico("eficiencia", vendas.versao, montar_eficiencia)
+        
+        st.divider()
+        secao_reprecificacao()
+        
+        st.divider()
+        secao_exportacao(matriz)
+
+# --- Reprecificação do histórico ---
+CAMPOS_REPRECIFICACAO = {"Custo": ["custo_unitario"], "Preço": ["preco_unitario"], "Preço e custo": reprecificacao.CAMPOS}
+
+@st.fragment
+def secao_reprecificacao():
+    st.subheader("🔁 Reprecificação do Histórico (E se?)")
+    st.caption("Recalcula as vendas do período com os valores atuais do catálogo e mostra o efeito na DRE antes de gravar.")
+    if catalogo.vazio:
+        st.info("Cadastre produtos para reprecificar o histórico.")
+        return
+    
+    col_periodo, col_campos, col_produtos = st.columns([2, 1, 2])
+    periodo = col_periodo.date_input("Vendas de", format="DD/MM/YYYY", key="reprec_periodo")
+    campos = CAMPOS_REPRECIFICACAO[col_campos.radio("Aplicar", list(CAMPOS_REPRECIFICACAO), key="reprec_campos")]
+    produtos = col_produtos.multiselect(
+        "Produtos", catalogo.ids(), format_func=lambda i: catalogo.obter(i)["nome"],
+        placeholder="Todos", key="reprec_produtos"
+    )
+    
+    if st.button("Simular reprecificação", disabled=len(periodo) < 2):
+        # Uma versão por produto vigente no período; o histórico todo é recalculado num único join
+        tabela = reprecificacao.tabela_do_catalogo(catalogo.df, periodo[0], periodo[1], campos, produtos or None)
+        df_atual = vendas.df
+        df_simulado = reprecificacao.reprecificar(df_atual, tabela)
+        alteradas = df_simulado.loc[df_simulado["alterada"], ["id", "preco_unitario", "custo_unitario"]]
+        st.session_state.reprec_resultado = {
+            "versao": vendas.versao,
+            "alteradas": {c: alteradas[c].to_numpy() for c in alteradas},
+            "dre": reprecificacao.comparar_dre(df_atual, df_simulado, historico_custos, periodo[0], periodo[1]),
+            "produtos": reprecificacao.impacto_por_produto(df_atual, df_simulado),
+        }
+    
+    resultado = st.session_state.get("reprec_resultado")
+    if resultado is None:
+        return
+    if resultado["versao"] != vendas.versao:
+        st.warning("As vendas mudaram desde a última simulação. Simule novamente.")
+        return
+    
+    n_alteradas = len(resultado["alteradas"]["id"])
+    comparacao = resultado["dre"]
+    col_k1, col_k2, col_k3 = st.columns(3)
+    col_k1.metric("Vendas Alteradas", n_alteradas)
+    col_k2.metric("Margem de Contribuição", f"R$ {comparacao.loc['margem_contribuicao', 'simulado']:,.2f}",
+                  delta=f"R$ {comparacao.loc['margem_contribuicao', 'diferenca']:,.2f}")
+    col_k3.metric("Resultado Líquido", f"R$ {comparacao.loc['resultado', 'simulado']:,.2f}",
+                  delta=f"R$ {comparacao.loc['resultado', 'diferenca']:,.2f}")
+    
+    col_dre, col_produtos = st.columns(2)
+    with col_dre:
+        st.markdown("**DRE do período: gravada vs reprecificada**")
+        tabela_dre = comparacao.loc[dre.LINHAS].rename(index=dre.ROTULOS) + 0.0
+        tabela_dre.columns = ["Atual (R$)", "Simulado (R$)", "Diferença (R$)"]
+        st.dataframe(tabela_dre.style.format("R$ {:,.2f}"), use_container_width=True)
+    with col_produtos:
+        st.markdown("**Impacto por produto**")
+        st.dataframe(
+            resultado["produtos"],
+            column_config={
+                "produto": "Produto",
+                "faturamento": st.column_config.NumberColumn("Δ Faturamento", format="R$ %.2f"),
+                "custo_total": st.column_config.NumberColumn("Δ Custo", format="R$ %.2f"),
+                "margem_total": st.column_config.NumberColumn("Δ Lucro Bruto", format="R$ %.2f"),
+                "vendas_alteradas": "Vendas",
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    if st.button(f"💾 Gravar reprecificação ({n_alteradas} vendas)", type="primary", disabled=n_alteradas == 0):
+        alteradas = st.session_state.pop("reprec_resultado")["alteradas"]
+        vendas.atualizar_valores(alteradas["id"], alteradas["preco_unitario"], alteradas["custo_unitario"])
+        st.rerun()
+
+# --- Exportação (XLSX/PDF) ---
+def iniciar_exportacao(formato, anos, matriz):
+    # O ponto de equilíbrio de cada ano sai do custo fixo vigente nos meses dele (ver tabelas_do_ano)
+    st.session_state.exportacao = ExportacaoRelatorios(
+        obter_pool_exportacao(), formato, anos, matriz, vendas.cubo.df, catalogo.df
+    )
+
+@st.fragment(run_every=1)
+def acompanhar_exportacao():
+    # Só este fragmento é reexecutado enquanto o pool trabalha; ao terminar, a página inteira
+    # é refeita uma vez para trocar a barra pelo botão de download
+    exportacao = st.session_state.exportacao
+    if exportacao.concluida:
+        st.rerun()
+    st.progress(exportacao.progresso, text=f"Gerando relatórios... {exportacao.concluidos}/{len(exportacao.anos)} ano(s)")
+
+def secao_exportacao(matriz):
+    st.subheader("📤 Exportar para o Contador")
+    st.caption("DRE do ano, DRE mês a mês, ranking de produtos e ponto de equilíbrio. Com vários anos, cada um vira um arquivo, gerados em paralelo.")
+    exportacao = st.session_state.get("exportacao")
+    em_andamento = exportacao is not None and not exportacao.concluida
+    
+    anos = vendas.cubo.anos()
+    col_formato, col_anos, col_botao = st.columns([1, 2, 1])
+    formato = col_formato.selectbox("Formato", list(FORMATOS_RELATORIO), format_func=lambda f: FORMATOS_RELATORIO[f]["rotulo"], key="export_formato")
+    anos_sel = col_anos.multiselect("Anos", anos, default=anos[-1:], key="export_anos")
+    col_botao.button(
+        "Gerar Relatórios", use_container_width=True, disabled=not anos_sel or em_andamento,
+        on_click=iniciar_exportacao, args=(formato, anos_sel, matriz)
+    )
+    
+    if exportacao is None:
+        return
+    if em_andamento:
+        acompanhar_exportacao()
+    elif exportacao.erro is not None:
+        st.error(f"Erro ao gerar os relatórios: {exportacao.erro}")
+    else:
+        nome, conteudo, mime = exportacao.resultado()
+        st.download_button(f"⬇️ Baixar {nome}", data=conteudo, file_name=nome, mime=mime, type="primary")
+
+if tab_relatorios.open:
+    with medir("Aba: Relatórios"), tab_relatorios:
+        pagina_relatorios()
 
 # ==========================================
 # TAB 5: SIMULADOR DE CENÁRIOS
 # ==========================================
-with tab_simulador:
-    st.header("🔮 Simulador & Análise de Ponto de Equilíbrio")
+# Seções do simulador em fragmentos: mexer nos sliders de uma seção reexecuta só ela
+@st.fragment
+def secao_cenarios(base_vendas_mensal, margem_media_atual, custo_fixo):
+    st.markdown("### 1. Simulador Global de Cenários")
+    st.caption("Ajuste os parâmetros para ver o impacto no resultado final (baseado no mês de referência do dashboard).")
     
-    if not st.session_state.catalogo_produtos:
-        st.warning("Cadastre produtos primeiro.")
-    else:
-        st.markdown("### 1. Simulador Global de Cenários")
-        st.caption("Ajuste os parâmetros para ver o impacto no resultado final (baseado no mês atual).")
-        
-        # Container para Inputs
-        with st.container():
-            col_params, col_result = st.columns([1, 2], gap="large")
-            
-            with col_params:
-                st.markdown('<div class="sim-card">', unsafe_allow_html=True)
-                st.markdown("**⚙️ Ajustes de Mercado**")
-                fator_vendas = st.slider("Volume de Vendas", -50, 50, 0, format="%d%%")
-                fator_preco = st.slider("Reajuste de Preços", -20, 20, 0, format="%d%%")
-                fator_custo = st.slider("Custo Operacional", -20, 20, 0, format="%d%%")
-                
-                base_vendas_padrao = receita_mes if 'receita_mes' in locals() else 0.0
-                st.divider()
-                base_vendas_mensal = st.number_input("Venda Base (Mês) R$", value=base_vendas_padrao)
-                st.markdown('</div>', unsafe_allow_html=True)
-
-            with col_result:
-                st.markdown('<div class="sim-card">', unsafe_allow_html=True)
-                st.markdown("**📊 Resultados da Simulação**")
-                
-                custo_fixo = sum(c['valor'] for c in st.session_state.custos_fixos_lista)
-                
-                # Lógica de Simulação
-                margem_media_atual = 0.40
-                if 'receita_total' in locals() and receita_total > 0:
-                    margem_media_atual = margem_total / receita_total
+    # Container para Inputs
+    with st.container():
+        col_params, col_result = st.columns([1, 2], gap="large")
 
-                nova_receita = base_vendas_mensal * (1 + fator_vendas/100) * (1 + fator_preco/100)
-                novo_custo_var = (base_vendas_mensal * (1 - margem_media_atual)) * (1 + fator_vendas/100) * (1 + fator_custo/100)
-                
-                nova_margem_val = nova_receita - novo_custo_var
-                novo_lucro = nova_margem_val - custo_fixo
-                val_margem_liq = (novo_lucro / nova_receita * 100) if nova_receita > 0 else 0.0
-                
-                col_s1, col_s2, col_s3 = st.columns(3)
-                col_s1.metric("Nova Receita", f"R$ {nova_receita:,.0f}", delta=f"{(nova_receita - base_vendas_mensal):,.0f}")
-                col_s2.metric("Novo Lucro", f"R$ {novo_lucro:,.0f}", delta=f"{(novo_lucro - (base_vendas_mensal * margem_media_atual - custo_fixo)):,.0f}")
-                col_s3.metric("Margem Líquida", f"{val_margem_liq:.1f}%")
-                
-                # Gráfico Simples
+        with col_params:
+            st.markdown('<div class="sim-card">', unsafe_allow_html=True)
+            st.markdown("**⚙️ Ajustes de Mercado**")
+            fator_vendas = st.slider("Volume de Vendas", -50, 50, format="%d%%", key="sim_fator_vendas")
+            fator_preco = st.slider("Reajuste de Preços", -20, 20, format="%d%%", key="sim_fator_preco")
+            fator_custo = st.slider("Custo Operacional", -20, 20, format="%d%%", key="sim_fator_custo")
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        with col_result:
+            st.markdown('<div class="sim-card">', unsafe_allow_html=True)
+            st.markdown("**📊 Resultados da Simulação**")
+
+            # Lógica de Simulação
+            sim = calculos.cenario(base_vendas_mensal, margem_media_atual, custo_fixo, fator_vendas / 100, fator_preco / 100, fator_custo / 100)
+            nova_receita, novo_lucro = sim["receita"], sim["lucro"]
+
+            col_s1, col_s2, col_s3 = st.columns(3)
+            col_s1.metric("Nova Receita", f"R$ {nova_receita:,.0f}", delta=f"{(nova_receita - base_vendas_mensal):,.0f}")
+            col_s2.metric("Novo Lucro", f"R$ {novo_lucro:,.0f}", delta=f"{(novo_lucro - sim['lucro_base']):,.0f}")
+            col_s3.metric("Margem Líquida", f"{sim['margem_liquida_perc']:.1f}%")
+
+            # Gráfico Simples
+            lucros_sim = (sim["lucro_base"], novo_lucro)
+            def montar_cenario():
                 fig_sim = go.Figure()
                 fig_sim.add_trace(go.Bar(x=["Cenário Base", "Cenário Simulado"], 
-                                        y=[base_vendas_mensal * margem_media_atual - custo_fixo, novo_lucro], 
+                                        y=list(lucros_sim), 
                                         marker_color=["#bdc3c7", "#3498db"]))
                 fig_sim.update_layout(height=200, margin=dict(l=20, r=20, t=30, b=20))
-                st.plotly_chart(fig_sim, use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-        
-        st.divider()
-        
-        # --- NOVA SEÇÃO: PONTO DE EQUILÍBRIO POR PRODUTO ---
-        st.markdown("### 2. Meta de Vendas para Ponto de Equilíbrio")
-        st.info("Esta análise responde: *Quantas festas deste tipo eu preciso vender para pagar TODO o custo fixo da empresa (R$ {:.2f})?*".format(custo_fixo))
-        
-        lista_pe_produtos = []
-        
-        for p in st.session_state.catalogo_produtos:
-            nome = p['nome']
-            preco = p['preco_venda']
-            custo_var = p['custo_total']
-            margem_unit = preco - custo_var
-            
-            if margem_unit > 0:
-                qtd_necessaria = custo_fixo / margem_unit
-                # Criar texto de dificuldade
-                dificuldade = "Baixa" if qtd_necessaria < 10 else "Média" if qtd_necessaria < 30 else "Alta"
+                return fig_sim
+            mostrar_grafico("cenario", lucros_sim, montar_cenario)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.divider()
+    
+    # --- ANÁLISE DE SENSIBILIDADE ---
+    # Fica no mesmo fragmento dos sliders porque marca o cenário escolhido neles
+    st.markdown("### 2. Análise de Sensibilidade (Volume × Preço)")
+    st.caption("Lucro para cada combinação de variação de volume e reajuste de preço, passo de 1%. A linha preta marca o ponto de equilíbrio (lucro zero).")
+    
+    grade = grade_sensibilidade_cacheada(base_vendas_mensal, margem_media_atual, custo_fixo)
+    custo_grade = st.select_slider("Custo Operacional (camada)", options=grade["custo"].astype(int).tolist(), value=fator_custo, format_func=lambda v: f"{v:+d}%")
+    lucro_camada = grade["lucro"][int(custo_grade - grade["custo"][0])]
+
+    def montar_sensibilidade():
+        fig_sens = go.Figure()
+        fig_sens.add_trace(go.Heatmap(
+            x=grade["vendas"], y=grade["preco"], z=lucro_camada,
+            colorscale="RdYlGn", zmid=0, colorbar=dict(title="Lucro R$"),
+            hovertemplate="Volume %{x:+.0f}%<br>Preço %{y:+.0f}%<br>Lucro R$ %{z:,.0f}<extra></extra>"
+        ))
+        fig_sens.add_trace(go.Contour(
+            x=grade["vendas"], y=grade["preco"], z=lucro_camada,
+            contours=dict(start=0, end=0, size=1, coloring="lines"),
+            line=dict(color="black", width=2), showscale=False, hoverinfo="skip", name="Ponto de Equilíbrio"
+        ))
+        fig_sens.add_trace(go.Scatter(
+            x=[fator_vendas], y=[fator_preco], mode="markers", name="Cenário Atual",
+            marker=dict(symbol="x", size=12, color="#2C3E50")
+        ))
+        fig_sens.update_layout(height=420, margin=dict(l=20, r=20, t=30, b=20), xaxis_title="Variação de Volume (%)", yaxis_title="Reajuste de Preço (%)", showlegend=False)
+        return fig_sens
+    mostrar_grafico("sensibilidade", (base_vendas_mensal, margem_media_atual, custo_fixo, custo_grade, fator_vendas, fator_preco), montar_sensibilidade)
+
+
+@st.fragment
+def secao_monte_carlo(base_vendas_mensal, margem_media_atual, custo_fixo):
+    st.markdown("### 3. Simulação Estocástica (Monte Carlo)")
+    st.caption("Sorteia milhares de cenários de volume, preço e custo, com parâmetros ajustados pelo histórico mensal, e mostra a distribuição do lucro.")
+    
+    parametros_globais, parametros_produtos = parametros_historicos(vendas.versao, vendas.cubo.df)
+    col_mc_params, col_mc_result = st.columns([1, 2], gap="large")
+
+    with col_mc_params:
+        modo_mc = st.radio("Modo", ["Global", "Por Produto"], horizontal=True)
+        if modo_mc == "Global":
+            n_sorteios = st.select_slider("Cenários Sorteados", options=[10_000, 100_000, 1_000_000], value=1_000_000, format_func=lambda n: f"{n:,}")
+            st.markdown("**Variação mensal (média / desvio %)**")
+            parametros_mc = {}
+            for fator, rotulo in [("vendas", "Volume"), ("preco", "Preço"), ("custo", "Custo")]:
+                c_media, c_desvio = st.columns(2)
+                media = c_media.number_input(f"{rotulo} média", value=round(parametros_globais[fator]["media"] * 100, 2), step=0.5, format="%.2f")
+                desvio = c_desvio.number_input(f"{rotulo} desvio", value=round(parametros_globais[fator]["desvio"] * 100, 2), min_value=0.0, step=0.5, format="%.2f")
+                parametros_mc[fator] = {"media": media / 100, "desvio": desvio / 100}
+            resultado_mc = rodar_monte_carlo(base_vendas_mensal, margem_media_atual, custo_fixo, parametros_mc, n_sorteios)
+            chave_mc = (base_vendas_mensal, margem_media_atual, custo_fixo, n_sorteios, tuple((f, p["media"], p["desvio"]) for f, p in parametros_mc.items()))
+        else:
+            n_sorteios = st.select_slider("Cenários Sorteados", options=[10_000, 50_000, 100_000], value=50_000, format_func=lambda n: f"{n:,}")
+            if parametros_produtos.empty:
+                st.info("Registre vendas para ajustar os parâmetros por produto.")
+                resultado_mc = None
             else:
-                qtd_necessaria = float('inf')
-                dificuldade = "Impossível (Margem Negativa)"
-            
-            lista_pe_produtos.append({
-                "Produto": nome,
-                "Preço Venda": preco,
-                "Custo Variável": custo_var,
-                "Margem Unitária": margem_unit,
-                "Qtd Necessária (PE)": qtd_necessaria,
-                "Meta Faturamento (PE)": qtd_necessaria * preco if qtd_necessaria != float('inf') else 0,
-                "Dificuldade": dificuldade
-            })
-            
-        df_pe = pd.DataFrame(lista_pe_produtos)
-        
-        c_pe_g, c_pe_t = st.columns([1, 2])
-        
-        with c_pe_g:
-            # Gráfico de Qtd Necessária
-            # Filtrar infinitos para o gráfico
+                st.caption("Cada produto tem seus próprios fatores, ajustados pelo seu histórico. A venda base é rateada pela participação de cada produto na receita.")
+                resultado_mc = rodar_monte_carlo_por_produto(base_vendas_mensal, custo_fixo, parametros_produtos, n_sorteios)
+                chave_mc = ("por_produto", vendas.versao, base_vendas_mensal, custo_fixo, n_sorteios)
+
+    with col_mc_result:
+        if resultado_mc is not None:
+            col_mc1, col_mc2, col_mc3 = st.columns(3)
+            col_mc1.metric("Lucro Esperado", f"R$ {resultado_mc['media']:,.0f}", help=f"Desvio padrão: R$ {resultado_mc['desvio']:,.0f}")
+            col_mc2.metric("Prob. Abaixo do PE", f"{resultado_mc['prob_prejuizo'] * 100:.1f}%", help="Chance de o lucro ficar negativo (abaixo do ponto de equilíbrio)")
+            col_mc3.metric("Faixa 90% (P5–P95)", f"R$ {resultado_mc['percentis'][5]:,.0f} a {resultado_mc['percentis'][95]:,.0f}")
+
+            df_hist_mc = resultado_mc["histograma"]
+            def montar_monte_carlo():
+                fig_mc = go.Figure()
+                fig_mc.add_trace(go.Bar(
+                    x=df_hist_mc["lucro"], y=df_hist_mc["frequencia"] * 100,
+                    marker_color=["#e74c3c" if v < 0 else "#3498db" for v in df_hist_mc["lucro"]],
+                    name="Cenários"
+                ))
+                fig_mc.add_vrect(x0=resultado_mc["percentis"][5], x1=resultado_mc["percentis"][95], fillcolor="#95a5a6", opacity=0.15, line_width=0, annotation_text="P5–P95")
+                fig_mc.add_vline(x=0, line_dash="dash", line_color="red", annotation_text="Ponto de Equilíbrio")
+                fig_mc.update_layout(height=300, margin=dict(l=20, r=20, t=30, b=20), xaxis_title="Lucro Simulado (R$)", yaxis_title="% dos Cenários", bargap=0.05)
+                return fig_mc
+            mostrar_grafico("monte_carlo", chave_mc, montar_monte_carlo)
+
+            st.dataframe(
+                pd.DataFrame({"Percentil": [f"P{p}" for p in PERCENTIS], "Lucro (R$)": [resultado_mc["percentis"][p] for p in PERCENTIS]}).set_index("Percentil").T,
+                column_config={f"P{p}": st.column_config.NumberColumn(format="R$ %.0f") for p in PERCENTIS},
+                use_container_width=True,
+                hide_index=True
+            )
+
+
+def secao_ponto_equilibrio(custo_fixo):
+    st.markdown("### 4. Meta de Vendas para Ponto de Equilíbrio")
+    st.info("Esta análise responde: *Quantas festas deste tipo eu preciso vender para pagar TODO o custo fixo da empresa (R$ {:.2f})?*".format(custo_fixo))
+    
+    df_pe = calculos.tabela_ponto_equilibrio(catalogo.df, custo_fixo)
+
+    c_pe_g, c_pe_t = st.columns([1, 2])
+
+    with c_pe_g:
+        # Gráfico de Qtd Necessária
+        # Filtrar infinitos para o gráfico
+        def montar_pe_produtos():
             df_graph = df_pe[df_pe["Qtd Necessária (PE)"] != float('inf')].sort_values("Qtd Necessária (PE)")
-            
-            fig_pe_bar = px.bar(
+            return px.bar(
                 df_graph,
                 x="Qtd Necessária (PE)",
                 y="Produto",
@@ -715,18 +1328,152 @@ with tab_simulador:
                 color="Qtd Necessária (PE)",
                 color_continuous_scale="Reds"
             )
-            st.plotly_chart(fig_pe_bar, use_container_width=True)
-            
-        with c_pe_t:
+        mostrar_grafico("pe_produtos", (catalogo.versao, custo_fixo), montar_pe_produtos)
+
+    with c_pe_t:
+        st.dataframe(
+            df_pe,
+            column_config={
+                "Preço Venda": st.column_config.NumberColumn(format="R$ %.2f"),
+                "Custo Variável": st.column_config.NumberColumn(format="R$ %.2f"),
+                "Margem Unitária": st.column_config.NumberColumn(format="R$ %.2f"),
+                "Qtd Necessária (PE)": st.column_config.NumberColumn(format="%.1f unid"),
+                "Meta Faturamento (PE)": st.column_config.NumberColumn(format="R$ %.2f"),
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+def aplicar_limites_mix(nome_editor, ids_produtos):
+    # Guarda os limites editados por id de produto, para sobreviverem à troca de aba
+    editadas, _, _ = mudancas_editor(nome_editor)
+    for linha, mudanca in editadas.items():
+        limite = st.session_state.mix_limites.setdefault(ids_produtos[linha], {"minimo": 0, "maximo": None})
+        for campo, valor in mudanca.items():
+            limite[campo] = None if valor is None or pd.isna(valor) else int(valor)
+
+# Fragmento: mudar capacidade e limites reexecuta só o otimizador
+@st.fragment
+def secao_mix_produtos(custo_fixo):
+    st.markdown("### 5. Mix de Produtos com Capacidade Limitada")
+    st.caption("Quais eventos vender no mês, respeitando as datas disponíveis e o máximo de cada produto. Cada evento ocupa uma data.")
+    
+    df_catalogo = catalogo.df
+    limites = st.session_state.setdefault("mix_limites", {})
+    ids_produtos = df_catalogo["id"].tolist()
+    
+    col_params, col_result = st.columns([1, 2], gap="large")
+    with col_params:
+        objetivo = st.radio("Objetivo", list(calculos.OBJETIVOS_MIX), format_func=calculos.OBJETIVOS_MIX.get, key="mix_objetivo")
+        capacidade = st.number_input("Datas disponíveis no mês", 1, 1000, 8, help="Ex.: fins de semana × eventos por fim de semana", key="mix_capacidade")
+        maximo_padrao = st.number_input("Máximo por produto (padrão)", 0, 1000, 4, key="mix_maximo")
+        with st.expander("Limites por produto"):
+            nome_editor = "editor_mix"
+            st.data_editor(
+                pd.DataFrame({
+                    "produto": df_catalogo["nome"],
+                    "minimo": [limites.get(i, {}).get("minimo", 0) for i in ids_produtos],
+                    "maximo": pd.array([limites.get(i, {}).get("maximo") for i in ids_produtos], dtype="Int64"),
+                }),
+                column_config={
+                    "produto": "Produto",
+                    "minimo": st.column_config.NumberColumn("Mínimo", min_value=0, step=1, help="Eventos já contratados"),
+                    "maximo": st.column_config.NumberColumn("Máximo", min_value=0, step=1, help="Vazio = máximo padrão"),
+                },
+                disabled=["produto"],
+                use_container_width=True,
+                hide_index=True,
+                key=chave_editor(nome_editor),
+                on_change=aplicar_limites_mix,
+                args=(nome_editor, ids_produtos)
+            )
+    
+    minimo = [limites.get(i, {}).get("minimo") or 0 for i in ids_produtos]
+    maximo = [maximo_padrao if limites.get(i, {}).get("maximo") is None else limites[i]["maximo"] for i in ids_produtos]
+    df_mix, resumo = calculos.otimizar_mix(df_catalogo, custo_fixo, capacidade, maximo, minimo, objetivo)
+    
+    with col_result:
+        if not resumo["viavel"]:
+            st.error(f"Os mínimos somam {sum(minimo)} eventos e só há {capacidade} datas disponíveis.")
+            return
+        c_ev, c_fat, c_luc = st.columns(3)
+        c_ev.metric("Eventos no Mês", f"{resumo['eventos']} de {capacidade}")
+        c_fat.metric("Faturamento", f"R$ {resumo['faturamento']:,.0f}")
+        c_luc.metric("Lucro Líquido", f"R$ {resumo['lucro']:,.0f}")
+        if resumo["atinge_equilibrio"]:
+            st.success("O mix cobre todo o custo fixo do mês.")
+        else:
+            st.warning(f"Mesmo com o melhor mix faltam R$ {-resumo['lucro']:,.2f} para o ponto de equilíbrio: amplie as datas ou os limites por produto.")
+    
+        escolhidos = df_mix[df_mix["Qtd"] > 0].sort_values("Margem", ascending=False)
+        if not escolhidos.empty:
+            def montar_mix():
+                fig_mix = px.bar(escolhidos, x="Qtd", y="Produto", orientation="h", color="Margem", color_continuous_scale="Greens", text_auto=True)
+                fig_mix.update_layout(yaxis=dict(autorange="reversed"), xaxis_title="Eventos", yaxis_title=None)
+                return fig_mix
+            mostrar_grafico("mix_produtos", tuple(escolhidos[["Produto", "Qtd", "Margem"]].itertuples(index=False)), montar_mix)
             st.dataframe(
-                df_pe,
+                escolhidos[["Produto", "Qtd", "Margem Unitária", "Faturamento", "Margem"]],
                 column_config={
-                    "Preço Venda": st.column_config.NumberColumn(format="R$ %.2f"),
-                    "Custo Variável": st.column_config.NumberColumn(format="R$ %.2f"),
+                    "Qtd": st.column_config.NumberColumn(format="%d eventos"),
                     "Margem Unitária": st.column_config.NumberColumn(format="R$ %.2f"),
-                    "Qtd Necessária (PE)": st.column_config.NumberColumn(format="%.1f unid"),
-                    "Meta Faturamento (PE)": st.column_config.NumberColumn(format="R$ %.2f"),
+                    "Faturamento": st.column_config.NumberColumn(format="R$ %.2f"),
+                    "Margem": st.column_config.NumberColumn("Margem de Contribuição", format="R$ %.2f"),
                 },
                 use_container_width=True,
                 hide_index=True
-            )
\ No newline at end of file
+            )
+
+def pagina_simulador():
+    st.header("🔮 Simulador & Análise de Ponto de Equilíbrio")
+    
+    if catalogo.vazio:
+        st.warning("Cadastre produtos primeiro.")
+        return
+    
+    cubo = vendas.cubo
+    # Margem média do histórico e venda base do mês de referência, lidas do cubo; o custo
+    # fixo é o vigente nesse mesmo mês
+    margem_media_atual = calculos.margem_media(cubo.totais())
+    ano_ref, mes_ref = periodo_referencia()
+    custo_fixo = sum(c['valor'] for c in db.listar_custos_fixos(f"{ano_ref}-{mes_ref:02d}"))
+    base_vendas_padrao = float(cubo.total_mes(ano_ref, mes_ref)["faturamento"])
+    
+    base_vendas_mensal = st.number_input(f"Venda Base (Mês) R$ — referência {lista_meses[mes_ref]}/{ano_ref}", value=base_vendas_padrao)
+    
+    secao_cenarios(base_vendas_mensal, margem_media_atual, custo_fixo)
+    st.divider()
+    secao_monte_carlo(base_vendas_mensal, margem_media_atual, custo_fixo)
+    st.divider()
+    secao_ponto_equilibrio(custo_fixo)
+    st.divider()
+    secao_mix_produtos(custo_fixo)
+
+if tab_simulador.open:
+    with medir("Aba: Simulador"), tab_simulador:
+        pagina_simulador()
+
+# --- Diagnóstico: fecha a medição desta execução e mostra o painel na sidebar ---
+if diagnostico is not None:
+    registro = instrumentacao.encerrar(diagnostico)
+    instrumentacao.gravar(registro)
+    historico_diagnostico = st.session_state.setdefault("historico_diagnostico", deque(maxlen=200))
+    historico_diagnostico.append(registro)
+    with painel_diagnostico:
+        st.caption(f"Última execução: **{registro['total_ms']:,.0f} ms**, {registro['dataframes']} DataFrames criados")
+        st.dataframe(
+            pd.DataFrame(list(registro["secoes_ms"].items()), columns=["Seção", "ms"]),
+            column_config={"ms": st.column_config.NumberColumn(format="%.1f")},
+            use_container_width=True, hide_index=True
+        )
+        with st.expander(f"Percentis ({len(historico_diagnostico)} execuções)"):
+            st.dataframe(instrumentacao.percentis(list(historico_diagnostico)).round(1), use_container_width=True, hide_index=True)
+        with st.expander("Bytes por elemento"):
+            st.dataframe(instrumentacao.elementos(registro), use_container_width=True, hide_index=True)
+        st.download_button(
+            "⬇️ Métricas da sessão (.ndjson)",
+            data="".join(json.dumps(r, ensure_ascii=False) + "\n" for r in historico_diagnostico),
+            file_name=f"metricas_{datetime.now().strftime('%Y%m%d_%H%M')}.ndjson",
+            mime="application/x-ndjson", on_click="ignore", use_container_width=True
+        )
+        st.caption(f"Cada execução também é acrescentada em `{instrumentacao.CAMINHO_METRICAS}`.")
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco_dados  # noqa: E402
+from banco_dados import COLUNAS_VENDA, MIGRACOES, SQL_INSERIR_VENDA, BancoDados  # noqa: E402
+
+
+def criar_banco_v4(caminho):
+    # Banco no esquema anterior ao diário de vendas, com um produto e três vendas
+    conn = sqlite3.connect(caminho)
+    for numero, script in enumerate(MIGRACOES[:4], start=1):
+        conn.executescript(script)
+        conn.execute(f"PRAGMA user_version = {numero}")
+    conn.execute("INSERT INTO produtos (nome, preco_venda, custo_total, margem) VALUES ('Festa A', 1000, 400, 600)")
+    vendas = [
+        (None, f"2025-0{mes}-10", mes, 2025, "Festa A", 1, 1000.0, 400.0, 1000.0, 400.0, 600.0)
+        for mes in (1, 2, 3)
+    ]
+    conn.executemany(SQL_INSERIR_VENDA, vendas)
+    conn.execute("UPDATE vendas SET produto_id = 1")
+    conn.commit()
+    conn.close()
+
+
+def versao(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_migra_banco_v4_preservando_as_vendas(tmp_path):
+    caminho = str(tmp_path / "v4.db")
+    criar_banco_v4(caminho)
+
+    banco = BancoDados(caminho)
+    assert banco.conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRACOES)
+    linhas = banco.conn.execute(f"SELECT id, produto_id, {', '.join(COLUNAS_VENDA)} FROM vendas ORDER BY id").fetchall()
+    assert [(l["id"], l["produto_id"], l["data"]) for l in linhas] == [
+        (1, 1, "2025-01-10"), (2, 1, "2025-02-10"), (3, 1, "2025-03-10")
+    ]
+    # AUTOINCREMENT: o id da última venda estornada não é reaproveitado
+    banco.estornar_venda(3)
+    novo = banco.inserir_linhas_vendas([(None, "2025-04-10", 4, 2025, "Festa A", 1, 1000.0, 400.0, 1000.0, 400.0, 600.0)])
+    assert novo == [4]
+    banco.fechar()
+
+
+def test_migracao_que_falha_nao_deixa_o_banco_pela_metade(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "v4.db")
+    criar_banco_v4(caminho)
+    # Falha depois do DROP, antes de recriar a tabela
+    monkeypatch.setattr(banco_dados, "MIGRACOES", MIGRACOES[:4] + ["DROP TABLE vendas; SELECT * FROM tabela_inexistente;"])
+
+    with pytest.raises(sqlite3.Error):
+        BancoDados(caminho)
+
+    assert versao(caminho) == 4
+    conn = sqlite3.connect(caminho)
+    assert conn.execute("SELECT COUNT(*) FROM vendas").fetchone()[0] == 3
+    conn.close()
+
+    # Sem a falha, a próxima abertura migra normalmente
+    monkeypatch.setattr(banco_dados, "MIGRACOES", MIGRACOES)
+    BancoDados(caminho).fechar()
+    assert versao(caminho) == len(MIGRACOES)
+
+
+def test_reprecificacao_supera_os_eventos_da_venda(tmp_path):
+    caminho = str(tmp_path / "v4.db")
+    criar_banco_v4(caminho)
+    banco = BancoDados(caminho)
+    banco.estornar_venda(1)
+    banco.corrigir_venda(2, {"qtd": 2})
+    banco.desfazer_evento()
+
+    # A venda 3 não está no diário; o estorno da 1 e a correção desfeita da 2 ficam superados
+    banco.atualizar_valores_vendas([(1100.0, 450.0, 2), (1100.0, 450.0, 3)])
+    situacoes = [(e["id_linha"], e["desfeito"]) for e in banco.listar_diario()]
+    assert sorted(situacoes) == [(1, banco_dados.EM_VIGOR), (2, banco_dados.SUPERADO)]
+    assert banco.refazer_evento() is None
+
+    # O desfazer pula o que foi superado em vez de travar nele
+    assert banco.desfazer_evento() is not None
+    assert banco.desfazer_evento() is None
+    banco.fechar()
+
+
+def test_importacao_descarta_a_pilha_de_refazer(tmp_path):
+    caminho = str(tmp_path / "v4.db")
+    criar_banco_v4(caminho)
+    banco = BancoDados(caminho)
+    banco.estornar_venda(3)
+    banco.desfazer_evento()
+    banco.inserir_linhas_vendas([(None, "2025-04-10", 4, 2025, "Festa A", 1, 1000.0, 400.0, 1000.0, 400.0, 600.0)])
+
+    assert banco.pilhas_diario() == (None, None)
+    assert banco.refazer_evento() is None
+    banco.fechar()
+
+
+def test_reajuste_antes_de_uma_versao_futura_nao_duplica_a_conta(tmp_path):
+    banco = BancoDados(str(tmp_path / "custos.db"))
+    atual = banco.incluir_custo_fixo("Aluguel", 4000.0)
+    banco.alterar_custo_fixo(atual, "Aluguel", 5000.0, "2027-01")
+    # Reajuste da versão vigente a partir de um mês anterior à versão de 2027
+    banco.alterar_custo_fixo(atual, "Aluguel", 4500.0, "2026-11")
+
+    valores = {mes: [c["valor"] for c in banco.listar_custos_fixos(mes)] for mes in ("2026-10", "2026-11", "2027-01")}
+    assert valores == {"2026-10": [4000.0], "2026-11": [4500.0], "2027-01": [5000.0]}
+    banco.fechar()